@@ -0,0 +1,35 @@
+"""Unique election winners
+
+Revision ID: 8f2c1d7a9b3e
+Revises: 43806dcfacb5
+Create Date: 2026-10-19 10:12:41.503217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2c1d7a9b3e'
+down_revision: Union[str, None] = '43806dcfacb5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Remove winners inserted twice by concurrent schedulers, keeping the first row
+    op.execute('''
+        DELETE FROM "SGEElectionWinners" w
+        USING "SGEElectionWinners" d
+        WHERE w."ElectionId" = d."ElectionId"
+          AND w."StudentNumber" = d."StudentNumber"
+          AND w."SelectedPositionName" = d."SelectedPositionName"
+          AND w."ElectionWinnersId" > d."ElectionWinnersId"
+    ''')
+    op.create_unique_constraint('uq_election_winners_election_student_position', 'SGEElectionWinners', ['ElectionId', 'StudentNumber', 'SelectedPositionName'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_election_winners_election_student_position', 'SGEElectionWinners', type_='unique')
@@ -0,0 +1,35 @@
+"""Winners gathered at
+
+Revision ID: a6c2e8f4b7d9
+Revises: f3a8b6d2c4e1
+Create Date: 2026-10-20 11:18:52.604377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e8f4b7d9'
+down_revision: Union[str, None] = 'f3a8b6d2c4e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('SGEElection', sa.Column('WinnersGatheredAt', sa.DateTime(timezone=True), nullable=True))
+
+    # Elections already gathered have winners or their results announcement, they must not be gathered again
+    op.execute('''
+        UPDATE "SGEElection" e
+        SET "WinnersGatheredAt" = e."VotingEnd"
+        WHERE EXISTS (SELECT 1 FROM "SGEElectionWinners" w WHERE w."ElectionId" = e."ElectionId")
+           OR EXISTS (SELECT 1 FROM "SGEAnnouncement" a
+                      WHERE a."AnnouncementType" = 'results' AND a."AnnouncementTitle" = 'Winners for the ' || e."ElectionName")
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_column('SGEElection', 'WinnersGatheredAt')
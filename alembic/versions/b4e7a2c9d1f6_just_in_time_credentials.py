@@ -0,0 +1,27 @@
+"""Just in time credentials
+
+Revision ID: b4e7a2c9d1f6
+Revises: 8f2c1d7a9b3e
+Create Date: 2026-10-19 14:37:05.118642
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7a2c9d1f6'
+down_revision: Union[str, None] = '8f2c1d7a9b3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing elections keep getting their passwords at creation
+    op.add_column('SGEElection', sa.Column('JustInTimeCredentials', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('SGEElection', 'JustInTimeCredentials')
@@ -0,0 +1,26 @@
+"""Code failed attempts
+
+Revision ID: c7d3f9a1e5b2
+Revises: a6c2e8f4b7d9
+Create Date: 2026-10-21 09:42:17.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3f9a1e5b2'
+down_revision: Union[str, None] = 'a6c2e8f4b7d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('SGECode', sa.Column('FailedAttempts', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('SGECode', 'FailedAttempts')
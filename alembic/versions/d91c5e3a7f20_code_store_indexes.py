@@ -0,0 +1,36 @@
+"""Code store indexes
+
+Revision ID: d91c5e3a7f20
+Revises: b4e7a2c9d1f6
+Create Date: 2026-10-19 16:05:22.730914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91c5e3a7f20'
+down_revision: Union[str, None] = 'b4e7a2c9d1f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep only the latest code of each student and type before making the pair unique
+    op.execute('''
+        DELETE FROM "SGECode" c
+        USING "SGECode" d
+        WHERE c."StudentNumber" = d."StudentNumber"
+          AND c."CodeType" = d."CodeType"
+          AND c."CodeId" < d."CodeId"
+    ''')
+    op.create_unique_constraint('uq_code_student_type', 'SGECode', ['StudentNumber', 'CodeType'])
+    op.create_index('ix_code_expiration_date', 'SGECode', ['CodeExpirationDate'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_code_expiration_date', table_name='SGECode')
+    op.drop_constraint('uq_code_student_type', 'SGECode', type_='unique')
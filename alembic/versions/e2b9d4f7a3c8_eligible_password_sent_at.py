@@ -0,0 +1,33 @@
+"""Eligible password sent at
+
+Revision ID: e2b9d4f7a3c8
+Revises: c7d3f9a1e5b2
+Create Date: 2026-10-22 10:15:43.902671
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9d4f7a3c8'
+down_revision: Union[str, None] = 'c7d3f9a1e5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('SGEEligibles', sa.Column('PasswordSentAt', sa.DateTime(timezone=True), nullable=True))
+
+    # Passwords issued before delivery was recorded are taken as sent, they must not be replaced
+    op.execute('''
+        UPDATE "SGEEligibles"
+        SET "PasswordSentAt" = COALESCE("updated_at", "created_at")
+        WHERE "VotingPassword" IS NOT NULL
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_column('SGEEligibles', 'PasswordSentAt')
@@ -0,0 +1,57 @@
+"""Student profile view
+
+Revision ID: f3a8b6d2c4e1
+Revises: d91c5e3a7f20
+Create Date: 2026-10-20 09:41:17.286503
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8b6d2c4e1'
+down_revision: Union[str, None] = 'd91c5e3a7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# First enrollment and first class of every student, both picked by the lowest id.
+# A change to this definition needs a new revision that recreates the view, and the same change in student_profiles.PROFILE_SELECT.
+PROFILE_SELECT = '''
+    SELECT s."StudentId", s."StudentNumber", s."FirstName", s."MiddleName", s."LastName",
+           ce."CourseId" AS "EnrolledCourseId", ce."CourseCode" AS "EnrolledCourseCode", ce."Status",
+           g."ClassId", g."Grade", cl."Section",
+           m."MetadataId", m."CourseId", c."CourseCode", m."Year", m."Semester", m."Batch",
+           m."created_at" AS "MetadataCreatedAt", m."updated_at" AS "MetadataUpdatedAt"
+    FROM "SPSStudent" s
+    LEFT JOIN (
+        SELECT scg."StudentId", scg."ClassId", scg."Grade",
+               ROW_NUMBER() OVER (PARTITION BY scg."StudentId" ORDER BY scg."ClassId") AS rn
+        FROM "SPSStudentClassGrade" scg
+    ) g ON g."StudentId" = s."StudentId" AND g.rn = 1
+    LEFT JOIN "SPSClass" cl ON cl."ClassId" = g."ClassId"
+    LEFT JOIN "SPSMetadata" m ON m."MetadataId" = cl."MetadataId"
+    LEFT JOIN "SPSCourse" c ON c."CourseId" = m."CourseId"
+    LEFT JOIN (
+        SELECT e."StudentId", e."CourseId", co."CourseCode", e."Status",
+               ROW_NUMBER() OVER (PARTITION BY e."StudentId" ORDER BY e."CourseId") AS rn
+        FROM "SPSCourseEnrolled" e
+        JOIN "SPSCourse" co ON co."CourseId" = e."CourseId"
+    ) ce ON ce."StudentId" = s."StudentId" AND ce.rn = 1
+'''
+
+
+def upgrade() -> None:
+    # Servers that already ran created the view at startup, this definition replaces it
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS "SGEStudentProfile"')
+    op.execute(f'CREATE MATERIALIZED VIEW "SGEStudentProfile" AS {PROFILE_SELECT}')
+
+    # Needed by REFRESH ... CONCURRENTLY, and every lookup is by student number
+    op.execute('CREATE UNIQUE INDEX "ix_SGEStudentProfile_StudentNumber" ON "SGEStudentProfile" ("StudentNumber")')
+
+
+def downgrade() -> None:
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS "SGEStudentProfile"')
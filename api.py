@@ -1,20 +1,16 @@
-from fastapi import FastAPI, HTTPException, Depends, APIRouter, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, APIRouter, UploadFile, File, Form, BackgroundTasks, Header, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, ORJSONResponse
+from starlette.background import BackgroundTask
 
-from sqlalchemy import inspect, func, and_, desc, asc
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, func, and_, or_, desc, asc, case, tuple_, select, insert, update, exists, literal, false, null, bindparam
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from reportlab.lib.pagesizes import letter, landscape, legal
-from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable, Image, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER, TA_RIGHT
-
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.jobstores.base import ConflictingIdError
 
 from database import engine, SessionLocal, Base
 
@@ -22,11 +18,15 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Union
 from datetime import datetime, date, timedelta
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO, StringIO
 
 from dotenv import load_dotenv # for .env file
 load_dotenv()
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import time
 import string
 import random
@@ -36,23 +36,42 @@ import cloudinary
 import cloudinary.uploader
 import asyncio
 import aiohttp
-import requests
 import glob
+import uuid
+import csv
+import multiprocessing
+import threading
+import hashlib
+import json
+import orjson
 from pytz import timezone
 
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote
 from passlib.context import CryptContext
+from cachetools import TTLCache
 from cloudinary.api import resources_by_tag, delete_resources_by_tag, delete_folder
 
 from services import send_verification_code_email, send_pass_code_queue_email, send_pass_code_manual_email, \
     send_coc_status_email, send_partylist_status_email, send_appeal_response_email, send_pass_code_student_organization_officer_email, \
-    send_eligible_students_email
-
-from models import Student, Announcement, Rule, Guideline, Election, SavedPosition, CreatedElectionPosition, Code, \
+    send_eligible_students_email, queue_email, HIGH_PRIORITY
+from uploads import upload, upload_many, upload_with_retry
+from winners import determine_winners
+from scheduling import scheduler, start_scheduler, stop_scheduler
+from student_profiles import ensure_student_profiles, refresh_student_profiles
+from code_store import code_store, purge_expired_codes, CODE_TTL_SECONDS
+from clock import manila_now, manila_wall_clock
+from timeline import get_election_phase, schedule_phase_transitions, forget_election, on_phase_transition, has_passed, \
+    CAMPAIGN_PERIOD, VOTING_PERIOD, POST_ELECTION
+from file_cache import DiskLRUCache
+from image_cache import ImageCache
+from pdf_templates import build_receipt, build_election_report, build_insert_data_report, render_oath_of_office
+
+from models import Student, Announcement, Rule, Guideline, Election, SavedPosition, CreatedElectionPosition, \
                     PartyList, CoC, InsertDataQueues, Candidates, RatingsTracker, VotingsTracker, ElectionAnalytics, ElectionWinners, \
                     Certifications, CreatedAdminSignatory, StudentOrganization, OrganizationOfficer, OrganizationMember, ElectionAppeals, \
-                    Comelec, Eligibles, VotingReceipt, CertificationsSigned, CourseEnrolled, Course, StudentClassGrade, Class, Metadata, \
-                    IncidentReport, ViolationForm
+                    Comelec, Eligibles, VotingReceipt, CertificationsSigned, CourseEnrolled, Course, \
+                    IncidentReport, ViolationForm, CertificationJobs, CandidateCourseTally, BallotSnapshot, StudentProfile, \
+                    StudentClassGrade, Class, Metadata
 #################################################################
 """ Settings """
 
@@ -102,7 +121,8 @@ app = FastAPI(
     version="v1",
     docs_url="/",
     redoc_url="/redoc",
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    default_response_class=ORJSONResponse
 )
 
 router = APIRouter(prefix="/api/v1")
@@ -113,6 +133,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 #################################################################
 """ Initial Setup """
@@ -129,22 +150,96 @@ def get_db():
     finally:
         db.close()
 
-def manila_now():
-    return datetime.now(timezone('Asia/Manila'))
+#########################################################
+""" Keyset pagination for the large list endpoints """
+
+MAX_PAGE_LIMIT = 1000
+
+# Totals are shown on dashboards, a few seconds old is fine
+total_count_cache = TTLCache(maxsize=128, ttl=int(os.getenv("TOTAL_COUNT_CACHE_SECONDS", 30)))
+total_count_cache_lock = threading.Lock()
+
+def paginate(query, key_column, after: Optional[int], limit: Optional[int]):
+    # Rows after the cursor ordered by primary key, no OFFSET so deep pages cost the same as the first
+    if after is not None:
+        query = query.filter(key_column > after)
+
+    query = query.order_by(key_column)
+
+    if limit:
+        query = query.limit(min(limit, MAX_PAGE_LIMIT))
+
+    return query
+
+def total_count(db: Session, key_column):
+    key = str(key_column)
+
+    with total_count_cache_lock:
+        total = total_count_cache.get(key)
+
+    if total is None:
+        total = db.query(func.count(key_column)).scalar()
+
+        with total_count_cache_lock:
+            total_count_cache[key] = total
+
+    return total
+
+def parse_fields(fields: Optional[str], allowed):
+    # None means every field, unknown names raise so typos are not silently ignored
+    if not fields:
+        return None
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
 
-# Create anbd start the scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_jobstore(SQLAlchemyJobStore(url='sqlite:///jobs.sqlite'), 'default')
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return selected
+
+def project(rows, selected):
+    if selected is None:
+        return rows
+
+    return [{field: row[field] for field in selected if field in row} for row in rows]
+
+def paginated_response(content, total, last_key, page_size, limit: Optional[int]):
+    headers = {"X-Total-Count": str(total)}
+
+    # A full page means there may be more, the client passes this back as after=
+    if limit and page_size == min(limit, MAX_PAGE_LIMIT) and last_key is not None:
+        headers["X-Next-Cursor"] = str(last_key)
+
+    return ORJSONResponse(content, headers=headers)
 
 ###########################################################################
 # Cached directory variables
 CachedImagesDirectory = "cached/images"
 CachedImagesDirectoryElection = f'{CachedImagesDirectory}/election'
+CachedDownloadsDirectory = "cached/downloads"
+
+# Candidate photos and organization logos are prefetched here when an election enters voting
+image_cache = ImageCache(CachedImagesDirectoryElection, int(os.getenv("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024)))
+CachedImagesElectionRoute = f"{os.getenv('API_BASE_URL', '')}{router.prefix}/get/cached/elections"
+
+# Repeat downloads of certificates and receipts are served from local disk
+download_cache = DiskLRUCache(CachedDownloadsDirectory, int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", 512 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# SPS data changes outside of this API, so the student profiles are also refreshed on a timer
+STUDENT_PROFILE_REFRESH_MINUTES = int(os.getenv("STUDENT_PROFILE_REFRESH_MINUTES", 15))
+
+# Inserts within this window share one refresh, the live lookups cover the new students until it runs
+STUDENT_PROFILE_REFRESH_DELAY_SECONDS = int(os.getenv("STUDENT_PROFILE_REFRESH_DELAY_SECONDS", 30))
+
+CODE_PURGE_MINUTES = int(os.getenv("CODE_PURGE_MINUTES", 60))
 
 # On server startup
 @app.on_event("startup")
 def start_up():
-    scheduler.start()
+    # Every worker starts the scheduler paused, only the one holding the lease runs jobs
+    start_scheduler()
 
     # Make cached images directory
     if not os.path.exists(CachedImagesDirectory):
@@ -154,6 +249,34 @@ def start_up():
     if not os.path.exists(CachedImagesDirectoryElection):
         os.makedirs(CachedImagesDirectoryElection)
 
+    # Fill the image cache for elections that are already in their voting period
+    prefetch_images_of_elections_in_voting()
+
+    # Make sure every upcoming election end has its job in the shared jobstore
+    schedule_upcoming_winner_gathering()
+
+    # Same for the phase transition events of elections that are not over yet
+    schedule_upcoming_phase_transitions()
+
+    # And for password fills that stopped before every eligible got one
+    schedule_unfinished_eligible_password_fills()
+
+    # Run once by the leader, the same id keeps the workers from adding it more than once
+    scheduler.add_job(backfill_candidate_course_tallies, id='backfill_candidate_course_tallies', replace_existing=True)
+
+    # Student profile read model, kept fresh by the leader
+    ensure_student_profiles()
+    scheduler.add_job(refresh_student_profiles, 'interval', minutes=STUDENT_PROFILE_REFRESH_MINUTES, id='refresh_student_profiles', replace_existing=True)
+
+    # Expired verification codes are removed instead of piling up
+    scheduler.add_job(purge_expired_codes, 'interval', minutes=CODE_PURGE_MINUTES, id='purge_expired_codes', replace_existing=True)
+
+# On server shutdown
+@app.on_event("shutdown")
+def shut_down():
+    # Hand the lease over right away instead of waiting for it to expire
+    stop_scheduler()
+
 async def download_image(url, filename):
     async with aiohttp.ClientSession() as session:
         async with session.get(url) as resp:
@@ -162,12 +285,129 @@ async def download_image(url, filename):
     with open(filename, "wb") as f:
         f.write(data)
 
+#########################################################
+""" Stream a remote file to the client, caching it on disk along the way """
+
+def content_disposition(filename):
+    quoted = quote(filename)
+
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+
+    return f'attachment; filename="{filename}"'
+
+def stream_cached_file(path):
+    # The file is opened before streaming starts so an eviction mid-response cannot break it
+    f = open(path, "rb")
+
+    def iterate():
+        with f:
+            while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+
+    return iterate()
+
+async def stream_remote_file(url, filename, media_type="application/pdf"):
+    headers = {"Content-Disposition": content_disposition(filename)}
+
+    cached_path = download_cache.get(url)
+    if cached_path:
+        return StreamingResponse(stream_cached_file(cached_path), media_type=media_type, headers=headers)
+
+    session = aiohttp.ClientSession()
+    try:
+        resp = await session.get(url)
+    except Exception:
+        await session.close()
+        raise
+
+    if resp.status != 200:
+        resp.release()
+        await session.close()
+        raise HTTPException(status_code=502, detail=f"Storage responded with status {resp.status}")
+
+    if resp.content_length:
+        headers["Content-Length"] = str(resp.content_length)
+
+    async def iterate():
+        temp_file, temp_path = download_cache.open_temp()
+        completed = False
+        try:
+            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                temp_file.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            temp_file.close()
+
+            # Only complete downloads are kept, aborted ones are thrown away
+            if completed:
+                download_cache.commit(url, temp_path)
+            else:
+                download_cache.discard(temp_path)
+
+    async def close():
+        # Runs after the response even when the client left before the body started
+        resp.release()
+        await session.close()
+
+    return StreamingResponse(iterate(), media_type=media_type, headers=headers, background=BackgroundTask(close))
+
 from urllib.parse import unquote
 
 @router.get("/get/cached/elections/{image_path}", tags=["Cached"])
 async def get_image(image_path: str):
     # Decode the image path
-    return FileResponse(f'{CachedImagesDirectoryElection}/{unquote(image_path)}')
+    path = image_cache.path_for(unquote(image_path))
+
+    if not path:
+        return JSONResponse(status_code=404, content={"detail": "Image not found"})
+
+    # The file name is the hash of its content so it never changes
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+#########################################################
+""" Method """
+def cached_image_url(url):
+    # Point to the local copy when the image has been prefetched, otherwise keep the cloudinary url
+    if not url:
+        return url
+
+    name = image_cache.lookup(url)
+    return f"{CachedImagesElectionRoute}/{name}" if name else url
+
+def prefetch_election_images(election_id: int):
+    db = SessionLocal()
+
+    try:
+        election = db.query(Election).filter(Election.ElectionId == election_id).first()
+
+        if not election:
+            return
+
+        urls = [photo for photo, in db.query(Candidates.DisplayPhoto).filter(Candidates.ElectionId == election_id).all()]
+
+        student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
+        if student_organization:
+            urls.append(student_organization.OrganizationLogo)
+    finally:
+        db.close()
+
+    asyncio.run(image_cache.prefetch(urls))
+    print(f"Prefetched images of election {election_id}")
+
+def prefetch_images_of_elections_in_voting():
+    db = SessionLocal()
+
+    try:
+        now = manila_wall_clock()
+        elections = db.query(Election.ElectionId).filter(Election.VotingStart <= now, Election.VotingEnd > now).all()
+    finally:
+        db.close()
+
+    for election_id, in elections:
+        # No trigger so the job runs right away on the scheduler thread
+        scheduler.add_job(prefetch_election_images, id=f'prefetch_images_{election_id}', args=[election_id], replace_existing=True)
 
 @router.get("/get/time/now", tags=["Time"])
 def get_time_now():
@@ -370,28 +610,112 @@ def process_data(df):
 
 """ ** GET Methods: All about students APIs ** """
 
+# Same keys as Student.to_dict, selected as plain columns
+STUDENT_LIST_COLUMNS = [Student.StudentId, Student.StudentNumber, Student.FirstName, Student.LastName, Student.MiddleName, Student.Email,
+                        Student.Gender, Student.DateOfBirth, Student.PlaceOfBirth, Student.ResidentialAddress, Student.MobileNumber,
+                        Student.IsOfficer, Student.created_at, Student.updated_at]
+
+""" Method """
+def query_as_dicts(query):
+    # Rows as dicts without building ORM objects, orjson writes the dates and datetimes itself
+    return [row._asdict() for row in query]
+
 @router.get("/student/all", tags=["Student"])
-def get_All_Students(db: Session = Depends(get_db)):
+def get_All_Students(after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), fields: Optional[str] = None, db: Session = Depends(get_db)):
     try:
-        students = db.query(Student).order_by(Student.StudentId).all()
-        return {"students": [student.to_dict() for student in students]}
+        columns = {column.key: column for column in STUDENT_LIST_COLUMNS}
+
+        try:
+            selected = parse_fields(fields, columns)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+
+        # Only the requested columns are selected, the key is always read for the cursor
+        selected_columns = [columns[field] for field in selected] if selected else STUDENT_LIST_COLUMNS
+        query = db.query(*selected_columns, Student.StudentId.label("PageCursor"))
+
+        rows = paginate(query, Student.StudentId, after, limit).all()
+        students = [row._asdict() for row in rows]
+        for student in students:
+            student.pop("PageCursor")
+
+        # Returned as a response so FastAPI does not walk the whole list with jsonable_encoder again
+        return paginated_response({"students": students}, total_count(db, Student.StudentId),
+                                  rows[-1].PageCursor if rows else None, len(rows), limit)
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all students from the database"})
     
+# Not cached in the process, the ordered rows come from the student profile view and go out as they are read
+STUDENT_DIRECTORY_BATCH_SIZE = 1000
+
+""" Method """
+def student_directory_query(db: Session):
+    # Arranged by course, last name, first name, middle name, the id keeps the order total for the cursor.
+    # The course is the enrollment with the lowest CourseId, the same one every other student helper returns
+    sort_key = [func.coalesce(StudentProfile.EnrolledCourseCode, ''), StudentProfile.LastName, StudentProfile.FirstName,
+                func.coalesce(StudentProfile.MiddleName, ''), StudentProfile.StudentId]
+
+    query = db.query(StudentProfile.StudentId, StudentProfile.StudentNumber, StudentProfile.EnrolledCourseCode.label("CourseCode"),
+                     StudentProfile.LastName, StudentProfile.FirstName, StudentProfile.MiddleName)
+
+    return query, sort_key
+
+def arranged_row(row):
+    return [row.StudentNumber, row.CourseCode or False, row.LastName, row.FirstName, row.MiddleName]
+
+def stream_student_directory():
+    # Own session, the request one may already be closed while the body is still streaming
+    db = SessionLocal()
+
+    try:
+        query, sort_key = student_directory_query(db)
+        rows = query.order_by(*sort_key).yield_per(STUDENT_DIRECTORY_BATCH_SIZE)
+
+        chunk = [b'{"students":[']
+        first = True
+        for row in rows:
+            chunk.append((b'' if first else b',') + orjson.dumps(arranged_row(row)))
+            first = False
+
+            if len(chunk) >= STUDENT_DIRECTORY_BATCH_SIZE:
+                yield b''.join(chunk)
+                chunk = []
+
+        chunk.append(b']}')
+        yield b''.join(chunk)
+    finally:
+        db.close()
+
 @router.get("/student/all/arranged", tags=["Student"])
-def get_All_Students_Arranged(db: Session = Depends(get_db)):
+def get_All_Students_Arranged(after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), db: Session = Depends(get_db)):
     try:
-        # Arrange by course, last name, first name, middle name???
-        
-        # Iterate over all students and get course by student number 
-        students = db.query(Student).order_by(Student.StudentId).all()
-        students_arranged = []
-        
-        for student in students:
-            student_course = get_Student_Course_by_studnumber(student.StudentNumber, db)
-            students_arranged.append([student.StudentNumber, student_course, student.LastName, student.FirstName, student.MiddleName])
+        total = total_count(db, Student.StudentId)
+
+        # The whole directory, streamed straight from one ordered query
+        if after is None and not limit:
+            return StreamingResponse(stream_student_directory(), media_type="application/json", headers={"X-Total-Count": str(total)})
+
+        query, sort_key = student_directory_query(db)
+
+        # Keyset on the whole sort key, the cursor is the StudentId of the last row of the previous page
+        if after is not None:
+            cursor = query.filter(StudentProfile.StudentId == after).with_entities(*sort_key).first()
+
+            if cursor is None:
+                return JSONResponse(status_code=400, content={"detail": "Unknown cursor"})
+
+            query = query.filter(tuple_(*sort_key) > tuple_(*cursor))
 
-        return {"students": students_arranged}
+        query = query.order_by(*sort_key)
+
+        if limit:
+            query = query.limit(min(limit, MAX_PAGE_LIMIT))
+
+        students = query.all()
+        students_arranged = [arranged_row(student) for student in students]
+
+        return paginated_response({"students": students_arranged}, total,
+                                  students[-1].StudentId if students else None, len(students), limit)
 
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all students from the database"})
@@ -457,25 +781,44 @@ def get_All_Insert_Data_Queues(db: Session = Depends(get_db)):
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all queues from the database"})
 
-""" Method """ 
-def get_Student_Course_by_studnumber(student_number: str, db: Session = Depends(get_db)):
-    student = db.query(Student).filter(Student.StudentNumber == student_number).first()
+""" Method """
+def get_Student_Enrollment(student_number: str, db: Session):
+    # Straight from the SPS tables, for writes that cannot use a student profile up to STUDENT_PROFILE_REFRESH_MINUTES old.
+    # Same rule and column names as the profiles, the enrollment with the lowest CourseId. None when the student does not exist.
+    return db.query(Student.StudentId, CourseEnrolled.CourseId.label("EnrolledCourseId"), Course.CourseCode.label("EnrolledCourseCode"), CourseEnrolled.Status).\
+        outerjoin(CourseEnrolled, CourseEnrolled.StudentId == Student.StudentId).\
+        outerjoin(Course, Course.CourseId == CourseEnrolled.CourseId).\
+        filter(Student.StudentNumber == student_number).\
+        order_by(CourseEnrolled.CourseId).first()
 
-    if not student:
+""" Method """
+def get_Student_Class(student_number: str, db: Session):
+    # Straight from the SPS tables like get_Student_Enrollment, the class with the lowest ClassId as in the profiles
+    return db.query(Student.StudentId, StudentClassGrade.ClassId, StudentClassGrade.Grade, Class.Section,
+                    Metadata.MetadataId, Metadata.CourseId, Course.CourseCode, Metadata.Year, Metadata.Semester, Metadata.Batch,
+                    Metadata.created_at.label("MetadataCreatedAt"), Metadata.updated_at.label("MetadataUpdatedAt")).\
+        outerjoin(StudentClassGrade, StudentClassGrade.StudentId == Student.StudentId).\
+        outerjoin(Class, Class.ClassId == StudentClassGrade.ClassId).\
+        outerjoin(Metadata, Metadata.MetadataId == Class.MetadataId).\
+        outerjoin(Course, Course.CourseId == Metadata.CourseId).\
+        filter(Student.StudentNumber == student_number).\
+        order_by(StudentClassGrade.ClassId).first()
+
+""" Method """
+def get_Student_Course_by_studnumber(student_number: str, db: Session = Depends(get_db), live: bool = False):
+    profile = None if live else db.query(StudentProfile.EnrolledCourseCode).filter(StudentProfile.StudentNumber == student_number).first()
+
+    # Live lookup, also for students imported since the last refresh
+    if not profile:
+        profile = get_Student_Enrollment(student_number, db)
+
+    if not profile:
         return {"error": f"Student with student number {student_number} not found."}
-    
-    student_id = student.StudentId
 
-    student_course = db.query(Course).\
-        join(CourseEnrolled, Course.CourseId == CourseEnrolled.CourseId).\
-        filter(CourseEnrolled.StudentId == student_id).first()
-    
-    if not student_course:
+    if not profile.EnrolledCourseCode:
         return False
-    
-    db.close()
 
-    return student_course.CourseCode
+    return profile.EnrolledCourseCode
 
 @router.get("/student/get/course/{student_number}", tags=["Student"])  
 def get_Student_Course(student_number: str, db: Session = Depends(get_db)):
@@ -484,44 +827,36 @@ def get_Student_Course(student_number: str, db: Session = Depends(get_db)):
     return {"course": student_course}
 
 """ Method """
-def get_Student_Metadata_by_studnumber(student_number: str):
+def get_Student_Metadata_by_studnumber(student_number: str, live: bool = False):
     db = SessionLocal()
 
-    student = db.query(Student).filter(Student.StudentNumber == student_number).first()
+    try:
+        profile = None if live else db.query(StudentProfile).filter(StudentProfile.StudentNumber == student_number).first()
 
-    if not student:
+        # Live lookup, also for students imported since the last refresh
+        if not profile:
+            profile = get_Student_Class(student_number, db)
+    finally:
         db.close()
+
+    if not profile:
         return {"error": f"Student with student number {student_number} not found."}
-    
-    student_id = student.StudentId
 
-    student_metadata = db.query(Metadata).\
-        join(Class, Metadata.MetadataId == Class.MetadataId).\
-        join(StudentClassGrade, Class.ClassId == StudentClassGrade.ClassId).\
-        filter(StudentClassGrade.StudentId == student_id).first()
-    
-    if not student_metadata:
-        db.close()
+    if not profile.MetadataId:
         return {"error": f"No metadata found for student with student number {student_number}."}
-    
-    # Get the course code
-    student_course = db.query(Course).filter(Course.CourseId == student_metadata.CourseId).first()
 
-    if not student_course:
-        db.close()
+    if not profile.CourseCode:
         return {"error": f"No course found for student with student number {student_number}."}
 
-    db.close()
-    
     return {
-        "MetadataId": student_metadata.MetadataId,
-        "CourseId": student_metadata.CourseId,
-        "CourseCode": student_course.CourseCode if student_course else '',
-        "Year": student_metadata.Year,
-        "Semester": student_metadata.Semester,
-        "Batch": student_metadata.Batch,
-        "created_at": student_metadata.created_at,
-        "updated_at": student_metadata.updated_at
+        "MetadataId": profile.MetadataId,
+        "CourseId": profile.CourseId,
+        "CourseCode": profile.CourseCode,
+        "Year": profile.Year,
+        "Semester": profile.Semester,
+        "Batch": profile.Batch,
+        "created_at": profile.MetadataCreatedAt,
+        "updated_at": profile.MetadataUpdatedAt
     }
 
 @router.get("/student/get/metadata/{student_number}", tags=["Student"])
@@ -531,28 +866,34 @@ def get_Student_Metadata(student_number: str, db: Session = Depends(get_db)):
     return {"metadata": student_metadata}
 
 """ Method """
-def get_Student_Section_by_studnumber(student_number: str):
+def get_Student_Section_by_studnumber(student_number: str, live: bool = False):
     db = SessionLocal()
 
-    student = db.query(Student).filter(Student.StudentNumber == student_number).first()
+    try:
+        profile = None if live else db.query(StudentProfile.ClassId, StudentProfile.Section).filter(StudentProfile.StudentNumber == student_number).first()
 
-    if not student:
+        # Live lookup, also for students imported since the last refresh
+        if not profile:
+            profile = get_Student_Class(student_number, db)
+    finally:
         db.close()
+
+    if not profile:
         return {"error": f"Student with student number {student_number} not found."}
-    
-    student_id = student.StudentId
 
-    student_section = db.query(Class).\
-        join(StudentClassGrade, Class.ClassId == StudentClassGrade.ClassId).\
-        filter(StudentClassGrade.StudentId == student_id).first()
-    
-    if not student_section:
-        db.close()
+    if not profile.ClassId:
         return False
-    
-    db.close()
 
-    return student_section.Section
+    return profile.Section
+
+""" Method """
+def get_Student_Profiles_by_studnumbers(student_numbers: list, db: Session):
+    # Course, year, semester and section of many students in one lookup, keyed by student number
+    rows = db.query(StudentProfile.StudentNumber, StudentProfile.CourseCode, StudentProfile.Year, StudentProfile.Semester, StudentProfile.Section).\
+        filter(StudentProfile.StudentNumber.in_(student_numbers), StudentProfile.CourseCode.isnot(None)).all()
+
+    return {student_number: {"CourseCode": course_code, "Year": year, "Semester": semester, "Section": section}
+            for student_number, course_code, year, semester, section in rows}
 
 @router.get("/student/get/section/{student_number}", tags=["Student"])
 def get_Student_Section(student_number: str, db: Session = Depends(get_db)):
@@ -561,23 +902,25 @@ def get_Student_Section(student_number: str, db: Session = Depends(get_db)):
     return {"section": student_section}
 
 """ Method """
-def get_Student_Status_In_CourseEnrolled(student_number: str):
+def get_Student_Status_In_CourseEnrolled(student_number: str, live: bool = False):
     db = SessionLocal()
-    student = db.query(Student).filter(Student.StudentNumber == student_number).first()
 
-    if not student:
+    try:
+        profile = None if live else db.query(StudentProfile.EnrolledCourseId, StudentProfile.Status).filter(StudentProfile.StudentNumber == student_number).first()
+
+        # Live lookup, also for students imported since the last refresh
+        if not profile:
+            profile = get_Student_Enrollment(student_number, db)
+    finally:
+        db.close()
+
+    if not profile:
         return f"Student with student number {student_number} not found."
-    
-    student_id = student.StudentId
 
-    student_status = db.query(CourseEnrolled).filter(CourseEnrolled.StudentId == student_id).first()
-    
-    if not student_status:
+    if not profile.EnrolledCourseId:
         return False
-    
-    db.close()
 
-    return student_status.Status
+    return profile.Status
 
 @router.get("/student/get/course-enrolled/status/{student_number}", tags=["Student"])
 def get_Student_Status(student_number: str, db: Session = Depends(get_db)):
@@ -586,27 +929,25 @@ def get_Student_Status(student_number: str, db: Session = Depends(get_db)):
     return {"status": student_status}
 
 """ Method """
-def get_Student_Class_Grade_by_studnumber(student_number: str):
+def get_Student_Class_Grade_by_studnumber(student_number: str, live: bool = False):
     db = SessionLocal()
 
-    student = db.query(Student).filter(Student.StudentNumber == student_number).first()
+    try:
+        profile = None if live else db.query(StudentProfile.ClassId, StudentProfile.Grade).filter(StudentProfile.StudentNumber == student_number).first()
 
-    if not student:
+        # Live lookup, also for students imported since the last refresh
+        if not profile:
+            profile = get_Student_Class(student_number, db)
+    finally:
         db.close()
+
+    if not profile:
         return f"Student with student number {student_number} not found."
-    
-    student_id = student.StudentId
 
-    student_grade = db.query(StudentClassGrade).\
-        filter(StudentClassGrade.StudentId == student_id).first()
-    
-    if not student_grade:
-        db.close()
+    if not profile.ClassId:
         return False
-    
-    db.close()
 
-    return student_grade.Grade
+    return profile.Grade
 
 @router.get("/student/get/grade/{student_number}", tags=["Student"])
 def get_Student_Class_Grade(student_number: str, db: Session = Depends(get_db)):
@@ -615,6 +956,20 @@ def get_Student_Class_Grade(student_number: str, db: Session = Depends(get_db)):
     return {"grade": student_grade}
     
 """ ** POST Methods: All about students APIs ** """
+""" Method """
+def schedule_student_profile_refresh():
+    # Debounced, a burst of inserts shares one refresh on the leader instead of one per request
+    if scheduler.get_job('refresh_student_profiles_soon'):
+        return
+
+    trigger = DateTrigger(run_date=manila_now() + timedelta(seconds=STUDENT_PROFILE_REFRESH_DELAY_SECONDS), timezone=timezone('Asia/Manila'))
+
+    try:
+        scheduler.add_job(refresh_student_profiles, trigger=trigger, id='refresh_student_profiles_soon')
+    except ConflictingIdError:
+        # Already pending, it picks these students up as well
+        pass
+
 # Create a queue
 queue = asyncio.Queue()
 
@@ -689,13 +1044,14 @@ def student_Insert_Data_Manual(data: SaveStudentData, db: Session = Depends(get_
             send_pass_code_manual_email(data.student_number, data.email, pass_value)
             break
 
+    schedule_student_profile_refresh()
+
     return {"message": f"Student {data.student_number} was inserted successfully."}
 
 @router.post("/student/insert/data/attachment", tags=["Student"])
 async def student_Insert_Data_Attachment(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
     responses = []
-    elements = []
-    styleSheet = getSampleStyleSheet()
+    file_reports = []
 
     inserted_student_count = 0
     incomplete_student_column_count = 0
@@ -820,74 +1176,31 @@ async def student_Insert_Data_Attachment(files: List[UploadFile] = File(...), db
             elif inserted_student_count <= 0 and incomplete_student_column_count > 0:
                 responses.append({"file": file.filename, "message": "No new students were inserted, incomplete student columns: " + str(incomplete_student_column_count)})
             
-        # Add a table to the PDF for each file
+        # Add a section to the PDF for each file
         if inserted_student_count > 0 or incomplete_student_column_count > 0:
-            elements.append(Paragraph(f"<para align=center><b>{file.filename}</b></para>", styleSheet["BodyText"]))
-            elements.append(Spacer(1, 12))
-
-            if inserted_students:
-                elements.append(Paragraph(f"Number of inserted students: {len(inserted_students)}"))
-                elements.append(Spacer(1, 12))
-                table = Table([["Student Number", "First Name", "Middle Name", "Last Name", "Email"]] + inserted_students)
-                table.setStyle(TableStyle([
-                    ('GRID', (0,0), (-1,-1), 1, colors.black),
-                    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                    ('FONTSIZE', (0,0), (-1,-1), 10),
-                ]))
-                elements.append(table)
-
-            if not_inserted_students_due_to_uniqueness:
-                elements.append(Spacer(1, 12))
-                elements.append(Paragraph(f"Number of not inserted students due to student number or email exists already: {len(not_inserted_students_due_to_uniqueness)}"))
-                elements.append(Spacer(1, 12))
-                table = Table([["Student Number", "First Name", "Middle Name", "Last Name", "Email"]] + not_inserted_students_due_to_uniqueness)
-                table.setStyle(TableStyle([
-                    ('GRID', (0,0), (-1,-1), 1, colors.black),
-                    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                    ('FONTSIZE', (0,0), (-1,-1), 10),
-                ]))
-                elements.append(table)
-
-            if incomplete_student_column:
-                elements.append(Spacer(1, 12))
-                elements.append(Paragraph(f"Number of not inserted students due to incomplete column value(s): {len(incomplete_student_column)}"))
-                elements.append(Spacer(1, 12))
-                table = Table([["Student Number", "First Name", "Middle Name", "Last Name", "Email"]] + incomplete_student_column)
-                table.setStyle(TableStyle([
-                    ('GRID', (0,0), (-1,-1), 1, colors.black),
-                    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                    ('FONTSIZE', (0,0), (-1,-1), 10),
-                ]))
-                elements.append(table)
-
-            elements.append(Spacer(1, 12))
-
-            if not removed_duplicates.empty:
-                elements.append(Paragraph(f"Number of removed duplicates: {len(removed_duplicates.values.tolist())}"))
-                elements.append(Spacer(1, 12))
-                table = Table([["Student Number", "First Name", "Middle Name", "Last Name", "Email"]] + removed_duplicates.values.tolist())
-                table.setStyle(TableStyle([
-                    ('GRID', (0,0), (-1,-1), 1, colors.black),
-                    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                    ('FONTSIZE', (0,0), (-1,-1), 10),
-                ]))
-                elements.append(table)
+            file_reports.append({
+                "filename": file.filename,
+                "inserted": inserted_students,
+                "not_inserted": not_inserted_students_due_to_uniqueness,
+                "incomplete": incomplete_student_column,
+                "removed_duplicates": removed_duplicates.values.tolist(),
+            })
+
+    if inserted_student_count > 0:
+        schedule_student_profile_refresh()
 
     if inserted_student_count > 0 or incomplete_student_column_count > 0:
-        # Save the PDF to a temporary file
+        # Render the PDF in memory, the uuid keeps reports made in the same second apart
         now = manila_now()
-        pdf_name = f"Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
-        doc = SimpleDocTemplate(pdf_name, pagesize=letter)
-        doc.build(elements)
+        pdf_name = f"Report_{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.pdf"
+        pdf_buffer = BytesIO()
+        build_insert_data_report(pdf_buffer, file_reports)
 
         # Upload to cloudinary
-        upload_result = cloudinary.uploader.upload(pdf_name, 
-                                            resource_type = "raw", 
-                                            public_id = f"InsertData/Reports/{pdf_name}",
-                                            tags=[pdf_name])
-        
-        # Delete the local file
-        os.remove(pdf_name)
+        upload_result = await upload(pdf_buffer.getvalue(),
+                                     resource_type = "raw", 
+                                     public_id = f"InsertData/Reports/{pdf_name}",
+                                     tags=[pdf_name])
 
     # Return the responses and a URL to download the PDF
         return JSONResponse({
@@ -916,7 +1229,8 @@ def student_Voting_Login(data: LoginData, db: Session = Depends(get_db)):
     
     # Loop over students in eligibles table and check each password
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    for student in db.query(Eligibles).filter(Eligibles.StudentNumber == StudentNumber).all():
+    # Eligibles whose password is still being generated or was never requested cannot log in yet
+    for student in db.query(Eligibles).filter(Eligibles.StudentNumber == StudentNumber, Eligibles.VotingPassword.isnot(None)).all():
         if pwd_context.verify(Password, student.VotingPassword):
             student_id = db.query(Student).filter(Student.StudentNumber == StudentNumber).first()
             student_id = student_id.StudentId
@@ -1011,50 +1325,32 @@ def get_Student_Organization(student_organization_id: int, db: Session = Depends
     student_organization["OrganizationLogo"] = student_organization["OrganizationLogo"]
     student_organization["AdviserImage"] = student_organization["AdviserImage"]
 
-    # Get officers
-    officers = db.query(OrganizationOfficer).filter(OrganizationOfficer.StudentOrganizationId == student_organization_id).all()
-
-    student_organization["officers"] = [officer.to_dict() for officer in officers]
+    # Get officers and members with their students, one query each
+    officers = db.query(OrganizationOfficer).options(selectinload(OrganizationOfficer.student)).\
+        filter(OrganizationOfficer.StudentOrganizationId == student_organization_id).all()
+    members = db.query(OrganizationMember).options(selectinload(OrganizationMember.student)).\
+        filter(OrganizationMember.StudentOrganizationId == student_organization_id).all()
 
-    # Attach student's data to officers base on student number
-    for officer in student_organization["officers"]:
-        student = db.query(Student).filter(Student.StudentNumber == officer["StudentNumber"]).first()
-        student_metadata = get_Student_Metadata_by_studnumber(student.StudentNumber)
-
-        if "CourseCode" in student_metadata:
-            student_year = student_metadata["Year"]
-
-        # Get the section of the student
-        student_section = get_Student_Section_by_studnumber(student.StudentNumber)
-
-        officer["FirstName"] = student.FirstName
-        officer["MiddleName"] = student.MiddleName if student.MiddleName else ''
-        officer["LastName"] = student.LastName
-        officer["CourseCode"] = student_metadata["CourseCode"] if "CourseCode" in student_metadata else ''
-        officer["Year"] = student_year if "Year" in student_metadata else ''
-        officer["Section"] = student_section if student_section else ''
+    # Course, year and section of everyone in one query
+    profiles = get_Student_Profiles_by_studnumbers([row.StudentNumber for row in officers + members], db)
 
-    # Get members
-    members = db.query(OrganizationMember).filter(OrganizationMember.StudentOrganizationId == student_organization_id).all()
-    student_organization["members"] = [member.to_dict() for member in members]
+    # Attach student's data to officers and members base on student number
+    for key, rows in [("officers", officers), ("members", members)]:
+        student_organization[key] = []
 
-    # Attach student's data to members base on student number
-    for member in student_organization["members"]:
-        student = db.query(Student).filter(Student.StudentNumber == member["StudentNumber"]).first()
-        student_metadata = get_Student_Metadata_by_studnumber(student.StudentNumber)
-
-        if "CourseCode" in student_metadata:
-            student_year = student_metadata["Year"]
+        for row in rows:
+            row_dict = row.to_dict()
+            student = row.student
+            profile = profiles.get(row.StudentNumber, {})
 
-        # Get the section of the student
-        student_section = get_Student_Section_by_studnumber(student.StudentNumber)
+            row_dict["FirstName"] = student.FirstName
+            row_dict["MiddleName"] = student.MiddleName if student.MiddleName else ''
+            row_dict["LastName"] = student.LastName
+            row_dict["CourseCode"] = profile.get("CourseCode") or ''
+            row_dict["Year"] = profile.get("Year") or ''
+            row_dict["Section"] = profile.get("Section") or ''
 
-        member["FirstName"] = student.FirstName
-        member["MiddleName"] = student.MiddleName if student.MiddleName else ''
-        member["LastName"] = student.LastName
-        member["CourseCode"] = student_metadata["CourseCode"] if "CourseCode" in student_metadata else ''
-        member["Year"] = student_year if "Year" in student_metadata else ''
-        member["Section"] = student_section if student_section else ''
+            student_organization[key].append(row_dict)
 
     return {"student_organization": student_organization}
 
@@ -1121,23 +1417,10 @@ async def student_Organization_Create(data: StudentOrganizationData, db: Session
 
     organization_logo_tag = 'OrganizationLogo' + str(organization.StudentOrganizationId)
     adviser_image_tag = 'AdviserImage' + str(organization.StudentOrganizationId)
-
-    # Upload the organization logo to cloudinary
-    upload_result1 = cloudinary.uploader.upload(data.organization_logo,
-                                        public_id = f"StudentOrganization/{data.organization_name + str(organization.StudentOrganizationId)}/Logo",
-                                        tags=[organization_logo_tag])
-    
-    # Upload the organization adviser image to cloudinary
-    upload_result2 = cloudinary.uploader.upload(data.organization_adviser_image,
-                                        public_id = f"StudentOrganization/{data.organization_name + str(organization.StudentOrganizationId)}/Adviser",
-                                        tags=[adviser_image_tag])
-    
-    organization.OrganizationLogo = upload_result1['secure_url']
-    organization.AdviserImage = upload_result2['secure_url']
-
-    db.commit()
+    organization_folder = f"StudentOrganization/{data.organization_name + str(organization.StudentOrganizationId)}"
             
     # Create the officers
+    new_officers = []
     for officer in data.officers:
         pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -1164,17 +1447,28 @@ async def student_Organization_Create(data: StudentOrganizationData, db: Session
         await student_officer_temp_password_queue.put((officer.student_number, student_email, pass_value))
 
         db.add(new_officer)
-        db.commit()
+        new_officers.append(new_officer)
 
+    db.commit() # Commit to get the officer ids used for the image tags
+
+    # Upload the organization logo, adviser image and every officer image concurrently
+    uploads = [
+        (data.organization_logo, {"public_id": f"{organization_folder}/Logo", "tags": [organization_logo_tag]}),
+        (data.organization_adviser_image, {"public_id": f"{organization_folder}/Adviser", "tags": [adviser_image_tag]}),
+    ]
+    for officer, new_officer in zip(data.officers, new_officers):
         officer_image_tag = 'OrganizationOfficer' + str(new_officer.OrganizationOfficerId)
+        uploads.append((officer.image, {"public_id": f"{organization_folder}/Officers/{officer.student_number}", "tags": [officer_image_tag]}))
 
-        # uplaod the officer image to cloudinary
-        upload_result3 = cloudinary.uploader.upload(officer.image,
-                                        public_id = f"StudentOrganization/{data.organization_name + str(organization.StudentOrganizationId)}/Officers/{officer.student_number}",
-                                        tags=[officer_image_tag])
+    upload_results = await upload_many(uploads)
 
-        new_officer.Image = upload_result3['secure_url']
-        db.commit()
+    organization.OrganizationLogo = upload_results[0]['secure_url']
+    organization.AdviserImage = upload_results[1]['secure_url']
+
+    for new_officer, upload_result in zip(new_officers, upload_results[2:]):
+        new_officer.Image = upload_result['secure_url']
+
+    db.commit()
 
     # Create the members
     for member in data.members:
@@ -1266,6 +1560,7 @@ class ElectionInfoData(BaseModel):
     appeal_start: datetime
     appeal_end: datetime
     created_by: str
+    just_in_time_credentials: bool = False
 
 class CreatedPositionData(BaseModel):
     value: str
@@ -1282,172 +1577,125 @@ class ElectionDelete(BaseModel):
     id: int
 
 """ ** GET Methods: All about election APIs ** """
-@router.get("/election/all", tags=["Election"])
-async def get_All_Election(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    elections = db.query(Election).order_by(Election.ElectionId).all()
-    elections_with_creator = []
-
-    for i, election in enumerate(elections):
-        creator = db.query(Student).filter(Student.StudentNumber == election.CreatedBy).first()
-        election_dict = election.to_dict(i+1)
-        election_dict["CreatedByName"] = (creator.FirstName + ' ' + (creator.MiddleName + ' ' if creator.MiddleName else '') + creator.LastName) if creator else ""
-
-        # Get the StudentOrganizationName of the election from the StudentOrganization table
-        student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
-        election_dict["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else ""
-        
-        # Get the organization logo using secure_url from cloudinary stored in OrganizationLogo column
-        election_dict["OrganizationLogo"] = student_organization.OrganizationLogo
-
-        # Get the OrganizationMemberRequirement of the election from the StudentOrganization table
-        student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
-        election_dict["OrganizationMemberRequirement"] = student_organization.OrganizationMemberRequirements if student_organization else ""
-
-        # Get the number of candidates in the election
-        candidates = db.query(Candidates).filter(Candidates.ElectionId == election.ElectionId).all()
-        election_dict["NumberOfCandidates"] = len(candidates)
-        
-        # Get the number of partylists in the election who is approved
-        partylists = db.query(PartyList).filter(PartyList.ElectionId == election.ElectionId, PartyList.Status == 'Approved').all()
-        election_dict["NumberOfPartylists"] = len(partylists)
-
-        # Get the number of positions in the election
-        positions = db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == election.ElectionId).all()
-        election_dict["NumberOfPositions"] = len(positions)
-        
-        # Get the CreatedElectionPositions of the election then append it to the election_dict
-        election_dict["Positions"] = [position.to_dict(i+1) for i, position in enumerate(positions)]
-
-        # Determine what election period
-        now = manila_now()
-        election_dict["ElectionPeriod"] = "Pre-Election"
-
-        if now < election.CampaignStart.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Filing Period"
-
-        if now < election.VotingStart.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Campaign Period"
+""" Method """
+def get_Elections_With_Details(query, db: Session):
+    # Creator, organization and positions are loaded with one query each for the whole list
+    elections = query.options(
+        selectinload(Election.creator),
+        selectinload(Election.organization),
+        selectinload(Election.positions)
+    ).order_by(Election.ElectionId).all()
 
-        if now < election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Voting Period"
+    election_ids = [election.ElectionId for election in elections]
 
-        else:
-            election_dict["ElectionPeriod"] = "Post-Election"
-        
-        elections_with_creator.append(election_dict)
+    candidate_counts = dict(db.query(Candidates.ElectionId, func.count(Candidates.CandidateId)).\
+        filter(Candidates.ElectionId.in_(election_ids)).group_by(Candidates.ElectionId).all())
 
-    return {"elections": elections_with_creator}
+    partylist_counts = dict(db.query(PartyList.ElectionId, func.count(PartyList.PartyListId)).\
+        filter(PartyList.ElectionId.in_(election_ids), PartyList.Status == 'Approved').group_by(PartyList.ElectionId).all())
 
-@router.get("/election/all/organization/{student_organization_id}", tags=["Election"])
-async def get_All_Election_By_Student_Organization_Id(student_organization_id: int, db: Session = Depends(get_db)):
-    elections = db.query(Election).filter(Election.StudentOrganizationId == student_organization_id).order_by(Election.ElectionId).all()
     elections_with_creator = []
 
+    # One clock reading for the whole list
+    now = manila_now()
+
     for i, election in enumerate(elections):
-        creator = db.query(Student).filter(Student.StudentNumber == election.CreatedBy).first()
+        creator = election.creator
         election_dict = election.to_dict(i+1)
         election_dict["CreatedByName"] = (creator.FirstName + ' ' + (creator.MiddleName + ' ' if creator.MiddleName else '') + creator.LastName) if creator else ""
 
         # Get the StudentOrganizationName of the election from the StudentOrganization table
-        student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
+        student_organization = election.organization
         election_dict["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else ""
         
         # Get the organization logo using secure_url from cloudinary stored in OrganizationLogo column
-        election_dict["OrganizationLogo"] = student_organization.OrganizationLogo
+        election_dict["OrganizationLogo"] = cached_image_url(student_organization.OrganizationLogo) if student_organization else ""
 
         # Get the OrganizationMemberRequirement of the election from the StudentOrganization table
-        student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
         election_dict["OrganizationMemberRequirement"] = student_organization.OrganizationMemberRequirements if student_organization else ""
 
         # Get the number of candidates in the election
-        candidates = db.query(Candidates).filter(Candidates.ElectionId == election.ElectionId).all()
-        election_dict["NumberOfCandidates"] = len(candidates)
+        election_dict["NumberOfCandidates"] = candidate_counts.get(election.ElectionId, 0)
         
         # Get the number of partylists in the election who is approved
-        partylists = db.query(PartyList).filter(PartyList.ElectionId == election.ElectionId, PartyList.Status == 'Approved').all()
-        election_dict["NumberOfPartylists"] = len(partylists)
+        election_dict["NumberOfPartylists"] = partylist_counts.get(election.ElectionId, 0)
 
         # Get the number of positions in the election
-        positions = db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == election.ElectionId).all()
+        positions = election.positions
         election_dict["NumberOfPositions"] = len(positions)
         
         # Get the CreatedElectionPositions of the election then append it to the election_dict
         election_dict["Positions"] = [position.to_dict(i+1) for i, position in enumerate(positions)]
 
         # Determine what election period
-        now = manila_now()
-        if now < election.CoCFilingStart.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Pre-Election"
-
-        if now > election.CoCFilingStart.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Filing Period"
+        election_dict["ElectionPeriod"] = get_election_phase(election, now)
 
-        if now > election.CampaignStart.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Campaign Period"
+        elections_with_creator.append(election_dict)
 
-        if now > election.VotingStart.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Voting Period"
+    return elections_with_creator
 
-        #if now > election.AppealStart.replace(tzinfo=timezone('Asia/Manila')):
-        #    election_dict["ElectionPeriod"] = "Appeal Period"
+@router.get("/election/all", tags=["Election"])
+async def get_All_Election(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    elections_with_creator = get_Elections_With_Details(db.query(Election), db)
 
-        if now > election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["ElectionPeriod"] = "Post-Election"
+    return ORJSONResponse({"elections": elections_with_creator})
 
-        elections_with_creator.append(election_dict)
+@router.get("/election/all/organization/{student_organization_id}", tags=["Election"])
+async def get_All_Election_By_Student_Organization_Id(student_organization_id: int, db: Session = Depends(get_db)):
+    elections_with_creator = get_Elections_With_Details(db.query(Election).filter(Election.StudentOrganizationId == student_organization_id), db)
 
-    return {"elections": elections_with_creator}
+    return ORJSONResponse({"elections": elections_with_creator})
 
 @router.get("/election/all/is-student-voted", tags=["Election"])
 def get_All_Election_Is_Student_Voted(student_number: str, db: Session = Depends(get_db)):
     # Get the student's course
     student = db.query(Student).filter(Student.StudentNumber == student_number).first()
-    student_course = get_Student_Course_by_studnumber(student_number, db)
+    student_course = get_Student_Course_by_studnumber(student_number, db, live=True)
 
     # Check if the student has voted in the election
-    elections = db.query(Election).order_by(Election.ElectionId).all()
+    elections = db.query(Election).options(
+        selectinload(Election.creator),
+        selectinload(Election.organization),
+        selectinload(Election.positions)
+    ).order_by(Election.ElectionId).all()
     elections_with_creator = []
     atleast_one_available_election = False
 
+    # The elections the student is eligible for and has voted in, instead of two lookups per election
+    eligible_election_ids = {election_id for election_id, in db.query(Eligibles.ElectionId).filter(Eligibles.StudentNumber == student_number).all()}
+    voted_election_ids = {election_id for election_id, in db.query(VotingsTracker.ElectionId).filter(VotingsTracker.VoterStudentNumber == student_number).distinct().all()}
+
     now = manila_now()
 
     for i, election in enumerate(elections):
-        creator = db.query(Student).filter(Student.StudentNumber == election.CreatedBy).first()
+        creator = election.creator
         election_dict = election.to_dict(i+1)
         election_dict["CreatedByName"] = (creator.FirstName + ' ' + (creator.MiddleName + ' ' if creator.MiddleName else '') + creator.LastName) if creator else ""
         
         # Return the OrganizationMemberRequirement of the election from the StudentOrganization table
-        student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
+        student_organization = election.organization
         election_dict["OrganizationMemberRequirement"] = student_organization.OrganizationMemberRequirements if student_organization else ""
 
         # Get the organization logo using secure_url from cloudinary stored in OrganizationLogo column
-        election_dict["OrganizationLogo"] = student_organization.OrganizationLogo
+        election_dict["OrganizationLogo"] = cached_image_url(student_organization.OrganizationLogo) if student_organization else ""
 
         # Check if voting period is over
-        if now >= election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
-            election_dict["IsVotingPeriodOver"] = True
-        else:
-            election_dict["IsVotingPeriodOver"] = False
+        phase = get_election_phase(election, now)
+        election_dict["IsVotingPeriodOver"] = phase == POST_ELECTION
 
         # Get the student in eligibles table with corresponding student number and election id
-        is_eligible = db.query(Eligibles).filter(Eligibles.StudentNumber == student_number, Eligibles.ElectionId == election.ElectionId).first()
-
-        if not is_eligible:
-            election_dict["IsStudentEligible"] = False
-        else:
-            election_dict["IsStudentEligible"] = True
+        is_eligible = election.ElectionId in eligible_election_ids
+        election_dict["IsStudentEligible"] = is_eligible
 
         # Check if the student's course matches the OrganizationMemberRequirement and it's within the voting period
-        if student_course == election_dict["OrganizationMemberRequirement"] and is_eligible and now > election.VotingStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
+        if student_course == election_dict["OrganizationMemberRequirement"] and is_eligible and phase == VOTING_PERIOD:
             atleast_one_available_election = True
 
         # Check if the student has voted in the election
-        student_voted = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == election.ElectionId, VotingsTracker.VoterStudentNumber == student_number).first()
-        election_dict["IsStudentVoted"] = True if student_voted else False
+        election_dict["IsStudentVoted"] = election.ElectionId in voted_election_ids
 
         # Get the CreatedElectionPositions of the election then append it to the election_dict
-        positions = db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == election.ElectionId).all()
-        election_dict["Positions"] = [position.to_dict(i+1) for i, position in enumerate(positions)]
+        election_dict["Positions"] = [position.to_dict(i+1) for i, position in enumerate(election.positions)]
 
         elections_with_creator.append(election_dict)
 
@@ -1464,15 +1712,14 @@ def get_Election_By_Id(id: int, db: Session = Depends(get_db)):
         student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
         
         # Get the student organization logo using secure_url from cloudinary stored in OrganizationLogo column
-        organization_logo = student_organization.OrganizationLogo
+        organization_logo = cached_image_url(student_organization.OrganizationLogo)
 
         NumberOfCandidates = db.query(Candidates).filter(Candidates.ElectionId == election.ElectionId).count()
         NumberOfPartylists = db.query(PartyList).filter(PartyList.ElectionId == election.ElectionId, PartyList.Status == 'Approved').count()
         NumberOfPositions = db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == election.ElectionId).count()
 
         # See if the voting period is ongoing or over
-        now = manila_now()
-        is_voting_over = now > election.VotingEnd.replace(tzinfo=timezone('Asia/Manila'))
+        is_voting_over = get_election_phase(election) == POST_ELECTION
 
         positions = db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == id).order_by(CreatedElectionPosition.CreatedElectionPositionId).all()
         student_organization_name = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first().OrganizationName
@@ -1504,19 +1751,19 @@ def get_All_Election_Position_Reusable(db: Session = Depends(get_db)):
 @router.get("/election/{id}/approved/coc/all", tags=["Election"])
 def get_All_Approved_Candidates_CoC_By_Election_Id(id: int, db: Session = Depends(get_db)):
     try:
-        cocs = db.query(CoC).filter(CoC.ElectionId == id, CoC.Status == "Approved").order_by(CoC.CoCId).all()
+        cocs = db.query(CoC).options(selectinload(CoC.student), joinedload(CoC.partylist)).\
+            filter(CoC.ElectionId == id, CoC.Status == "Approved").order_by(CoC.CoCId).all()
 
         # Get the student row from student table using the student number in the coc
         cocs_with_student = []
         for i, coc in enumerate(cocs):
-            student = db.query(Student).filter(Student.StudentNumber == coc.StudentNumber).first()
+            student = coc.student
             coc_dict = coc.to_dict(i+1)
             coc_dict["Student"] = student.to_dict() if student else {}
 
             # Get the party list name from partylist table using the partylist id in the coc
             if coc.PartyListId:
-                partylist = db.query(PartyList).filter(PartyList.PartyListId == coc.PartyListId).first()
-                coc_dict["PartyListName"] = partylist.PartyListName if partylist else ""
+                coc_dict["PartyListName"] = coc.partylist.PartyListName if coc.partylist else ""
 
             # Get the display photo from cloudinary using secure_url stored in DisplayPhoto column
             coc_dict["DisplayPhoto"] = coc.DisplayPhoto
@@ -1530,27 +1777,6 @@ def get_All_Approved_Candidates_CoC_By_Election_Id(id: int, db: Session = Depend
     
 
 """ ** POST Methods: All about election APIs ** """
-# Create a queue
-send_eligible_students_email_queue = asyncio.Queue()
-
-# Define a worker function
-async def send_eligible_students_email_worker():
-    while True:
-        # Get a task from the queue
-        task = await send_eligible_students_email_queue.get()
-
-        # Process the task
-        student_number, student_email, pass_code = task
-
-        # Run the send_eligible_students_email function in a separate thread
-        await asyncio.to_thread(send_eligible_students_email, student_number, student_email, pass_code)
-
-        # Indicate that the task is done
-        send_eligible_students_email_queue.task_done()
-
-# Start multiple workers in the background
-for _ in range(3):  # Adjust the number of workers based on your resources
-    asyncio.create_task(send_eligible_students_email_worker())
 
 print(manila_now())
 
@@ -1581,6 +1807,292 @@ def fetch_all_student_courses():
 def get_all_student_courses():
     return fetch_all_student_courses()
 
+ELIGIBLE_PASSWORD_BATCH_SIZE = 500
+
+# Queued emails only live in the memory of one worker, a password still unsent after this long is assumed lost and filled again
+ELIGIBLE_PASSWORD_DELIVERY_TIMEOUT_MINUTES = int(os.getenv("ELIGIBLE_PASSWORD_DELIVERY_TIMEOUT_MINUTES", 120))
+
+# bcrypt releases the GIL, so a batch of hashes runs on all cores
+password_hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+
+""" Method """
+def insert_eligibles(db: Session, election_id: int, member_requirement: str):
+    # One INSERT ... SELECT of every enrolled student (status 0) matching the course requirement, nothing is loaded here
+    enrolled = select(CourseEnrolled.StudentId).where(CourseEnrolled.StudentId == Student.StudentId, CourseEnrolled.Status == 0)
+
+    if member_requirement != "Any":
+        enrolled = enrolled.join(Course, Course.CourseId == CourseEnrolled.CourseId).where(Course.CourseCode == member_requirement)
+
+    now = manila_now()
+    eligible_students = select(literal(election_id), Student.StudentNumber, false(), null(), literal(now), literal(now)).\
+        where(exists(enrolled))
+
+    result = db.execute(insert(Eligibles).from_select(
+        ["ElectionId", "StudentNumber", "HasVotedOrAbstained", "VotingPassword", "created_at", "updated_at"],
+        eligible_students
+    ))
+    db.commit()
+
+    print(f"Inserted {result.rowcount} eligibles for election {election_id}")
+
+""" Method """
+def fill_eligible_password_batch(election_id: int, after_id: int):
+    # Hash and store the passwords of the next batch of eligibles, returns the last id and what is needed to email them
+    db = SessionLocal()
+
+    try:
+        rows = db.query(Eligibles.EligibleId, Eligibles.StudentNumber, Student.Email).\
+            join(Student, Student.StudentNumber == Eligibles.StudentNumber).\
+            filter(Eligibles.ElectionId == election_id, Eligibles.VotingPassword.is_(None), Eligibles.EligibleId > after_id).\
+            order_by(Eligibles.EligibleId).limit(ELIGIBLE_PASSWORD_BATCH_SIZE).all()
+
+        if not rows:
+            return None, []
+
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        pass_values = [''.join(random.choices(string.ascii_uppercase + string.digits, k=7)) for _ in rows]
+        hashed_passwords = list(password_hash_executor.map(pwd_context.hash, pass_values))
+
+        # Only where there is still no password, one set meanwhile is never overwritten
+        eligibles = Eligibles.__table__
+        db.execute(update(eligibles).
+                   where(eligibles.c.EligibleId == bindparam("eligible_id"), eligibles.c.VotingPassword.is_(None)).
+                   values(VotingPassword=bindparam("hashed_password"), updated_at=manila_now()),
+                   [{"eligible_id": row.EligibleId, "hashed_password": hashed_password} for row, hashed_password in zip(rows, hashed_passwords)])
+        db.commit()
+
+        # Emailed only when the stored password is the one hashed here
+        stored = dict(db.query(Eligibles.EligibleId, Eligibles.VotingPassword).filter(Eligibles.EligibleId.in_([row.EligibleId for row in rows])).all())
+
+        return rows[-1].EligibleId, [(row.EligibleId, hashed_password, row.StudentNumber, row.Email, pass_value)
+                                     for row, hashed_password, pass_value in zip(rows, hashed_passwords, pass_values)
+                                     if stored.get(row.EligibleId) == hashed_password]
+    finally:
+        db.close()
+
+""" Method """
+def send_eligible_password_email(eligible_id: int, hashed_password: str, student_number: str, student_email: str, pass_code: str):
+    # A password replaced or forgotten since it was queued would not work, it is not sent
+    db = SessionLocal()
+
+    try:
+        current = db.query(Eligibles.EligibleId).filter(Eligibles.EligibleId == eligible_id, Eligibles.VotingPassword == hashed_password).first()
+    finally:
+        db.close()
+
+    if not current:
+        return
+
+    send_eligible_students_email(student_number, student_email, pass_code)
+
+    # Marked after sending, a crash in between sends the password twice rather than never
+    db = SessionLocal()
+
+    try:
+        db.query(Eligibles).\
+            filter(Eligibles.EligibleId == eligible_id, Eligibles.VotingPassword == hashed_password).\
+            update({"PasswordSentAt": manila_now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+""" Method """
+def undelivered_voting_passwords(election_id: int):
+    return and_(Eligibles.ElectionId == election_id, Eligibles.VotingPassword.isnot(None),
+                Eligibles.PasswordSentAt.is_(None), Eligibles.HasVotedOrAbstained.is_(False))
+
+""" Method """
+def forget_lost_voting_passwords(db: Session, election_id: int):
+    # Still unsent after the timeout, the email was lost with the worker that queued it
+    lost_before = manila_now() - timedelta(minutes=ELIGIBLE_PASSWORD_DELIVERY_TIMEOUT_MINUTES)
+
+    db.query(Eligibles).\
+        filter(undelivered_voting_passwords(election_id), Eligibles.updated_at < lost_before).\
+        update({"VotingPassword": None, "updated_at": manila_now()}, synchronize_session=False)
+    db.commit()
+
+# A failing batch is tried again a few times, then the whole fill is rescheduled
+ELIGIBLE_PASSWORD_BATCH_ATTEMPTS = 3
+ELIGIBLE_PASSWORD_RETRY_SECONDS = int(os.getenv("ELIGIBLE_PASSWORD_RETRY_SECONDS", 60))
+
+def fill_eligible_passwords(election_id: int):
+    # Batch by batch so memory stays the same whatever the number of students.
+    # Only eligibles without a password are picked, so a fill stopped halfway resumes where it was.
+    # Passwords whose email failed or was lost are cleared first, so they are filled and sent again too.
+    db = SessionLocal()
+
+    try:
+        forget_lost_voting_passwords(db, election_id)
+    finally:
+        db.close()
+
+    after_id = 0
+    failures = 0
+
+    while True:
+        try:
+            next_after_id, emails = fill_eligible_password_batch(election_id, after_id)
+        except Exception as e:
+            failures += 1
+
+            if failures < ELIGIBLE_PASSWORD_BATCH_ATTEMPTS:
+                print(f"Error while filling eligible passwords for election {election_id}, retrying: {e}")
+                time.sleep(2 ** failures)
+                continue
+
+            print(f"Error while filling eligible passwords for election {election_id}, rescheduled: {e}")
+            schedule_eligible_password_fill(election_id, ELIGIBLE_PASSWORD_RETRY_SECONDS)
+            return
+
+        failures = 0
+
+        if next_after_id is None:
+            break
+
+        after_id = next_after_id
+
+        # Bulk lane, verification codes sent meanwhile still go first. An email that fails every retry clears its password.
+        for eligible_id, hashed_password, *email in emails:
+            queue_email(send_eligible_password_email, eligible_id, hashed_password, *email,
+                        on_failure=lambda eligible_id=eligible_id, hashed_password=hashed_password: forget_voting_password(eligible_id, hashed_password))
+
+    # Come back once the emails had time to go out, whatever is still unsent by then is filled again
+    db = SessionLocal()
+
+    try:
+        now = manila_wall_clock()
+        unsent = db.query(Eligibles.EligibleId).\
+            join(Election, Election.ElectionId == Eligibles.ElectionId).\
+            filter(undelivered_voting_passwords(election_id), Election.VotingEnd > now).first()
+    finally:
+        db.close()
+
+    if unsent:
+        schedule_eligible_password_fill(election_id, ELIGIBLE_PASSWORD_DELIVERY_TIMEOUT_MINUTES * 60)
+
+""" Method """
+def schedule_eligible_password_fill(election_id: int, delay_seconds: int = 0):
+    # A job in the shared jobstore survives a restart of the worker that created the election
+    trigger = DateTrigger(run_date=manila_now() + timedelta(seconds=delay_seconds), timezone=timezone('Asia/Manila'))
+    scheduler.add_job(fill_eligible_passwords, trigger=trigger, id=f'fill_passwords_{election_id}', args=[election_id], replace_existing=True)
+
+def schedule_unfinished_eligible_password_fills():
+    # Elections whose fill was interrupted before every eligible got a password, or before every password was emailed
+    db = SessionLocal()
+
+    try:
+        now = manila_wall_clock()
+        missing_password = db.query(Eligibles.EligibleId).\
+            filter(Eligibles.ElectionId == Election.ElectionId,
+                   or_(Eligibles.VotingPassword.is_(None), undelivered_voting_passwords(Election.ElectionId)))
+        elections = db.query(Election.ElectionId).\
+            filter(Election.VotingEnd > now, Election.JustInTimeCredentials.is_(False), missing_password.exists()).all()
+    finally:
+        db.close()
+
+    for (election_id,) in elections:
+        schedule_eligible_password_fill(election_id)
+
+# A student can ask for a new identity code at most once per cooldown
+VOTING_CREDENTIAL_COOLDOWN_SECONDS = int(os.getenv("VOTING_CREDENTIAL_COOLDOWN_SECONDS", 300))
+
+# Wrong codes allowed before the code is revoked and a new one has to be requested
+VOTING_CREDENTIAL_MAX_ATTEMPTS = int(os.getenv("VOTING_CREDENTIAL_MAX_ATTEMPTS", 5))
+
+class VotingCredentialRequest(BaseModel):
+    StudentNumber: str
+    VerificationCode: Optional[str] = None
+
+""" Method """
+def forget_voting_password(eligible_id: int, hashed_password: str):
+    # The password email never arrived, clear it so a new one is issued without asking for a code
+    db = SessionLocal()
+
+    try:
+        db.query(Eligibles).\
+            filter(Eligibles.EligibleId == eligible_id, Eligibles.VotingPassword == hashed_password).\
+            update({"VotingPassword": None, "updated_at": manila_now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+""" Method """
+def voting_credential_code_type(election_id: int):
+    # Never issued by the code endpoints, their types are always under student_code_type
+    return f"VotingCredential:{election_id}"
+
+@router.post("/election/{id}/voting-credential", tags=["Election"])
+async def request_Voting_Credential(id: int, data: VotingCredentialRequest, db: Session = Depends(get_db)):
+    election = db.query(Election).filter(Election.ElectionId == id).first()
+
+    if not election:
+        return JSONResponse(status_code=404, content={"error": "Election not found."})
+
+    if not election.JustInTimeCredentials:
+        return JSONResponse(status_code=400, content={"error": "Voting passwords of this election were already sent by email."})
+
+    if get_election_phase(election) == POST_ELECTION:
+        return JSONResponse(status_code=400, content={"error": "The election has already ended."})
+
+    eligible = db.query(Eligibles.EligibleId, Eligibles.HasVotedOrAbstained, Eligibles.VotingPassword, Student.Email).\
+        join(Student, Student.StudentNumber == Eligibles.StudentNumber).\
+        filter(Eligibles.ElectionId == id, Eligibles.StudentNumber == data.StudentNumber).first()
+
+    if not eligible:
+        return JSONResponse(status_code=404, content={"error": "Student is not eligible in this election."})
+
+    if eligible.HasVotedOrAbstained:
+        return JSONResponse(status_code=400, content={"error": "Student has already voted or abstained."})
+
+    code_type = voting_credential_code_type(id)
+
+    # An issued password is never replaced on a student number alone, that would let anyone lock a student out.
+    # The student first proves they own the email address with a code sent to it.
+    if eligible.VotingPassword is not None:
+        if data.VerificationCode is None:
+            expires_in = code_store.expires_in(data.StudentNumber, code_type)
+
+            if expires_in is not None:
+                retry_after = VOTING_CREDENTIAL_COOLDOWN_SECONDS - (CODE_TTL_SECONDS - expires_in)
+
+                if retry_after > 0:
+                    return JSONResponse(status_code=429, content={"error": "A verification code was sent recently, please check your email."},
+                                        headers={"Retry-After": str(int(retry_after) + 1)})
+
+            code_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+            code_store.issue(data.StudentNumber, code_type, code_value)
+            queue_email(send_verification_code_email, data.StudentNumber, eligible.Email, code_value, priority=HIGH_PRIORITY,
+                        on_failure=lambda: code_store.consume(data.StudentNumber, code_type, code_value))
+
+            return {"message": "Your voting password was already sent. Enter the verification code sent to your email to get a new one.",
+                    "verification_required": True}
+
+        if not code_store.consume(data.StudentNumber, code_type, data.VerificationCode):
+            if code_store.record_failed_attempt(data.StudentNumber, code_type, VOTING_CREDENTIAL_MAX_ATTEMPTS):
+                return JSONResponse(status_code=400, content={"error": "Too many invalid verification codes, please request a new one."})
+
+            return JSONResponse(status_code=400, content={"error": "Verification code is invalid."})
+
+    # Only hashed once the request is allowed to set a password
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pass_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
+    hashed_password = await asyncio.to_thread(pwd_context.hash, pass_value)
+
+    # Compare against the password read above in the same UPDATE so two requests cannot both set one
+    current_password = Eligibles.VotingPassword.is_(None) if eligible.VotingPassword is None else Eligibles.VotingPassword == eligible.VotingPassword
+    issued = db.query(Eligibles).\
+        filter(Eligibles.EligibleId == eligible.EligibleId, current_password).\
+        update({"VotingPassword": hashed_password, "updated_at": manila_now()}, synchronize_session=False)
+    db.commit()
+
+    if not issued:
+        return JSONResponse(status_code=409, content={"error": "A voting password was just sent, please check your email."})
+
+    queue_email(send_eligible_password_email, eligible.EligibleId, hashed_password, data.StudentNumber, eligible.Email, pass_value,
+                priority=HIGH_PRIORITY, on_failure=lambda: forget_voting_password(eligible.EligibleId, hashed_password))
+
+    return {"message": "Voting password sent to your email."}
+
 @router.get("/election/students-status-0", tags=["Election"])
 def get_students_status_0(db: Session = Depends(get_db)):
     # Count how many students have status 0 and course is BSIT
@@ -1609,6 +2121,7 @@ async def save_election(election_data: CreateElectionData, db: Session = Depends
                             VotingEnd=election_data.election_info.voting_end,
                             AppealStart=election_data.election_info.voting_end, # Soft delete so set to voting end
                             AppealEnd=election_data.election_info.voting_end, # Soft delete so set to voting end
+                            JustInTimeCredentials=election_data.election_info.just_in_time_credentials,
                             created_at=manila_now(), 
                             updated_at=manila_now())
     db.add(new_election)
@@ -1633,80 +2146,23 @@ async def save_election(election_data: CreateElectionData, db: Session = Depends
 
     # Insert students to eligibles table if matches with student organization member requirement or if the student org requirement is any course
     student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == new_election.StudentOrganizationId).first()
-    
-    student_emails_to_find = ["iammeliodas123@gmail.com", 
-                              "iammeliodas12345@gmail.com", 
-                              "iammeliodas123456@gmail.com",
-                              "student2.sge@gmail.com",
-                              "student3.sge@gmail.com"]
-
-    if student_organization.OrganizationMemberRequirements == "Any":
-        students = db.query(Student).all()
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        new_eligibles = []
-
-        # Get all student statuses at once
-        student_statuses = fetch_all_student_statuses()
-
-        for student in students:
-            # Use the dictionary to check the student's status
-            if student_statuses.get(student.StudentNumber) == 0:
-
-                pass_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
-                hashed_password = pwd_context.hash(pass_value)
-                student_email = student.Email
-
-                new_eligible = Eligibles(ElectionId=new_election.ElectionId,
-                                        StudentNumber=student.StudentNumber,
-                                        HasVotedOrAbstained=False,
-                                        VotingPassword=hashed_password,
-                                        created_at=manila_now(), 
-                                        updated_at=manila_now())
-                new_eligibles.append(new_eligible)
-
-                #await send_eligible_students_email_queue.put((student.StudentNumber, student_email, pass_value))
-                send_eligible_students_email_queue.put_nowait((student.StudentNumber, student_email, pass_value))
-
-        db.add_all(new_eligibles)
-        db.commit()
-    
-    # If the student organization member requirement is not any course, insert students to eligibles table if matches with student organization member requirement
-    else:
-        students = db.query(Student).all()
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        new_eligibles = []
-
-        # Get all student statuses and courses at once
-        student_statuses = fetch_all_student_statuses()
-        student_courses = fetch_all_student_courses()
-
-        for student in students:
-            # Use the dictionaries to check the student's status and course
-            if student_statuses.get(student.StudentNumber) == 0 and \
-            student_courses.get(student.StudentNumber) == student_organization.OrganizationMemberRequirements:
-
-                pass_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
-                hashed_password = pwd_context.hash(pass_value)
-                student_email = student.Email
-
-                new_eligible = Eligibles(ElectionId=new_election.ElectionId,
-                                        StudentNumber=student.StudentNumber,
-                                        HasVotedOrAbstained=False,
-                                        VotingPassword=hashed_password,
-                                        created_at=manila_now(), 
-                                        updated_at=manila_now())
-                new_eligibles.append(new_eligible)
+    insert_eligibles(db, new_election.ElectionId, student_organization.OrganizationMemberRequirements)
 
-                #await send_eligible_students_email_queue.put((student.StudentNumber, student_email, pass_value))
-                send_eligible_students_email_queue.put_nowait((student.StudentNumber, student_email, pass_value))
-
-        db.add_all(new_eligibles)
-        db.commit()
+    # Passwords are hashed and emailed in batches by the scheduler, or requested by each student in just in time mode
+    if not new_election.JustInTimeCredentials:
+        schedule_eligible_password_fill(new_election.ElectionId)
 
     # Schedule the get_winners function to run at election.VotingEnd
     try:
         trigger = DateTrigger(run_date=new_election.VotingEnd, timezone=timezone('Asia/Manila'))
-        scheduler.add_job(gather_winners_by_election_id, trigger=trigger, id=f'gather_winners_{new_election.ElectionId}', args=[new_election.ElectionId])
+        scheduler.add_job(gather_winners_by_election_id, trigger=trigger, id=f'gather_winners_{new_election.ElectionId}', args=[new_election.ElectionId], replace_existing=True)
+
+        # Prefetch candidate photos and the organization logo once the voting period starts
+        trigger = DateTrigger(run_date=new_election.VotingStart, timezone=timezone('Asia/Manila'))
+        scheduler.add_job(prefetch_election_images, trigger=trigger, id=f'prefetch_images_{new_election.ElectionId}', args=[new_election.ElectionId], replace_existing=True)
+
+        # Phase transition events for the caches keyed on the election period
+        schedule_phase_transitions(new_election)
         print("Scheduled!")
     except Exception as e:
         print(f"Error while scheduling: {e}")
@@ -1739,11 +2195,13 @@ def delete_Election_Position_Reusable(data: SaveReusablePositionData, db: Sessio
 
     return {"message": f"Position {capitalized_first_letter} is not re-usable anymore."}
 
+# Children before parents so no foreign key is ever left pointing at a deleted row
+ELECTION_CHILD_TABLES = [BallotSnapshot, VotingsTracker, CandidateCourseTally, RatingsTracker, ElectionAnalytics, ElectionWinners, Eligibles,
+                         VotingReceipt, CertificationJobs, Certifications, Candidates, CoC, PartyList, CreatedElectionPosition]
+
 def delete_rows(db: Session, table, election_id: int):
-    rows = db.query(table).filter(table.ElectionId == election_id).all()
-    for row in rows:
-        db.delete(row)
-    db.commit()
+    # One DELETE statement, the rows are never loaded into the session
+    return db.query(table).filter(table.ElectionId == election_id).delete(synchronize_session=False)
 
 @router.post("/election/delete", tags=["Election"])
 def delete_Election(data: ElectionDelete, db: Session = Depends(get_db)):
@@ -1751,16 +2209,35 @@ def delete_Election(data: ElectionDelete, db: Session = Depends(get_db)):
     if not election:
         return {"error": "Election not found"}
 
-    # DELETE ALL REFERENCED ROWS with the election id
-    tables = [CreatedElectionPosition, CoC, ElectionAnalytics, Candidates, PartyList, RatingsTracker, VotingsTracker, Eligibles, ElectionWinners]
-    for table in tables:
-        delete_rows(db, table, data.id)
+    election_name = election.ElectionName
 
-    # FINALLY DELETE ELECTION with the election id
-    db.delete(election)
-    db.commit()
+    try:
+        # Signatories hang off the certifications, not the election
+        certification_ids = db.query(Certifications.CertificationId).filter(Certifications.ElectionId == data.id)
+        db.query(CreatedAdminSignatory).filter(CreatedAdminSignatory.CertificationId.in_(certification_ids.scalar_subquery())).\
+            delete(synchronize_session=False)
+
+        # DELETE ALL REFERENCED ROWS with the election id
+        for table in ELECTION_CHILD_TABLES:
+            delete_rows(db, table, data.id)
 
-    return {"message": f"Election {election.ElectionName} was deleted successfully."}
+        # FINALLY DELETE ELECTION with the election id, everything in one transaction
+        db.query(Election).filter(Election.ElectionId == data.id).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error while deleting election {data.id}: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Error while deleting the election"})
+
+    forget_election(data.id)
+    invalidate_candidate_list(data.id)
+
+    # The per election jobs would otherwise run against an election that no longer exists
+    for job_id in [f'gather_winners_{data.id}', f'prefetch_images_{data.id}', f'fill_passwords_{data.id}']:
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+
+    return {"message": f"Election {election_name} was deleted successfully."}
 
 #################################################################
 """ Announcement Table APIs """
@@ -1869,17 +2346,22 @@ async def save_Announcement(type_select: str = Form(...), title_input: str = For
         if attachment_images:
             # Use the ID of the new announcement as the subfolder name under 'Announcements'            
             folder_name = f"Announcements/announcement_{new_announcement.AnnouncementId}"
+            tag_name = f'announcement_{new_announcement.AnnouncementId}'
 
+            uploads = []
             for attachment_image in attachment_images:
                 contents = await attachment_image.read()
                 filename = attachment_image.filename
 
                 # Upload file to Cloudinary with the folder name in the public ID
-                response = cloudinary.uploader.upload(contents, public_id=f"{folder_name}/{filename}", tags=[f'announcement_{new_announcement.AnnouncementId}'])
+                uploads.append((contents, {"public_id": f"{folder_name}/{filename}", "tags": [tag_name]}))
+
+            # Upload all attachments concurrently
+            await upload_many(uploads)
 
-                # Store the URL in the AttachmentImage column
-                new_announcement.AttachmentImage = f'announcement_{new_announcement.AnnouncementId}'
-                db.commit()
+            # Store the tag in the AttachmentImage column
+            new_announcement.AttachmentImage = tag_name
+            db.commit()
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while uploading attachment to Cloudinary"})
 
@@ -1919,17 +2401,22 @@ async def update_Announcement(id_input: int = Form(...), type_select: str = Form
 
         if new_files and attachments_modified:
             # Check for new files
+            uploads = []
             for new_file in new_files:
                 # This is a new file, upload it to Cloudinary
                 contents = await new_file.read()
                 filename = new_file.filename
 
                 # Upload file to Cloudinary with the folder name in the public ID
-                response = cloudinary.uploader.upload(contents, public_id=f"{folder_name}/{filename}", tags=[tag_name])
+                uploads.append((contents, {"public_id": f"{folder_name}/{filename}", "tags": [tag_name]}))
+
+            # Upload all new files concurrently
+            responses = await upload_many(uploads)
 
-                # Add the name and URL of the uploaded file to the list
+            # Add the name and URL of the uploaded files to the list
+            for new_file, response in zip(new_files, responses):
                 uploaded_files.append({
-                    'name': filename,
+                    'name': new_file.filename,
                     'url': response['url']
                 })
 
@@ -2209,26 +2696,29 @@ class CertificationData(BaseModel):
 
 """ ** GET Methods: Certifications Table APIs ** """
 @router.get("/certification/all", tags=["Certification"])
-def get_All_Certification(db: Session = Depends(get_db)):
+def get_All_Certification(after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), fields: Optional[str] = None, db: Session = Depends(get_db)):
     try:
-        certifications = db.query(Certifications).order_by(Certifications.CertificationId).all()
+        try:
+            selected = parse_fields(fields, [column.key for column in Certifications.__table__.columns] + ["ElectionName"])
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+
+        certifications = paginate(db.query(Certifications).options(joinedload(Certifications.election)), Certifications.CertificationId, after, limit).all()
         certifications_with_election = []
 
         for i, certification in enumerate(certifications):
-            election = db.query(Election).filter(Election.ElectionId == certification.ElectionId).first()
+            election = certification.election
             certification_dict = certification.to_dict()
             certification_dict["ElectionName"] = election.ElectionName if election else ""
 
             certifications_with_election.append(certification_dict)
 
-        return {"certifications": certifications_with_election}
+        return paginated_response({"certifications": project(certifications_with_election, selected)}, total_count(db, Certifications.CertificationId),
+                                  certifications[-1].CertificationId if certifications else None, len(certifications), limit)
     
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all certifications from the database"})
 
-def remove_file(path: str):
-    os.remove(path)
-
 @router.get("/certification/preview/{id}", tags=["Certification"])
 def preview_Certification(id: int, db: Session = Depends(get_db)):
     certification = db.query(Certifications).get(id)
@@ -2249,7 +2739,7 @@ def preview_Certification(id: int, db: Session = Depends(get_db)):
         return {"pdf": ''}
 
 @router.get("/certification/download/{id}", tags=["Certification"])
-def download_Certification(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def download_Certification(id: int, db: Session = Depends(get_db)):
     certification = db.query(Certifications).get(id)
 
     if not certification:
@@ -2257,24 +2747,14 @@ def download_Certification(id: int, background_tasks: BackgroundTasks, db: Sessi
 
     try:
         if certification.AssetId:
-            pdf_certificate = certification.AssetId
-
-            # Download the pdf
-            pdf = requests.get(pdf_certificate)
-
-            # Save the pdf with student number as filename
-            filename = f"{certification.StudentNumber}.pdf"
-            with open(filename, 'wb') as f:
-                f.write(pdf.content)
-
-            # Schedule the file to be deleted after the response is sent
-            background_tasks.add_task(remove_file, filename)
-
-            # Return the pdf
-            return FileResponse(filename, media_type="application/pdf", filename=filename)
+            # Stream the pdf with student number as filename
+            return await stream_remote_file(certification.AssetId, f"{certification.StudentNumber}.pdf")
         else:
             print("No resources found")
             return {"pdf": ''}
+    except HTTPException:
+        # The storage error from stream_remote_file, already a proper response
+        raise
     except Exception as e:
         print(f"Error fetching pdf from Cloudinary: {e}")
         return {"pdf": ''}
@@ -2295,182 +2775,174 @@ def preview_Signed_Certification(id: int, db: Session = Depends(get_db)):
     return {"pdf": certification_signed.FileURL}
 
 @router.get("/certification/signed/download/{id}", tags=["Certification"])
-def download_Signed_Certification(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def download_Signed_Certification(id: int, db: Session = Depends(get_db)):
     certification_signed = db.query(CertificationsSigned).get(id)
 
     if not certification_signed:
         return JSONResponse(status_code=404, content={"detail": "Certification not found"})
 
-    # Download the pdf
-    pdf = requests.get(certification_signed.FileURL)
+    # Stream the pdf with the certification title as filename
+    return await stream_remote_file(certification_signed.FileURL, f"{certification_signed.CertificationTitle}.pdf")
 
-    # Save the pdf with student number as filename
-    filename = f"{certification_signed.CertificationTitle}.pdf"
-    with open(filename, 'wb') as f:
-        f.write(pdf.content)
+@router.get("/certification/jobs/{id}", tags=["Certification"])
+def get_Certification_Job_By_Id(id: int, db: Session = Depends(get_db)):
+    certification_job = db.query(CertificationJobs).get(id)
 
-    # Schedule the file to be deleted after the response is sent
-    background_tasks.add_task(remove_file, filename)
+    if not certification_job:
+        return JSONResponse(status_code=404, content={"detail": "Certification job not found"})
 
-    # Return the pdf
-    return FileResponse(filename, media_type="application/pdf", filename=filename)
+    return {"certification_job": certification_job.to_dict()}
 
 """ ** POST Methods: Certifications Table APIs ** """
-class SignatureLine(Flowable):
-    def __init__(self, width):
-        Flowable.__init__(self)
-        self.width = width
 
-    def draw(self):
-        self.canv.line(self.width, 0, 0, 0)  # Start from the right and extend to the left
+# Oath of office PDFs are rendered in separate processes so a big batch does not hold the GIL of the API process.
+# Spawned workers only import pdf_templates, not this module.
+certification_render_pool = ProcessPoolExecutor(max_workers=int(os.getenv("CERTIFICATION_RENDER_WORKERS", 2)),
+                                                mp_context=multiprocessing.get_context("spawn"))
+
+""" Method """
+def update_certification_job(certification_job_id: int, status: Optional[str] = None):
+    # Without a status, the job is finished and its status depends on the failures
+    db = SessionLocal()
+
+    try:
+        certification_job = db.query(CertificationJobs).get(certification_job_id)
+
+        if status is None:
+            status = "Completed" if certification_job.Failed == 0 else "Completed with errors"
+
+        certification_job.Status = status
+        certification_job.updated_at = manila_now()
+        db.commit()
+    finally:
+        db.close()
+
+""" Method """
+def record_certification_result(certification_job_id: int, certification_id: int, asset_url: Optional[str]):
+    # Own session per call, these run on executor threads while other certifications are still rendering
+    db = SessionLocal()
+
+    try:
+        if asset_url:
+            db.query(Certifications).filter(Certifications.CertificationId == certification_id).update({"AssetId": asset_url, "updated_at": manila_now()}, synchronize_session=False)
+            counter = {"Completed": CertificationJobs.Completed + 1}
+        else:
+            counter = {"Failed": CertificationJobs.Failed + 1}
+
+        # Incremented in SQL so concurrent results never overwrite each other
+        db.query(CertificationJobs).filter(CertificationJobs.CertificationJobId == certification_job_id).\
+            update({**counter, "updated_at": manila_now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+async def run_certification_job(certification_job_id: int, certifications: list, signatories: list):
+    # certifications is a list of (certification id, date, winner full name, winner position).
+    # Every database call goes through the executor so none of them blocks the event loop.
+    loop = asyncio.get_running_loop()
+
+    try:
+        await loop.run_in_executor(None, update_certification_job, certification_job_id, "Processing")
+
+        async def create_one(certification_id, certification_date, winner_full_name, winner_position):
+            asset_url = None
+
+            try:
+                pdf = await loop.run_in_executor(certification_render_pool, render_oath_of_office,
+                                                 certification_date, winner_full_name, winner_position, signatories)
+
+                # Named by certification id so certifications never overwrite each other
+                upload_result = await upload(pdf,
+                                             resource_type = "raw",
+                                             public_id = f"Directory/Certifications/certification_{certification_id}.pdf",
+                                             tags=[f'certification_{certification_id}'])
+                asset_url = upload_result['secure_url']
+            except Exception as e:
+                print(f"Error while creating certification {certification_id}: {e}")
+
+            await loop.run_in_executor(None, record_certification_result, certification_job_id, certification_id, asset_url)
+
+        await asyncio.gather(*(create_one(*certification) for certification in certifications))
+
+        await loop.run_in_executor(None, update_certification_job, certification_job_id)
+    except Exception as e:
+        print(f"Error while running certification job {certification_job_id}: {e}")
+        await loop.run_in_executor(None, update_certification_job, certification_job_id, "Failed")
 
 @router.post("/certification/create", tags=["Certification"])
-def create_Certification(certification_data: CertificationData, db: Session = Depends(get_db)):
+def create_Certification(certification_data: CertificationData, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     # Fetch the election winners from the ElectionWinners table using the election id and must not tied
     election_winners = db.query(ElectionWinners).filter(ElectionWinners.ElectionId == certification_data.election_id).filter(ElectionWinners.IsTied == False).all()
 
-    # Iterate over each election winner
-    for winner in election_winners:
-        # Fetch the student from the Student table
-        student = db.query(Student).filter(Student.StudentNumber == winner.StudentNumber).first()
+    # Fetch all the winners' student rows in one query
+    winner_student_numbers = [winner.StudentNumber for winner in election_winners]
+    students = {student.StudentNumber: student for student in db.query(Student).filter(Student.StudentNumber.in_(winner_student_numbers)).all()}
 
-        # Get student full name and consider the middle name
-        winner_full_name = f"{student.FirstName} {student.MiddleName} {student.LastName}" if student.MiddleName else f"{student.FirstName} {student.LastName}"
+    new_certifications = []
+    certifications_to_render = []
+
+    for winner in election_winners:
+        student = students.get(winner.StudentNumber)
 
-        # Get student selected position
-        winner_position = winner.SelectedPositionName
+        if not student:
+            continue
 
         new_certification = Certifications(Title=certification_data.title,
                                             ElectionId=certification_data.election_id,
                                             StudentNumber=student.StudentNumber,
                                             Date=certification_data.date,
                                             AdminSignatoryQuantity=certification_data.quantity,
-                                            AssetId='', # Initialize first
+                                            AssetId='', # Initialize first, filled by the certification job
                                             created_at=manila_now(),
                                             updated_at=manila_now())
-        db.add(new_certification)
-        db.commit()
-
-        for signatory in certification_data.signatories:
-            new_signatory = CreatedAdminSignatory(CertificationId=new_certification.CertificationId,
-                                        SignatoryName=signatory.name,
-                                        SignatoryPosition=signatory.position,
-                                        created_at=manila_now(),
-                                        updated_at=manila_now())
-            db.add(new_signatory)
-            db.commit()
-
-        # Create the PDF
-        now = manila_now()
-        pdf_name = f"Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
-        doc = SimpleDocTemplate(pdf_name, pagesize=letter, topMargin=36)
-
-        # Get the default style sheet
-        styles = getSampleStyleSheet()
-
-        # Create a list to hold the PDF elements
-        elements = []
-
-        # Styles
-        styles.add(ParagraphStyle(name="SchoolStyle", fontName="Times-Roman", fontSize=18, alignment=TA_CENTER, spaceAfter=10))
-        styles.add(ParagraphStyle(name="BranchStyle", fontSize=16, alignment=TA_CENTER, spaceAfter=18))
-        styles.add(ParagraphStyle(name="TitleStyle", fontName="Times-Roman", bold=True, fontSize=24, alignment=TA_CENTER, spaceAfter=26))
-        styles.add(ParagraphStyle(name="ParagraphStyle", fontName="Times-Roman", fontSize=12, alignment=TA_JUSTIFY, spaceAfter=6, leading=12, firstLineIndent=36))
-        styles.add(ParagraphStyle(name="ParagraphStyle2", fontName="Times-Roman", fontSize=12, alignment=TA_LEFT, spaceAfter=6, leading=12))
-
-        # Add the logo
-        logo = Image("puplogo.png", width=80, height=80)  # Adjust the path and size as needed
-        elements.append(logo)
-        elements.append(Spacer(1, 12))
-
-        school = Paragraph("Polytechnic University of the Philippines", styles["SchoolStyle"])
-        elements.append(school)
-        elements.append(Spacer(1, 2))
-
-        branch = Paragraph("QUEZON CITY CAMPUS", styles["BranchStyle"])
-        elements.append(branch)
-        elements.append(Spacer(1, 12))
-
-        date = Paragraph('<para align="right">' + certification_data.date.strftime("%B %d, %Y") + '</para>', styles["Normal"])
-        elements.append(date)
-        elements.append(Spacer(1, 24))
-
-        title = Paragraph("<b>OATH OF OFFICE</b>", styles["TitleStyle"])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
-
-        # Add the first part of the content (justified)
-        text = f'''
-        \tI, <b>{winner_full_name}</b>, having been elected as <b>{winner_position}</b> of
-        the Supreme Student Council of the Polytechnic University of
-        the Philippines, Quezon City do solemnly swear that:
-        '''
-        paragraph = Paragraph(text, styles["ParagraphStyle"])
-        elements.append(paragraph)
-        elements.append(Spacer(1, 12))
-
-        # Add the second part of the content
-        text = f'''
-            I will maintain allegiance to the Republic of the Philippines<br/>
-            I will abide by laws of the Supreme Student Council and the<br/>
-            &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;Polytechnic University Of The Philippines;<br/>
-            I will perform my duties and responsibilities as <b>{winner_position}</b>,<br/>
-            &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;and conduct myself as a true professional according to<br/>
-            &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;best of my duty knowledge and discretion.<br/>
-
-            So help me God.
-            '''
-        paragraph = Paragraph(text, styles["ParagraphStyle2"])
-        paragraph_table = Table([[paragraph]], colWidths=[300], hAlign='CENTER')  # Adjust the column width as needed
-        elements.append(paragraph_table)
-        elements.append(Spacer(1, 28))
-
-        # Add signature of the current winner and his position
-        signature_line = SignatureLine(130)  # Adjust the width as needed
-        signature_name = Paragraph('<para align="center">' + winner_full_name + '<br/>' + winner_position + '</para>', styles["Normal"])
-        signature_table = Table([[signature_line], [signature_name]], colWidths=[140], hAlign='RIGHT')  # Adjust the column width as needed
-        elements.append(signature_table)
-        elements.append(Spacer(1, 28))
-
-        # Add the signatures (right-aligned with a line for the signature)
-        for i, signatory in enumerate(certification_data.signatories):
-            # Signature line and name
-            signature_line = SignatureLine(130)  # Adjust the width as needed
-            signature_name = Paragraph('<para align="center">' + signatory.name + '<br/>' + signatory.position + '</para>', styles["Normal"])
-            signature_table = Table([[signature_line], [signature_name]], colWidths=[140], hAlign='RIGHT')  # Adjust the column width as needed
-            elements.append(signature_table)
-            elements.append(Spacer(1, 28))
-
-        # Build the PDF
-        doc.build(elements)
+        new_certifications.append(new_certification)
 
-        # Upload to cloudinary
-        upload_result = cloudinary.uploader.upload(pdf_name, 
-                               resource_type = "raw", 
-                               public_id = f"Directory/Certifications/{pdf_name}",
-                               tags=[f'certification_{new_certification.CertificationId}'])
-        
-        new_certification.AssetId = upload_result['secure_url']
-        db.commit()
+        # Get student full name and consider the middle name, and the selected position
+        winner_full_name = f"{student.FirstName} {student.MiddleName} {student.LastName}" if student.MiddleName else f"{student.FirstName} {student.LastName}"
+        certifications_to_render.append((new_certification, winner_full_name, winner.SelectedPositionName))
+
+    db.add_all(new_certifications)
+    db.flush() # Flush the session to get the CertificationIds
+
+    # Read the ids now, the rows are expired once committed
+    certifications_to_render = [(new_certification.CertificationId, certification_data.date, winner_full_name, winner_position)
+                                for new_certification, winner_full_name, winner_position in certifications_to_render]
+
+    db.add_all([CreatedAdminSignatory(CertificationId=new_certification.CertificationId,
+                                      SignatoryName=signatory.name,
+                                      SignatoryPosition=signatory.position,
+                                      created_at=manila_now(),
+                                      updated_at=manila_now())
+                for new_certification in new_certifications for signatory in certification_data.signatories])
+
+    certification_job = CertificationJobs(ElectionId=certification_data.election_id,
+                                          Total=len(new_certifications),
+                                          Completed=0,
+                                          Failed=0,
+                                          Status="Pending",
+                                          created_at=manila_now(),
+                                          updated_at=manila_now())
+    db.add(certification_job)
+    db.commit()
 
-        # Delete the local file
-        os.remove(pdf_name)
+    # Render and upload the PDFs after the response is sent, progress is tracked in the certification job
+    background_tasks.add_task(run_certification_job,
+                              certification_job.CertificationJobId,
+                              certifications_to_render,
+                              [(signatory.name, signatory.position) for signatory in certification_data.signatories])
 
-    # Return the responses and a URL to download the PDF
     return JSONResponse({
-        "message": "Certifications created successfully"
+        "message": "Certifications are being created",
+        "certification_job_id": certification_job.CertificationJobId
     })
 
 @router.post("/certification/signed/upload", tags=["Certification"])
 async def upload_Signed_Certification(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
-    if not os.path.exists('temp'):
-        os.makedirs('temp')
+    new_certifications = []
+    contents = []
 
     for file in files:
-        # Save the file to a temporary location
-        temp_file = f"temp/{file.filename}"
-        with open(temp_file, "wb") as buffer:
-            buffer.write(await file.read())
+        contents.append(await file.read())
 
         # Create a new row in the CertificationsSigned table
         new_certification = CertificationsSigned(CertificationTitle=file.filename,
@@ -2478,20 +2950,23 @@ async def upload_Signed_Certification(files: List[UploadFile] = File(...), db: S
                                                  created_at=manila_now(),
                                                  updated_at=manila_now())  # Add other fields as needed
         db.add(new_certification)
-        db.commit()
+        new_certifications.append(new_certification)
 
-        # Upload the file to Cloudinary
-        upload_result = cloudinary.uploader.upload(temp_file, 
-                               resource_type = "raw", 
-                               public_id = f"Directory/Certifications/Signed/{file.filename}",
-                               tags=[f'certification_signed_{new_certification.CertificationsSignedId}'])
-        
-        # Associate the upload_result to the row of the file created in the table
+    db.commit() # Commit to get the ids used for the tags
+
+    # Upload all files to Cloudinary concurrently
+    upload_results = await upload_many([
+        (content, {"resource_type": "raw",
+                   "public_id": f"Directory/Certifications/Signed/{file.filename}",
+                   "tags": [f'certification_signed_{new_certification.CertificationsSignedId}']})
+        for file, content, new_certification in zip(files, contents, new_certifications)
+    ])
+
+    # Associate the upload_result to the row of the file created in the table
+    for new_certification, upload_result in zip(new_certifications, upload_results):
         new_certification.FileURL = upload_result['secure_url']
-        db.commit()
 
-        # Delete the temporary file
-        os.remove(temp_file)
+    db.commit()
 
     return {"response": "success"}
 
@@ -2531,22 +3006,32 @@ class OrganizationName(BaseModel):
 
 """ ** GET Methods: CoC Table APIs ** """
 @router.get("/coc/all", tags=["CoC"])
-def get_All_CoC(db: Session = Depends(get_db)):
+def get_All_CoC(after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), fields: Optional[str] = None, db: Session = Depends(get_db)):
     try:
-        coc = db.query(CoC).order_by(CoC.CoCId).all()
-        coc_dict = [coc.to_dict(i+1) for i, coc in enumerate(coc)]
+        try:
+            selected = parse_fields(fields, [column.key for column in CoC.__table__.columns] + ["count", "ElectionName", "StudentOrganizationName"])
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+
+        cocs = paginate(db.query(CoC).options(selectinload(CoC.election).selectinload(Election.organization)), CoC.CoCId, after, limit).all()
+        coc_dict = []
 
         # Include the election name using the election id in the CoC dictionary
-        for coc in coc_dict:
-            if coc["ElectionId"]:
-                election = db.query(Election).filter(Election.ElectionId == coc["ElectionId"]).first()
-                coc["ElectionName"] = election.ElectionName if election else None
+        for i, coc in enumerate(cocs):
+            coc_row = coc.to_dict(i+1)
+
+            if coc.ElectionId:
+                election = coc.election
+                coc_row["ElectionName"] = election.ElectionName if election else None
 
                 # Get the studentorganizationname from studentorganization table using the election table's studentorganizationid to look at studentorganizationname
-                student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
-                coc["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else None
+                student_organization = election.organization if election else None
+                coc_row["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else None
 
-        return {"coc": coc_dict}
+            coc_dict.append(coc_row)
+
+        return paginated_response({"coc": project(coc_dict, selected)}, total_count(db, CoC.CoCId),
+                                  cocs[-1].CoCId if cocs else None, len(cocs), limit)
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all CoCs from the database"})
     
@@ -2612,7 +3097,7 @@ async def save_CoC(election_id: int = Form(...), student_number: str = Form(...)
     # Check if current datetime is within the filing period of the election
     election = db.query(Election).filter(Election.ElectionId == election_id).first()
     
-    if manila_now() > election.CoCFilingEnd.replace(tzinfo=timezone('Asia/Manila')):
+    if has_passed(election.CoCFilingEnd):
         return JSONResponse(status_code=400, content={"error": "Filing period for this election has ended."})
     
     # Check if the student exists in ViolationForm table and status is not 'removed'
@@ -2622,7 +3107,7 @@ async def save_CoC(election_id: int = Form(...), student_number: str = Form(...)
         return JSONResponse(status_code=400, content={"error": "You are not allowed to file a CoC due to a violation associated with you."})
 
     # Check if the student is not graduated/continuing
-    student_graduated_code = get_Student_Status_In_CourseEnrolled(student_number)
+    student_graduated_code = get_Student_Status_In_CourseEnrolled(student_number, live=True)
     # (0 - Not Graduated/Continuing ||  1 - Graduated  ||  2 - Drop  ||  3 - Transfer Course || 4 - Transfer School)
     if student_graduated_code != 0:
         return JSONResponse(status_code=400, content={"error": "You are not allowed to file a CoC because you are not a continuing student."})
@@ -2638,8 +3123,7 @@ async def save_CoC(election_id: int = Form(...), student_number: str = Form(...)
         return JSONResponse(status_code=400, content={"error": "You are not eligible to file a CoC for this election."})
 
     # Check if verification code is correct in code table and is not expired
-    code = db.query(Code).filter(Code.StudentNumber == student_number, Code.CodeType == 'Verification', Code.CodeValue == verification_code).first()
-    if not code:
+    if code_store.get(student_number, student_code_type('Verification')) != verification_code:
         return JSONResponse(status_code=400, content={"error": "Verification code is invalid."})
     
     # Check if the student has already filed a CoC for this election and not rejected
@@ -2681,33 +3165,29 @@ async def save_CoC(election_id: int = Form(...), student_number: str = Form(...)
     db.add(new_coc)
     db.flush() # Flush the session to get the ID of the new CoC
 
+    # Use the ID of the new CoC as the subfolder name under 'CoCs'            
+    folder_name = f"CoCs/coc_{new_coc.CoCId}"
+    uploads = {}
+
     if display_photo:
         # Remove the prefix of the base64 string and keep only the data
         base64_data = display_photo.split(',')[1]
-        
-        # Use the ID of the new CoC as the subfolder name under 'CoCs'            
-        folder_name = f"CoCs/coc_{new_coc.CoCId}"
         tag_name = f'coc_display_photo_{new_coc.CoCId}'
 
-        # Upload file to Cloudinary with the folder name in the public ID
-        response_display_photo = cloudinary.uploader.upload("data:image/jpeg;base64," + base64_data, public_id=f"{folder_name}/display_photo/{display_photo_file_name}", tags=[tag_name])
-
-        # Store the tag in the DisplayPhoto column
-        new_coc.DisplayPhoto = response_display_photo['secure_url']
+        uploads["DisplayPhoto"] = ("data:image/jpeg;base64," + base64_data, {"public_id": f"{folder_name}/display_photo/{display_photo_file_name}", "tags": [tag_name]})
 
     if certification_of_grades:
         # Remove the prefix of the base64 string and keep only the data
         base64_data = certification_of_grades.split(',')[1]
-        
-        # Use the ID of the new CoC as the subfolder name under 'CoCs'            
-        folder_name = f"CoCs/coc_{new_coc.CoCId}"
         tag_name = f'coc_cert_grades_{new_coc.CoCId}'
 
-        # Upload file to Cloudinary with the folder name in the public ID
-        response_certification_grades = cloudinary.uploader.upload("data:image/jpeg;base64," + base64_data, public_id=f"{folder_name}/cert_grades/{certification_of_grades_file_name}", tags=[tag_name])
+        uploads["CertificationOfGrades"] = ("data:image/jpeg;base64," + base64_data, {"public_id": f"{folder_name}/cert_grades/{certification_of_grades_file_name}", "tags": [tag_name]})
+
+    # Upload the display photo and certification of grades concurrently, then store the URLs in their columns
+    upload_results = await upload_many(list(uploads.values()))
 
-        # Store the tag in the CertificationOfGrades column
-        new_coc.CertificationOfGrades = response_certification_grades['secure_url']
+    for column, upload_result in zip(uploads.keys(), upload_results):
+        setattr(new_coc, column, upload_result['secure_url'])
 
     db.commit()
 
@@ -2767,6 +3247,8 @@ async def accept_CoC(id: int, db: Session = Depends(get_db)):
         
         db.add(new_candidate)
         db.commit()
+        invalidate_candidate_list(coc.ElectionId)
+        invalidate_Ballot_Snapshot(coc.ElectionId, db)
 
         # Get the student from the Student table using the student number in the CoC table
         student = db.query(Student).filter(Student.StudentNumber == coc.StudentNumber).first()
@@ -2796,6 +3278,8 @@ async def reject_CoC(id: int, reject_reason: str = Form(...), db: Session = Depe
         coc.PartyListId = None
 
         db.commit()
+        invalidate_candidate_list(coc.ElectionId)
+        invalidate_Ballot_Snapshot(coc.ElectionId, db)
 
         # Get the student from the Student table using the student number in the CoC table
         student = db.query(Student).filter(Student.StudentNumber == coc.StudentNumber).first()
@@ -2819,6 +3303,11 @@ class CodeForStudent(BaseModel):
     student_number: str
     code_type: str
 
+""" Method """
+def student_code_type(code_type: str):
+    # The type comes from the client, so it is kept apart from the codes the API issues for itself
+    return f"Student:{code_type}"
+
 """ ** POST Methods: All about Code Table APIs ** """
 @router.post("/code/coc/verification/generate", tags=["Code"])
 def generate_Coc_Verification_Code(code_for_student:CodeForStudent, db: Session = Depends(get_db)):
@@ -2832,37 +3321,20 @@ def generate_Coc_Verification_Code(code_for_student:CodeForStudent, db: Session
     if not eligible:
         return JSONResponse(status_code=400, content={"error": "You are not eligible to file a CoC for this election."})
 
-    # Check if a code already exists with same code type for this student
-    existing_code_type = db.query(Code).filter(Code.StudentNumber == code_for_student.student_number, Code.CodeType == code_for_student.code_type).first()
-
-    # Generate a random code
+    # Generate a random code, it replaces any code of the same type this student already has
     code_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    code_type = student_code_type(code_for_student.code_type)
+    code_store.issue(code_for_student.student_number, code_type, code_value)
 
-    if existing_code_type:
-        # If a code already exists for this student, update it
-        existing_code_type.CodeValue = code_value
-        existing_code_type.CodeExpirationDate = manila_now() + timedelta(minutes=30)
-        existing_code_type.updated_at = manila_now()
-    else:
-        # If no code exists for this student, create a new one
-        new_code = Code(StudentNumber=code_for_student.student_number, 
-                        CodeValue=code_value,
-                        CodeType=code_for_student.code_type,
-                        CodeExpirationDate=manila_now() + timedelta(minutes=30),
-                        created_at=manila_now(),
-                        updated_at=manila_now())
-        db.add(new_code)
-
-    # Commit the session to save the changes in the database
-    db.commit()
-
-    send_verification_code_email(student.StudentNumber, student.Email, code_value)
+    # Sent by the high priority email lane, the response does not wait for SMTP.
+    # If it never arrives the code is removed so the student can generate a new one right away
+    queue_email(send_verification_code_email, student.StudentNumber, student.Email, code_value, priority=HIGH_PRIORITY,
+                on_failure=lambda: code_store.consume(student.StudentNumber, code_type, code_value))
 
-    # Return the new or updated code including the email address of the student
+    # The code itself only goes to the email address, returning it would skip the proof that the student owns it
     return {
         "student_number": student.StudentNumber,
         "email_address": student.Email,
-        "code_value": code_value,
         "code_type": code_for_student.code_type,
     }
 
@@ -2880,10 +3352,8 @@ def generate_Ratings_Verification_Code(code_for_student:CodeForStudent, db: Sess
     if not eligible:
         return JSONResponse(status_code=400, content={"error": "You are not eligible to submit ratings for this election"})
     
-    # Check if the student number is in Code table
-    code = db.query(Code).filter(Code.StudentNumber == code_for_student.student_number, Code.CodeType == code_for_student.code_type).first()
-
-    if code:
+    # Check if the student still has a code that has not expired
+    if code_store.get(code_for_student.student_number, student_code_type(code_for_student.code_type)):
         return JSONResponse(status_code=400, content={"error": "You have already generated a verification code"})
 
     # Check RatinsTracker table if the student has already submitted ratings
@@ -2892,53 +3362,29 @@ def generate_Ratings_Verification_Code(code_for_student:CodeForStudent, db: Sess
     if ratings_tracker:
         return JSONResponse(status_code=400, content={"error": "You have already submitted your ratings"})
     
-    # Check if a code already exists with same code type for this student
-    existing_code_type = db.query(Code).filter(Code.StudentNumber == code_for_student.student_number, Code.CodeType == code_for_student.code_type).first()
-
-    # Generate a random code
+    # Generate a random code, it replaces any code of the same type this student already has
     code_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    code_type = student_code_type(code_for_student.code_type)
+    code_store.issue(code_for_student.student_number, code_type, code_value)
 
-    if existing_code_type:
-        # If a code already exists for this student, update it
-        existing_code_type.CodeValue = code_value
-        existing_code_type.CodeExpirationDate = manila_now() + timedelta(minutes=30)
-        existing_code_type.updated_at = manila_now()
+    # Sent by the high priority email lane, the response does not wait for SMTP.
+    # If it never arrives the code is removed so the student can generate a new one right away
+    queue_email(send_verification_code_email, student.StudentNumber, student.Email, code_value, priority=HIGH_PRIORITY,
+                on_failure=lambda: code_store.consume(student.StudentNumber, code_type, code_value))
 
-    else:
-        # If no code exists for this student, create a new one
-        new_code = Code(StudentNumber=code_for_student.student_number, 
-                        CodeValue=code_value,
-                        CodeType=code_for_student.code_type,
-                        CodeExpirationDate=manila_now() + timedelta(minutes=30),
-                        created_at=manila_now(),
-                        updated_at=manila_now())
-        db.add(new_code)
-
-    # Commit the session to save the changes in the database
-    db.commit()
-
-    send_verification_code_email(student.StudentNumber, student.Email, code_value)
-
-    # Return the new or updated code including the email address of the student
+    # The code itself only goes to the email address, returning it would skip the proof that the student owns it
     return {
         "student_number": student.StudentNumber,
         "email_address": student.Email,
-        "code_value": code_value,
         "code_type": code_for_student.code_type,
     }
 
 @router.post("/code/ratings/verify/{code}/{type}", tags=["Code"])
-def verify_Ratings_Code(code: str, type: str, db: Session = Depends(get_db)):
-    # Check if the code exists in the database
-    code = db.query(Code).filter(Code.CodeValue == code, Code.CodeType == type).first()
-
-    if not code:
+def verify_Ratings_Code(code: str, type: str, student_number: str):
+    # Codes are only unique per student, so the student number is needed to find the right one.
+    # Using the code removes it, so it only works once
+    if not code_store.consume(student_number, student_code_type(type), code):
         return JSONResponse(status_code=404, content={"error": "Code is invalid."})
-    
-    # remove the code from the database
-    if code:
-        db.delete(code)
-        db.commit()
 
     # return true and a message if the code is valid
     return {
@@ -2951,25 +3397,34 @@ def verify_Ratings_Code(code: str, type: str, db: Session = Depends(get_db)):
 """ PartyList Table APIs """
 
 """ ** GET Methods: Partylist Table APIs ** """
-@router.get("/partylist/all", tags=["Party List"])
-def get_All_PartyList(db: Session = Depends(get_db)):
-    try:
-        partylists = db.query(PartyList).order_by(PartyList.PartyListId).all()
+""" Method """
+def partylist_dicts_with_election(partylists):
+    # The elections and their organizations are loaded with the partylists, not per partylist
+    partylist_dicts = []
 
-        # make a dictionary of partylists
-        partylists = [partylist.to_dict(i+1) for i, partylist in enumerate(partylists)]
+    for i, partylist in enumerate(partylists):
+        partylist_dict = partylist.to_dict(i+1)
 
         # return the election name using the election id in the partylist dictionary
-        for partylist in partylists:
-            if partylist["ElectionId"]:
-                election = db.query(Election).filter(Election.ElectionId == partylist["ElectionId"]).first()
-                partylist["ElectionName"] = election.ElectionName if election else None
+        if partylist.ElectionId:
+            election = partylist.election
+            partylist_dict["ElectionName"] = election.ElectionName if election else None
 
-                # Get the studentorganizationname from studentorganization table using the election table's studentorganizationid to look at studentorganizationname
-                student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
-                partylist["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else None
+            # Get the studentorganizationname from the election's student organization
+            student_organization = election.organization if election else None
+            partylist_dict["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else None
 
-        return {"partylists": partylists}
+        partylist_dicts.append(partylist_dict)
+
+    return partylist_dicts
+
+@router.get("/partylist/all", tags=["Party List"])
+def get_All_PartyList(db: Session = Depends(get_db)):
+    try:
+        partylists = db.query(PartyList).options(selectinload(PartyList.election).selectinload(Election.organization)).\
+            order_by(PartyList.PartyListId).all()
+
+        return {"partylists": partylist_dicts_with_election(partylists)}
         
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all partylists from the database"})
@@ -3009,31 +3464,40 @@ def get_All_Candidates_By_PartyList_Id(id: int, db: Session = Depends(get_db)):
             asc(func.concat(Student.FirstName, ' ', Student.MiddleName, ' ', Student.LastName))
         ).all()
         
+        # Students, candidates and profiles of every CoC in one query each
+        student_numbers = list({coc.StudentNumber for coc in partylist_candidates})
+        students = {student.StudentNumber: student for student in db.query(Student).filter(Student.StudentNumber.in_(student_numbers)).all()}
+        profiles = get_Student_Profiles_by_studnumbers(student_numbers, db)
+
+        candidates = {}
+        for candidate in db.query(Candidates).filter(Candidates.StudentNumber.in_(student_numbers),
+                                                     Candidates.ElectionId.in_(list({coc.ElectionId for coc in partylist_candidates}))).\
+                order_by(Candidates.CandidateId).all():
+            candidates.setdefault((candidate.StudentNumber, candidate.ElectionId), candidate)
+
         partylist_candidates_dict = []
         # Include the student full name in student table by student number in the CoC table
         for i, coc in enumerate(partylist_candidates):
-            student = db.query(Student).filter(Student.StudentNumber == coc.StudentNumber).first()
+            student = students.get(coc.StudentNumber)
             partylist_candidates_dict.append(coc.to_dict(i+1))
 
             # Get candidate Rating and TimesRated via student number in Candidates table
-            candidate = db.query(Candidates).filter(Candidates.StudentNumber == coc.StudentNumber, Candidates.ElectionId == coc.ElectionId).first()
+            candidate = candidates.get((coc.StudentNumber, coc.ElectionId))
             partylist_candidates_dict[i]["Rating"] = candidate.Rating if candidate else None
             partylist_candidates_dict[i]["TimesRated"] = candidate.TimesRated if candidate else None
 
             partylist_candidates_dict[i]["Student"] = student.to_dict() if student else None
 
-            # Get the student metadata from the student metadata table using the student number in the CoC table
-            student_metadata = get_Student_Metadata_by_studnumber(coc.StudentNumber)
+            # Course, year and semester from the student profile
+            profile = profiles.get(coc.StudentNumber)
 
-            if "CourseCode" in student_metadata:
-                partylist_candidates_dict[i]["Student"]["CourseCode"] = student_metadata["CourseCode"]
-                partylist_candidates_dict[i]["Student"]["Year"] = student_metadata["Year"]
-                partylist_candidates_dict[i]["Student"]["Semester"] = student_metadata["Semester"]
+            if profile and student:
+                partylist_candidates_dict[i]["Student"]["CourseCode"] = profile["CourseCode"]
+                partylist_candidates_dict[i]["Student"]["Year"] = profile["Year"]
+                partylist_candidates_dict[i]["Student"]["Semester"] = profile["Semester"]
 
-            student_section = get_Student_Section_by_studnumber(coc.StudentNumber)
-
-            if student_section:
-                partylist_candidates_dict[i]["Student"]["Section"] = student_section
+                if profile["Section"]:
+                    partylist_candidates_dict[i]["Student"]["Section"] = profile["Section"]
 
         # Include the display photo using secure URL from Cloudinary
         for coc in partylist_candidates_dict:
@@ -3085,22 +3549,10 @@ def get_PartyList_By_Name(name: str, db: Session = Depends(get_db)):
 @router.get("/partylist/election/{election_id}", tags=["Party List"])
 def get_PartyList_By_Election_Id(election_id: int, db: Session = Depends(get_db)):
     try:
-        partylists = db.query(PartyList).filter(PartyList.ElectionId == election_id).order_by(PartyList.PartyListId).all()
-
-        # make a dictionary of partylists
-        partylists = [partylist.to_dict(i+1) for i, partylist in enumerate(partylists)]
+        partylists = db.query(PartyList).options(selectinload(PartyList.election).selectinload(Election.organization)).\
+            filter(PartyList.ElectionId == election_id).order_by(PartyList.PartyListId).all()
 
-        # return the election name using the election id in the partylist dictionary
-        for partylist in partylists:
-            if partylist["ElectionId"]:
-                election = db.query(Election).filter(Election.ElectionId == partylist["ElectionId"]).first()
-                partylist["ElectionName"] = election.ElectionName if election else None
-
-                # Get the studentorganizationname from studentorganization table using the election table's studentorganizationid to look at studentorganizationname
-                student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
-                partylist["StudentOrganizationName"] = student_organization.OrganizationName if student_organization else None
-
-        return {"partylists": partylists}
+        return {"partylists": partylist_dicts_with_election(partylists)}
         
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all partylists from the database"})
@@ -3120,7 +3572,7 @@ async def save_PartyList(election_id: int = Form(...), party_name: str = Form(..
     # Check if current datetime is within the filing period of the election
     election = db.query(Election).filter(Election.ElectionId == election_id).first()
 
-    if manila_now() > election.CoCFilingEnd.replace(tzinfo=timezone('Asia/Manila')):
+    if has_passed(election.CoCFilingEnd):
         return JSONResponse(status_code=400, content={"error": "Filing period for this election has ended."})
     
     new_partylist = PartyList(ElectionId=election_id,
@@ -3147,7 +3599,7 @@ async def save_PartyList(election_id: int = Form(...), party_name: str = Form(..
         folder_name = f"Partylists/partylist_{new_partylist.PartyListId}"
 
         # Upload file to Cloudinary with the folder name in the public ID
-        response_image = cloudinary.uploader.upload("data:image/jpeg;base64," + base64_data, public_id=f"{folder_name}/{image_file_name}", tags=[f'partylist_{new_partylist.PartyListId}'])
+        response_image = await upload("data:image/jpeg;base64," + base64_data, public_id=f"{folder_name}/{image_file_name}", tags=[f'partylist_{new_partylist.PartyListId}'])
 
         # Store the tag in the ImageAttachment column
         new_partylist.ImageAttachment = response_image['secure_url']
@@ -3242,35 +3694,59 @@ class RatingList(BaseModel):
     rater_student_number: str
     ratings: List[Rating]
 
+""" Method """
+def get_Candidate_Mottos(candidates, db: Session):
+    # (student number, election id) -> motto of the first CoC, for all given candidates at once
+    election_ids = {candidate.ElectionId for candidate in candidates}
+    student_numbers = {candidate.StudentNumber for candidate in candidates if candidate.StudentNumber}
+
+    if not student_numbers:
+        return {}
+
+    mottos = {}
+    for student_number, election_id, motto in db.query(CoC.StudentNumber, CoC.ElectionId, CoC.Motto).\
+            filter(CoC.ElectionId.in_(election_ids), CoC.StudentNumber.in_(student_numbers)).order_by(CoC.CoCId).all():
+        mottos.setdefault((student_number, election_id), motto or "")
+
+    return mottos
+
 """ ** GET Methods: Candidates Table APIs ** """
 @router.get("/candidates/all", tags=["Candidates"])
-def get_All_Candidates(db: Session = Depends(get_db)):
+def get_All_Candidates(after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), fields: Optional[str] = None, db: Session = Depends(get_db)):
     try:
-        candidates = db.query(Candidates).order_by(Candidates.CandidateId).all()
+        try:
+            selected = parse_fields(fields, [column.key for column in Candidates.__table__.columns] + ["count", "Student", "PartyListName", "Motto"])
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+
+        candidates = paginate(db.query(Candidates).options(selectinload(Candidates.student), joinedload(Candidates.partylist)),
+                              Candidates.CandidateId, after, limit).all()
+
+        # Mottos of the listed candidates in one query, keyed like the CoC lookup was
+        mottos = get_Candidate_Mottos(candidates, db)
 
         # Get the student row from student table using the student number in the candidate
         candidates_with_student = []
         for i, candidate in enumerate(candidates):
-            student = db.query(Student).filter(Student.StudentNumber == candidate.StudentNumber).first()
+            student = candidate.student
             candidate_dict = candidate.to_dict(i+1)
             candidate_dict["Student"] = student.to_dict() if student else {}
 
             # Get the party list name from partylist table using the partylist id in the candidate
             if candidate.PartyListId:
-                partylist = db.query(PartyList).filter(PartyList.PartyListId == candidate.PartyListId).first()
-                candidate_dict["PartyListName"] = partylist.PartyListName if partylist else ""
+                candidate_dict["PartyListName"] = candidate.partylist.PartyListName if candidate.partylist else ""
 
             # Get the motto from coc table using the student number in the candidate
             if candidate.StudentNumber:
-                coc = db.query(CoC).filter(CoC.StudentNumber == candidate.StudentNumber, CoC.ElectionId == candidate.ElectionId).first()
-                candidate_dict["Motto"] = coc.Motto if coc else ""
+                candidate_dict["Motto"] = mottos.get((candidate.StudentNumber, candidate.ElectionId), "")
 
-            # Get the display photo using secure URL from Cloudinary
-            candidate_dict["DisplayPhoto"] = candidate.DisplayPhoto
+            # Get the display photo using secure URL from Cloudinary, or the cached copy
+            candidate_dict["DisplayPhoto"] = cached_image_url(candidate.DisplayPhoto)
             
             candidates_with_student.append(candidate_dict)
 
-        return {"candidates": candidates_with_student}
+        return paginated_response({"candidates": project(candidates_with_student, selected)}, total_count(db, Candidates.CandidateId),
+                                  candidates[-1].CandidateId if candidates else None, len(candidates), limit)
 
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all candidates from the database"})
@@ -3278,40 +3754,36 @@ def get_All_Candidates(db: Session = Depends(get_db)):
 @router.get("/candidates/election/{id}/all", tags=["Candidates"])
 def get_All_Candidates_By_Election_Id(id: int, db: Session = Depends(get_db)):
     try:
-        candidates = db.query(Candidates).filter(Candidates.ElectionId == id).order_by(Candidates.CandidateId).all()
+        candidates = db.query(Candidates).options(selectinload(Candidates.student), joinedload(Candidates.partylist)).\
+            filter(Candidates.ElectionId == id).order_by(Candidates.CandidateId).all()
+
+        # Course, year, semester and section of every candidate in one query
+        profiles = get_Student_Profiles_by_studnumbers([candidate.StudentNumber for candidate in candidates], db)
+
+        # Mottos of the listed candidates in one query, keyed like the CoC lookup was
+        mottos = get_Candidate_Mottos(candidates, db)
 
         # Get the student row from student table using the student number in the candidate
         candidates_with_student = []
         for i, candidate in enumerate(candidates):
-            student = db.query(Student).filter(Student.StudentNumber == candidate.StudentNumber).first()
+            student = candidate.student
             candidate_dict = candidate.to_dict(i+1)
             candidate_dict["Student"] = student.to_dict() if student else {}
 
             # Get the student's course
             if student:
-                student_metadata = get_Student_Metadata_by_studnumber(student.StudentNumber)
-                student_section = get_Student_Section_by_studnumber(student.StudentNumber)
-
-                if "CourseCode" in student_metadata:
-                    candidate_dict["Student"]["CourseCode"] = student_metadata["CourseCode"]
-                    candidate_dict["Student"]["Year"] = student_metadata["Year"]
-                    candidate_dict["Student"]["Semester"] = student_metadata["Semester"]
-
-                if student_section:
-                    candidate_dict["Student"]["Section"] = student_section
+                candidate_dict["Student"].update(profiles.get(student.StudentNumber, {}))
 
             # Get the party list name from partylist table using the partylist id in the candidate
             if candidate.PartyListId:
-                partylist = db.query(PartyList).filter(PartyList.PartyListId == candidate.PartyListId).first()
-                candidate_dict["PartyListName"] = partylist.PartyListName if partylist else ""
+                candidate_dict["PartyListName"] = candidate.partylist.PartyListName if candidate.partylist else ""
 
             # Get the motto from coc table using the student number in the candidate
             if candidate.StudentNumber:
-                coc = db.query(CoC).filter(CoC.StudentNumber == candidate.StudentNumber, CoC.ElectionId == candidate.ElectionId).first()
-                candidate_dict["Motto"] = coc.Motto if coc else ""
+                candidate_dict["Motto"] = mottos.get((candidate.StudentNumber, candidate.ElectionId), "")
 
-            # Get the display photo using secure URL from Cloudinary
-            candidate_dict["DisplayPhoto"] = candidate.DisplayPhoto
+            # Get the display photo using secure URL from Cloudinary, or the cached copy
+            candidate_dict["DisplayPhoto"] = cached_image_url(candidate.DisplayPhoto)
             
             candidates_with_student.append(candidate_dict)
 
@@ -3320,87 +3792,319 @@ def get_All_Candidates_By_Election_Id(id: int, db: Session = Depends(get_db)):
     except:
         return JSONResponse(status_code=500, content={"detail": "Error while fetching all candidates from the database"})
     
+# Ballot page candidate lists, per election and phase. The vote and rating counters are never cached,
+# they are read for every request, so the TTL only bounds how long another worker shows an old CoC decision.
+candidate_list_cache = TTLCache(maxsize=256, ttl=int(os.getenv("CANDIDATE_LIST_CACHE_SECONDS", 30)))
+candidate_list_cache_lock = threading.Lock()
+
+CANDIDATE_COUNTER_COLUMNS = [Candidates.Votes, Candidates.TimesAbstained, Candidates.Rating, Candidates.TimesRated, Candidates.OneStar,
+                             Candidates.TwoStar, Candidates.ThreeStar, Candidates.FourStar, Candidates.FiveStar, Candidates.updated_at]
+
+BALLOT_MAX_AGE_SECONDS = int(os.getenv("BALLOT_MAX_AGE_SECONDS", 60))
+
+""" Method """
+def invalidate_candidate_list(election_id: int):
+    with candidate_list_cache_lock:
+        for key in [key for key in candidate_list_cache if key[0] == election_id]:
+            candidate_list_cache.pop(key, None)
+
+@on_phase_transition
+def invalidate_candidate_list_on_phase_transition(election_id, phase):
+    invalidate_candidate_list(election_id)
+
+""" Method """
+def get_Candidates_Grouped_By_Position(id: int, db: Session):
+    # Candidates with their student, position, partylist and approved CoC in one query, ordered by position then name
+    rows = db.query(Candidates, Student, CreatedElectionPosition.PositionQuantity, PartyList.PartyListName, CoC.Motto, CoC.Platform).\
+        join(CreatedElectionPosition, and_(
+            CreatedElectionPosition.PositionName == Candidates.SelectedPositionName,
+            CreatedElectionPosition.ElectionId == Candidates.ElectionId
+        )).\
+        join(Student, Candidates.StudentNumber == Student.StudentNumber).\
+        outerjoin(PartyList, PartyList.PartyListId == Candidates.PartyListId).\
+        outerjoin(CoC, and_(
+            CoC.StudentNumber == Candidates.StudentNumber,
+            CoC.ElectionId == Candidates.ElectionId,
+            CoC.Status == 'Approved'
+        )).\
+        filter(Candidates.ElectionId == id).\
+        order_by(
+            CreatedElectionPosition.CreatedElectionPositionId,
+            asc(func.concat(Student.FirstName, ' ', Student.MiddleName, ' ', Student.LastName)),
+            Candidates.CandidateId
+        ).all()
+
+    # Course, year, semester and section of every candidate in one more query
+    profiles = get_Student_Profiles_by_studnumbers(list({row.Candidates.StudentNumber for row in rows}), db)
+
+    candidates_grouped_by_position = {}
+    seen_candidate_ids = set()
+    for candidate, student, position_quantity, partylist_name, motto, platform in rows:
+        # A student with more than one approved CoC would repeat, keep the first
+        if candidate.CandidateId in seen_candidate_ids:
+            continue
+        seen_candidate_ids.add(candidate.CandidateId)
+
+        candidate_dict = candidate.to_dict(len(seen_candidate_ids))
+        candidate_dict["Student"] = student.to_dict()
+        candidate_dict["Student"].update(profiles.get(student.StudentNumber, {}))
+
+        if candidate.PartyListId:
+            candidate_dict["PartyListName"] = partylist_name or ""
+
+        candidate_dict["Motto"] = motto or ""
+        candidate_dict["Platform"] = platform or ""
+
+        # Get the display photo using secure URL from Cloudinary, or the cached copy
+        candidate_dict["DisplayPhoto"] = cached_image_url(candidate.DisplayPhoto)
+        candidate_dict["PositionQuantity"] = position_quantity
+
+        # Group by SelectedPositionName
+        candidates_grouped_by_position.setdefault(candidate.SelectedPositionName, []).append(candidate_dict)
+
+    return candidates_grouped_by_position
+
+""" Method """
+def with_Candidate_Counters(candidates_grouped_by_position, id: int, db: Session):
+    # Current votes and ratings of every candidate in one query, merged into copies of the cached dicts
+    counters = {}
+    for row in db.query(Candidates.CandidateId, *CANDIDATE_COUNTER_COLUMNS).filter(Candidates.ElectionId == id).all():
+        counters[row.CandidateId] = row._asdict()
+        counters[row.CandidateId]["updated_at"] = row.updated_at.isoformat() if row.updated_at else None
+
+    return {position: [{**candidate, **counters.get(candidate["CandidateId"], {})} for candidate in candidates]
+            for position, candidates in candidates_grouped_by_position.items()}
+
 @router.get("/candidates/election/per-position/{id}/all", tags=["Candidates"])
 def get_All_Candidates_By_Election_Id_Per_Position(id: int, db: Session = Depends(get_db)):
     try:
-        # Get the candidates and order by CreatedElectionPositionId
-        candidates = db.query(Candidates).join(
-            CreatedElectionPosition,
-            and_(
-                Candidates.SelectedPositionName == CreatedElectionPosition.PositionName,
-                Candidates.ElectionId == id
-            )
-        ).join(
-            Student,
-            Candidates.StudentNumber == Student.StudentNumber
-        ).order_by(
+        election = db.query(Election).filter(Election.ElectionId == id).first()
+        key = (id, get_election_phase(election) if election else None)
+
+        with candidate_list_cache_lock:
+            candidates_grouped_by_position = candidate_list_cache.get(key)
+
+        if candidates_grouped_by_position is None:
+            # Cached without the counters, they go stale with every vote or rating in any worker
+            counter_keys = {column.key for column in CANDIDATE_COUNTER_COLUMNS}
+            candidates_grouped_by_position = {position: [{field: value for field, value in candidate.items() if field not in counter_keys} for candidate in candidates]
+                                              for position, candidates in get_Candidates_Grouped_By_Position(id, db).items()}
+
+            with candidate_list_cache_lock:
+                candidate_list_cache[key] = candidates_grouped_by_position
+
+        return {"candidates": with_Candidate_Counters(candidates_grouped_by_position, id, db)}
+
+    except:
+        return JSONResponse(status_code=500, content={"detail": "Error while fetching all candidates from the database"})
+
+""" Ballot snapshot """
+
+# Counters change during voting, everything else on the ballot is fixed after the filing period
+# Bumped when the payload changes so snapshots stored by an older version are rebuilt
+BALLOT_SNAPSHOT_VERSION = 2
+
+# Snapshots are only final once the CoC filing period is closed
+BALLOT_FINAL_PHASES = [CAMPAIGN_PERIOD, VOTING_PERIOD, POST_ELECTION]
+
+""" Method """
+def build_Ballot_Payload(id: int, db: Session):
+    # Only what the ballot shows, it is served publicly. Photos stay the cloudinary urls, rewritten when served.
+    positions = db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == id).order_by(CreatedElectionPosition.CreatedElectionPositionId).all()
+    rows = db.query(Candidates.CandidateId, Candidates.StudentNumber, Candidates.SelectedPositionName, Candidates.PartyListId, Candidates.DisplayPhoto,
+                    Student.FirstName, Student.MiddleName, Student.LastName, PartyList.PartyListName, CoC.Motto, CoC.Platform,
+                    CreatedElectionPosition.PositionQuantity).\
+        join(CreatedElectionPosition, and_(
+            CreatedElectionPosition.PositionName == Candidates.SelectedPositionName,
+            CreatedElectionPosition.ElectionId == Candidates.ElectionId
+        )).\
+        join(Student, Candidates.StudentNumber == Student.StudentNumber).\
+        outerjoin(PartyList, PartyList.PartyListId == Candidates.PartyListId).\
+        outerjoin(CoC, and_(
+            CoC.StudentNumber == Candidates.StudentNumber,
+            CoC.ElectionId == Candidates.ElectionId,
+            CoC.Status == 'Approved'
+        )).\
+        filter(Candidates.ElectionId == id).\
+        order_by(
             CreatedElectionPosition.CreatedElectionPositionId,
-            asc(func.concat(Student.FirstName, ' ', Student.MiddleName, ' ', Student.LastName))
+            asc(func.concat(Student.FirstName, ' ', Student.MiddleName, ' ', Student.LastName)),
+            Candidates.CandidateId
         ).all()
 
-        # Get the student row from student table using the student number in the candidate
-        candidates_grouped_by_position = {}
-        for i, candidate in enumerate(candidates):
-            student = db.query(Student).filter(Student.StudentNumber == candidate.StudentNumber).first()
-            candidate_dict = candidate.to_dict(i+1)
-            candidate_dict["Student"] = student.to_dict() if student else {}
+    candidates_grouped_by_position = {}
+    seen_candidate_ids = set()
+    for row in rows:
+        # A student with more than one approved CoC would repeat, keep the first
+        if row.CandidateId in seen_candidate_ids:
+            continue
+        seen_candidate_ids.add(row.CandidateId)
+
+        candidates_grouped_by_position.setdefault(row.SelectedPositionName, []).append({
+            "count": len(seen_candidate_ids),
+            "CandidateId": row.CandidateId,
+            "StudentNumber": row.StudentNumber,
+            "SelectedPositionName": row.SelectedPositionName,
+            "PositionQuantity": row.PositionQuantity,
+            "FirstName": row.FirstName,
+            "MiddleName": row.MiddleName,
+            "LastName": row.LastName,
+            "PartyListId": row.PartyListId,
+            "PartyListName": (row.PartyListName or "") if row.PartyListId else None,
+            "DisplayPhoto": row.DisplayPhoto,
+            "Motto": row.Motto or "",
+            "Platform": row.Platform or "",
+        })
 
-            # Get the student's course
-            if student:
-                student_metadata = get_Student_Metadata_by_studnumber(student.StudentNumber)
-                student_section = get_Student_Section_by_studnumber(student.StudentNumber)
+    payload = orjson.dumps({
+        "version": BALLOT_SNAPSHOT_VERSION,
+        "election_id": id,
+        "positions": [position.to_dict(i+1) for i, position in enumerate(positions)],
+        "candidates": candidates_grouped_by_position,
+    }, default=str).decode()
 
-                if "CourseCode" in student_metadata:
-                    candidate_dict["Student"]["CourseCode"] = student_metadata["CourseCode"]
-                    candidate_dict["Student"]["Year"] = student_metadata["Year"]
-                    candidate_dict["Student"]["Semester"] = student_metadata["Semester"]
+    return payload, hashlib.sha256(payload.encode()).hexdigest()
 
-                if student_section:
-                    candidate_dict["Student"]["Section"] = student_section
+# Served bytes of each stored snapshot in this worker, keyed by election. The photos depend on this worker's image cache.
+served_ballot_cache = {}
+served_ballot_cache_lock = threading.Lock()
 
-            # Get the party list name from partylist table using the partylist id in the candidate
-            if candidate.PartyListId:
-                partylist = db.query(PartyList).filter(PartyList.PartyListId == candidate.PartyListId).first()
-                candidate_dict["PartyListName"] = partylist.PartyListName if partylist else ""
+""" Method """
+def serve_Ballot_Payload(payload: str):
+    # Photos point to the local copy only while the image cache has it
+    ballot = orjson.loads(payload)
+    photos, photo_urls = [], []
 
-            # Get the motto from coc table using the student number in the candidate
-            if candidate.StudentNumber:
-                coc = db.query(CoC).filter(CoC.StudentNumber == candidate.StudentNumber, CoC.ElectionId == candidate.ElectionId, CoC.Status == 'Approved').first()
-                candidate_dict["Motto"] = coc.Motto if coc else ""
-                candidate_dict["Platform"] = coc.Platform if coc else ""
+    for candidates in ballot["candidates"].values():
+        for candidate in candidates:
+            photos.append(candidate["DisplayPhoto"])
+            candidate["DisplayPhoto"] = cached_image_url(candidate["DisplayPhoto"])
+            photo_urls.append(candidate["DisplayPhoto"])
 
-            # Get the display photo using secure URL from Cloudinary
-            candidate_dict["DisplayPhoto"] = candidate.DisplayPhoto
-            
-            #candidate_dict["DisplayPhoto"] = ""
+    content = orjson.dumps(ballot)
+    return {"version": ballot.get("version"), "photos": photos, "photo_urls": photo_urls,
+            "content": content, "etag": f'"{hashlib.sha256(content).hexdigest()}"'}
+
+""" Method """
+def serve_Ballot_Snapshot(id: int, db: Session):
+    # Parsed and serialized once per snapshot, a request only reads the stored ETag and checks the photo urls are still the same
+    snapshot_etag = db.query(BallotSnapshot.ETag).filter(BallotSnapshot.ElectionId == id).scalar()
+
+    with served_ballot_cache_lock:
+        served = served_ballot_cache.get(id)
+
+    if served and snapshot_etag == served["snapshot_etag"] and [cached_image_url(photo) for photo in served["photos"]] == served["photo_urls"]:
+        return served
 
-            # Group by SelectedPositionName
-            position_name = candidate.SelectedPositionName
+    snapshot = (db.query(BallotSnapshot).get(id) if snapshot_etag else None) or save_Ballot_Snapshot(id, db)
+    served = serve_Ballot_Payload(snapshot.Payload)
 
-            # Get the PositionQuantity from CreatedElectionPosition table
-            created_election_position = db.query(CreatedElectionPosition).filter(and_(CreatedElectionPosition.ElectionId == id, CreatedElectionPosition.PositionName == position_name)).first()
-            candidate_dict["PositionQuantity"] = created_election_position.PositionQuantity 
+    # Stored by an older version of the payload
+    if served["version"] != BALLOT_SNAPSHOT_VERSION:
+        snapshot = save_Ballot_Snapshot(id, db)
+        served = serve_Ballot_Payload(snapshot.Payload)
 
-            if position_name not in candidates_grouped_by_position:
-                candidates_grouped_by_position[position_name] = []
-                
+    served["snapshot_etag"] = snapshot.ETag
+
+    with served_ballot_cache_lock:
+        served_ballot_cache[id] = served
+
+    return served
+
+""" Method """
+def etag_matches(if_none_match: Optional[str], etag: str):
+    # If-None-Match is a comma separated list of tags, compared weakly, or *
+    if not if_none_match:
+        return False
 
-            candidates_grouped_by_position[position_name].append(candidate_dict)
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
 
-        return {"candidates": candidates_grouped_by_position}
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+
+    return False
+
+""" Method """
+def save_Ballot_Snapshot(id: int, db: Session):
+    payload, etag = build_Ballot_Payload(id, db)
+
+    try:
+        snapshot = db.query(BallotSnapshot).get(id)
+
+        if snapshot:
+            snapshot.Payload = payload
+            snapshot.ETag = etag
+            snapshot.updated_at = manila_now()
+        else:
+            snapshot = BallotSnapshot(ElectionId=id, Payload=payload, ETag=etag, created_at=manila_now(), updated_at=manila_now())
+            db.add(snapshot)
+
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same snapshot first
+        db.rollback()
+        snapshot = db.query(BallotSnapshot).get(id)
+
+    return snapshot
+
+""" Method """
+def invalidate_Ballot_Snapshot(id: int, db: Session):
+    # The next request rebuilds it
+    db.query(BallotSnapshot).filter(BallotSnapshot.ElectionId == id).delete(synchronize_session=False)
+    db.commit()
+
+@on_phase_transition
+def build_ballot_snapshot_on_campaign_start(election_id, phase):
+    if phase != CAMPAIGN_PERIOD:
+        return
+
+    db = SessionLocal()
+
+    try:
+        save_Ballot_Snapshot(election_id, db)
+        print(f"Ballot snapshot of election {election_id} built")
+    finally:
+        db.close()
+
+@router.get("/ballot/election/{id}", tags=["Candidates"])
+def get_Ballot_By_Election_Id(id: int, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    try:
+        election = db.query(Election).filter(Election.ElectionId == id).first()
+
+        if not election:
+            return JSONResponse(status_code=404, content={"detail": "Election not found"})
+
+        # Candidates can still change during the filing period, build it live and do not keep it
+        if get_election_phase(election) not in BALLOT_FINAL_PHASES:
+            payload, _ = build_Ballot_Payload(id, db)
+            return Response(content=serve_Ballot_Payload(payload)["content"], media_type="application/json", headers={"Cache-Control": "no-store"})
+
+        served = serve_Ballot_Snapshot(id, db)
+        headers = {"ETag": served["etag"], "Cache-Control": f"public, max-age={BALLOT_MAX_AGE_SECONDS}"}
+
+        if etag_matches(if_none_match, served["etag"]):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=served["content"], media_type="application/json", headers=headers)
 
     except:
-        return JSONResponse(status_code=500, content={"detail": "Error while fetching all candidates from the database"})
+        return JSONResponse(status_code=500, content={"detail": "Error while fetching the ballot from the database"})
 
 """ ** POST Methods: All about Candidates Table APIs ** """
+RATING_STAR_COLUMNS = {1: "OneStar", 2: "TwoStar", 3: "ThreeStar", 4: "FourStar", 5: "FiveStar"}
+
 @router.post("/candidates/ratings/submit", tags=["Candidates"])
 def save_Candidate_Ratings(rating_list: RatingList, db: Session = Depends(get_db)):
 
     # Check if campaign period has not yet ended
     election = db.query(Election).filter(Election.ElectionId == rating_list.election_id).first()
 
+    if not election:
+        return JSONResponse(status_code=404, content={"error": "Election does not exist"})
+
     # check for ended campaign period only 
-    if manila_now() > election.CampaignEnd.replace(tzinfo=timezone('Asia/Manila')):
+    if has_passed(election.CampaignEnd):
         return JSONResponse(status_code=400, content={"error": "Rating/Campaign period for this election has ended."})
 
     # Check if the student has already rated this election
@@ -3409,47 +4113,41 @@ def save_Candidate_Ratings(rating_list: RatingList, db: Session = Depends(get_db
     if existing_rating:
         return JSONResponse(status_code=400, content={"error": "You have already rated this election"})
 
-    for rating in rating_list.ratings:
-        # Check if the student exists in the database
-        student = db.query(Student).filter(Student.StudentNumber == rating.candidate_student_number).first()
+    # All rated candidates in one query
+    rated_student_numbers = {rating.candidate_student_number for rating in rating_list.ratings}
+    candidate_ids = dict(db.query(Candidates.StudentNumber, Candidates.CandidateId).\
+        filter(Candidates.ElectionId == rating_list.election_id, Candidates.StudentNumber.in_(rated_student_numbers)).all())
 
-        if not student:
-            return JSONResponse(status_code=404, content={"error": "Student number does not exist"})
+    if len(candidate_ids) != len(rated_student_numbers):
+        return JSONResponse(status_code=404, content={"error": "Candidate does not exist"})
 
-        # Check if the election exists in the database
-        election = db.query(Election).filter(Election.ElectionId == rating_list.election_id).first()
-
-        if not election:
-            return JSONResponse(status_code=404, content={"error": "Election does not exist"})
-
-        # Update the ratings of the candidate in the Candidates table
-        candidate = db.query(Candidates).filter(Candidates.StudentNumber == rating.candidate_student_number, Candidates.ElectionId == rating_list.election_id).first()
-
-        if not candidate:
-            return JSONResponse(status_code=404, content={"error": "Candidate does not exist"})
+    # Add up what every candidate receives from this ballot
+    increments = defaultdict(lambda: defaultdict(int)) # candidate id -> column -> increment
+    for rating in rating_list.ratings:
+        candidate_increments = increments[candidate_ids[rating.candidate_student_number]]
 
         # Increment the number of ratings of the candidate by ratings received
-        candidate.Rating += rating.rating
+        candidate_increments["Rating"] += rating.rating
 
         # Determine how much is star is given (One start, two, three, four, five)
-        if rating.rating == 1:
-            candidate.OneStar += 1
-        elif rating.rating == 2:
-            candidate.TwoStar += 1
-        elif rating.rating == 3:
-            candidate.ThreeStar += 1
-        elif rating.rating == 4:
-            candidate.FourStar += 1
-        elif rating.rating == 5:
-            candidate.FiveStar += 1
+        if rating.rating in RATING_STAR_COLUMNS:
+            candidate_increments[RATING_STAR_COLUMNS[rating.rating]] += 1
 
         # Increment the number of times rated of the candidate
         if rating.rating > 0:
-            candidate.TimesRated += 1
-            
-        candidate.updated_at = manila_now()
+            candidate_increments["TimesRated"] += 1
 
-        db.commit()
+    # One UPDATE for every candidate, each column adds its own increment per candidate id
+    if increments:
+        values = {"updated_at": manila_now()}
+        for column in ["Rating", "TimesRated"] + list(RATING_STAR_COLUMNS.values()):
+            current = getattr(Candidates, column)
+            per_candidate = {candidate_id: current + candidate_increments[column] for candidate_id, candidate_increments in increments.items() if candidate_increments[column]}
+
+            if per_candidate:
+                values[column] = case(per_candidate, value=Candidates.CandidateId, else_=current)
+
+        db.query(Candidates).filter(Candidates.CandidateId.in_(list(increments))).update(values, synchronize_session=False)
 
     # Add a new record in the RatingsTracker table
     new_rating = RatingsTracker(StudentNumber=rating_list.rater_student_number,
@@ -3484,7 +4182,8 @@ class VotesList(BaseModel):
 def get_Results_By_Election_Id_And_Position_Name(id: int, position_name: str, db: Session = Depends(get_db)):
     try:
         # Rank the candidates by votes received
-        candidates = db.query(Candidates).filter(Candidates.ElectionId == id, Candidates.SelectedPositionName == position_name).order_by(Candidates.Votes.desc()).all()
+        candidates = db.query(Candidates).options(joinedload(Candidates.student), joinedload(Candidates.partylist)).\
+            filter(Candidates.ElectionId == id, Candidates.SelectedPositionName == position_name).order_by(Candidates.Votes.desc()).all()
 
         # Calculate the total number of votes
         total_votes = sum(candidate.Votes for candidate in candidates)
@@ -3493,15 +4192,14 @@ def get_Results_By_Election_Id_And_Position_Name(id: int, position_name: str, db
         results = []
         for i, candidate in enumerate(candidates):
             # Get the first name middle name if it exist and last name of candidate by studentnumber from student table
-            student = db.query(Student).filter(Student.StudentNumber == candidate.StudentNumber).first()
+            student = candidate.student
             full_name = student.FirstName + " " + student.MiddleName + " " + student.LastName if student.MiddleName else student.FirstName + " " + student.LastName
 
-            # Get the candidate photo using secure URL from Cloudinary
-            display_photo_url = candidate.DisplayPhoto
+            # Get the candidate photo using secure URL from Cloudinary, or the cached copy
+            display_photo_url = cached_image_url(candidate.DisplayPhoto)
 
             # Get candidate partylist
-            partylist = db.query(PartyList).filter(PartyList.PartyListId == candidate.PartyListId).first()
-            partylist_name = partylist.PartyListName if partylist else ""
+            partylist_name = candidate.partylist.PartyListName if candidate.partylist else ""
 
             results.append({
                 'rank': i + 1,
@@ -3526,8 +4224,8 @@ def get_Results_By_Election_Id_And_Position_Name(id: int, position_name: str, db
         # Get the studentorganization logo
         student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == db.query(Election).filter(Election.ElectionId == id).first().StudentOrganizationId).first()
 
-        # Get the studentorganization logo using secure URL from Cloudinary
-        student_organization_logo_url = student_organization.OrganizationLogo
+        # Get the studentorganization logo using secure URL from Cloudinary, or the cached copy
+        student_organization_logo_url = cached_image_url(student_organization.OrganizationLogo)
 
         # Return the VotingEnd
         voting_end = db.query(Election).filter(Election.ElectionId == id).first().VotingEnd
@@ -3565,7 +4263,7 @@ def get_Receipts_By_Election_Id(id: int, db: Session = Depends(get_db)):
     return {"voting_receipts": voting_receipts_dict}
 
 @router.get("/votings/receipt/{id}/download", tags=["Votings"])
-def download_Receipt_By_Id(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def download_Receipt_By_Id(id: int, db: Session = Depends(get_db)):
     voting_receipt = db.query(VotingReceipt).filter(VotingReceipt.VotingReceiptId == id).first()
 
     if not voting_receipt:
@@ -3573,434 +4271,214 @@ def download_Receipt_By_Id(id: int, background_tasks: BackgroundTasks, db: Sessi
 
     try:
         if voting_receipt.ReceiptPDF:
-            get_receipt = voting_receipt.ReceiptPDF
-
-            # Download the PDF
-            pdf = requests.get(get_receipt)
-
-            # Save the PDF named as the student number - receipt
-            file_name = f"{voting_receipt.StudentNumber}-receipt.pdf"
-            with open(file_name, 'wb') as f:
-                f.write(pdf.content)
-                
-            # Schedule the file to be deleted after the response is sent
-            background_tasks.add_task(remove_file, file_name)
-
-            return FileResponse(file_name, filename=file_name, media_type='application/pdf')
+            # Stream the PDF named as the student number - receipt
+            return await stream_remote_file(voting_receipt.ReceiptPDF, f"{voting_receipt.StudentNumber}-receipt.pdf")
+    except HTTPException:
+        # The storage error from stream_remote_file, already a proper response
+        raise
     except:
         return JSONResponse(status_code=500, content={"error": "Error while downloading the voting receipt"})
 
 @router.get("/votings/election/{id}/export", tags=["Votings"])
-def export_Votes_By_Election_Id(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    election = db.query(Election).filter(Election.ElectionId == id).first()
-    election_data = {}  # Changed from [] to {}
-
-    student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
-    
-    # Get the studentorganization logo using secure URL from Cloudinary
-    election_data["StudentOrganizationLogo"] = student_organization.OrganizationLogo
+def export_Votes_By_Election_Id(id: int, db: Session = Depends(get_db)):
+    election_data = get_Election_Report_by_election_id(id, db)
 
-    election_data['StudentOrganizationName'] = student_organization.OrganizationName
-    election_data['ElectionName'] = election.ElectionName
-    election_data['Semester'] = election.Semester
-    election_data['SchoolYear'] = election.SchoolYear
-    election_data['CourseRequirement'] = student_organization.OrganizationMemberRequirements
+    if election_data is None:
+        return JSONResponse(status_code=404, content={"error": "Election not found"})
 
+    # Make a pdf report
     now = manila_now()
-    if now < election.CoCFilingStart.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Pre-Election"
-    elif now >= election.CoCFilingStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.CoCFilingEnd.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Filing Period"
-    elif now >= election.CampaignStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.CampaignEnd.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Campaign Period"
-    elif now >= election.VotingStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Voting Period"
-    #elif now >= election.AppealStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.AppealEnd.replace(tzinfo=timezone('Asia/Manila')):
-    #    election_data["ElectionPeriod"] = "Appeal Period"
-    else:
-        election_data["ElectionPeriod"] = "Post-Election"
+    pdf_name = f"Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
+    pdf_buffer = BytesIO()
+    build_election_report(pdf_buffer, election_data, election_data['CandidatesData'])
+    pdf_buffer.seek(0)
 
-    # Count all candidates for this election
-    num_candidates = db.query(Candidates).filter(Candidates.ElectionId == id).count()
-    election_data['NumberOfCandidates'] = num_candidates    
+    return StreamingResponse(pdf_buffer, media_type='application/pdf', headers={"Content-Disposition": content_disposition(pdf_name)})
 
-    # Count all partylists for this election which is approved
-    num_partylists = db.query(PartyList).filter(PartyList.ElectionId == id, PartyList.Status == 'Approved').count()
-    election_data['NumberOfPartylists'] = num_partylists
+#########################################################
+""" Raw ballot export """
 
-    # Count all voters population for this election
-    num_voters = db.query(Eligibles).filter(Eligibles.ElectionId == id).count()
-    election_data['NumberOfVoters'] = num_voters
+EXPORT_BATCH_SIZE = 5000
 
-    # Count all voters who voted for this election unique by student number
-    active_voters = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == id).distinct(VotingsTracker.VoterStudentNumber).count()
-    election_data['NumberOfActiveVoters'] = active_voters
-    
-    # Count all voters who did not vote for this election
-    inactive_voters = num_voters - active_voters
-    election_data['NumberOfInactiveVoters'] = inactive_voters
+BALLOT_EXPORT_COLUMNS = ["VotingsTrackerId", "ElectionId", "VoterStudentNumber", "VotedCandidateId", "CandidateStudentNumber",
+                         "SelectedPositionName", "CourseId", "CourseCode", "created_at"]
 
-    # Count each voters course distribution for this election
-    # Insert all coursecode in course table as key
-    course_distribution = {}
-    courses = db.query(Course).all()
-    for course in courses:
-        course_distribution[course.CourseCode] = 0
+BALLOT_EXPORT_SCHEMA = pa.schema([
+    ("VotingsTrackerId", pa.int64()),
+    ("ElectionId", pa.int64()),
+    ("VoterStudentNumber", pa.string()),
+    ("VotedCandidateId", pa.int64()),
+    ("CandidateStudentNumber", pa.string()),
+    ("SelectedPositionName", pa.string()),
+    ("CourseId", pa.int64()),
+    ("CourseCode", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
 
-    # Count all in votingstracker table with election id and determine the coursecode via course id unique by student number
-    votes_per_course = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == id).distinct(VotingsTracker.VoterStudentNumber).all()
-    for vote in votes_per_course:
-        # Increment coursecode count via course id
-        course = db.query(Course).filter(Course.CourseId == vote.CourseId).first()
-        course_distribution[course.CourseCode] += 1
+""" Method """
+def iterate_ballot_rows(election_id: int):
+    # Own session since the rows are read while the response streams.
+    # stream_results keeps a server side cursor open so only one batch is held in memory.
+    db = SessionLocal()
 
-    election_data['CourseDistribution'] = course_distribution
+    try:
+        rows = db.query(VotingsTracker.VotingsTrackerId, VotingsTracker.ElectionId, VotingsTracker.VoterStudentNumber,
+                        VotingsTracker.VotedCandidateId, Candidates.StudentNumber, Candidates.SelectedPositionName,
+                        VotingsTracker.CourseId, Course.CourseCode, VotingsTracker.created_at).\
+            outerjoin(Candidates, Candidates.CandidateId == VotingsTracker.VotedCandidateId).\
+            outerjoin(Course, Course.CourseId == VotingsTracker.CourseId).\
+            filter(VotingsTracker.ElectionId == election_id).\
+            order_by(VotingsTracker.VotingsTrackerId).\
+            execution_options(stream_results=True).\
+            yield_per(EXPORT_BATCH_SIZE)
+
+        for row in rows:
+            yield row
+    finally:
+        db.close()
 
-    # Count approved and rejected coc
-    approved_coc = db.query(CoC).filter(CoC.ElectionId == id, CoC.Status == 'Approved').count()
-    election_data['NumberOfApprovedCoC'] = approved_coc
+def iterate_ballot_batches(election_id: int):
+    batch = []
+    for row in iterate_ballot_rows(election_id):
+        batch.append(row)
 
-    rejected_coc = db.query(CoC).filter(CoC.ElectionId == id, CoC.Status == 'Rejected').count()
-    election_data['NumberOfRejectedCoC'] = rejected_coc
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
 
-    # Count approved and rejected partylist
-    approved_partylist = db.query(PartyList).filter(PartyList.ElectionId == id, PartyList.Status == 'Approved').count()
-    election_data['NumberOfApprovedPartylist'] = approved_partylist
+    if batch:
+        yield batch
 
-    rejected_partylist = db.query(PartyList).filter(PartyList.ElectionId == id, PartyList.Status == 'Rejected').count()
-    election_data['NumberOfRejectedPartylist'] = rejected_partylist
+def stream_ballots_csv(election_id: int):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(BALLOT_EXPORT_COLUMNS)
 
-    # Make a pdf report
-    pdf_name = f"Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
-    doc = SimpleDocTemplate(pdf_name, pagesize=landscape(legal), topMargin=36)
-
-    # Get the default style sheet
-    styles = getSampleStyleSheet()
-
-    # Create a list to hold the PDF elements
-    elements = []
-
-    styles.add(ParagraphStyle(name="TitleStyleCenter", fontName="Times-Roman", fontSize=20, alignment=TA_CENTER, spaceAfter=6, leading=12))
-    styles.add(ParagraphStyle(name="TitleStyle2Center", fontName="Times-Roman", fontSize=16, alignment=TA_CENTER, spaceAfter=6, leading=12))
-    styles.add(ParagraphStyle(name="TitleStyle3Center", fontName="Times-Roman", fontSize=14, alignment=TA_CENTER, spaceAfter=6, leading=12))
-
-    styles.add(ParagraphStyle(name="TitleStyleLeft", fontName="Times-Roman", fontSize=12, alignment=TA_LEFT, spaceAfter=6, leading=12))
-    styles.add(ParagraphStyle(name="TitleStyleRight", fontName="Times-Roman", fontSize=12, alignment=TA_RIGHT, spaceAfter=6, leading=12))
-
-    styles.add(ParagraphStyle(name="JustifyContent", fontName="Times-Roman", fontSize=12, alignment=TA_JUSTIFY, spaceAfter=6, leading=12))
-    styles.add(ParagraphStyle(name="HeadingCenter", alignment=TA_CENTER))
-
-    # Add the logo
-    logo = Image("puplogo.png", width=80, height=80)  # Adjust the path and size as needed
-    elements.append(logo)
-    elements.append(Spacer(1, 8))
-
-    # Add the title
-    title = Paragraph("<b>Polytechnic University of the Philippines</b>", styles["TitleStyleCenter"])
-    elements.append(title)
-    elements.append(Spacer(1, 8))
-
-    # Add the election name
-    election_name = Paragraph(election_data['ElectionName'], styles["TitleStyle2Center"])
-    elements.append(election_name)
-
-    # Add the semester
-    semester = Paragraph(f"<b>Semester</b>: {election_data['Semester']}", styles["TitleStyleLeft"])
-    elements.append(Spacer(1, 8))
-
-    # Add the school year
-    school_year = Paragraph(f"<b>School Year</b>: {election_data['SchoolYear']}", styles["TitleStyleLeft"])
-    elements.append(Spacer(1, 8))
-
-    # Add the student organization name
-    student_organization_name = Paragraph(f"<b>Student Organization</b>: {election_data['StudentOrganizationName']}", styles["TitleStyleLeft"])
-    elements.append(Spacer(1, 8))
-
-    # Add the course requirement
-    course_requirement = Paragraph(f"<b>Course</b>: {election_data['CourseRequirement']}", styles["TitleStyleLeft"])
-    elements.append(Spacer(1, 8))
-
-    elements.append(semester)
-    elements.append(school_year)
-    elements.append(student_organization_name)
-    elements.append(course_requirement)
-    elements.append(Spacer(1, 12))
-
-    # Add labels for the metadata
-    metadata_label = Paragraph("<b>Election Metadata</b>", styles["TitleStyle3Center"])
-    elements.append(metadata_label)
-    elements.append(Spacer(1, 8))
-
-    # Make a table rows for the metadatas and column count
-    table_data = [
-        [Paragraph("<b>Metadata</b>", styles["HeadingCenter"]), Paragraph("<b>Count</b>", styles["HeadingCenter"])],
-        ["Voters", election_data['NumberOfVoters']],
-        ["Active Voters", election_data['NumberOfActiveVoters']],
-        ["Inactive Voters", election_data['NumberOfInactiveVoters']],
-        ["Candidates", election_data['NumberOfCandidates']],
-        ["Partylists", election_data['NumberOfPartylists']],
-        ["Approved CoC", election_data['NumberOfApprovedCoC']],
-        ["Rejected CoC", election_data['NumberOfRejectedCoC']],
-        ["Approved Partylist", election_data['NumberOfApprovedPartylist']],
-        ["Rejected Partylist", election_data['NumberOfRejectedPartylist']],
-    ]
+    for batch in iterate_ballot_batches(election_id):
+        writer.writerows([*row[:-1], row[-1].isoformat() if row[-1] else ""] for row in batch)
 
-    # Add the table with grids and headers of title and count
-    table = Table(table_data, colWidths=[doc.width/2.5, doc.width/2.5])
-    table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    ]))
-
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-
-    # Next page
-    elements.append(PageBreak())
-
-    # Add labels for the course distribution
-    course_distribution_label = Paragraph("<b>Voter Course Distribution</b>", styles["TitleStyle3Center"])
-    elements.append(course_distribution_label)
-    elements.append(Spacer(1, 12))
-
-    # Add the course distribution
-    course_distribution = election_data['CourseDistribution']
-    course_distribution_table_data = [
-        [Paragraph("<b>Course</b>", styles["HeadingCenter"]), Paragraph("<b>Total</b>", styles["HeadingCenter"])],
-    ]
-    for course_code, count in course_distribution.items():
-        course_distribution_table_data.append([course_code, count])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
 
-    course_distribution_table = Table(course_distribution_table_data, colWidths=[doc.width/2.5, doc.width/2.5])
-    course_distribution_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    ]))
+    # Header only when there are no votes yet
+    if buffer.tell():
+        yield buffer.getvalue()
 
-    elements.append(course_distribution_table)
-    elements.append(Spacer(1, 16))
+class ParquetChunkSink:
+    # Write target for ParquetWriter that hands the written bytes back to the response after every row group
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
 
-    """
-        Candidates Data
-    """
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
 
-    # Get all the candidates info from coc
-    cocs = db.query(CoC).filter(CoC.ElectionId == id, CoC.Status == 'Approved').all()
-    cocs_all_data = []
+    def tell(self):
+        return self.position
 
-    # Loop over all candidates
-    for coc in cocs:
-        coc_dict = {}
+    def flush(self):
+        pass
 
-        # Get the fullname of the candidate
-        student = db.query(Student).filter(Student.StudentNumber == coc.StudentNumber).first()
-        coc_dict["StudentNumber"] = coc.StudentNumber
-        coc_dict["FullName"] = student.FirstName + " " + student.MiddleName + " " + student.LastName if student.MiddleName else student.FirstName + " " + student.LastName
+    def close(self):
+        self.closed = True
 
-        # Get the display photo using secure URL from Cloudinary
-        coc_dict["DisplayPhoto"] = coc.DisplayPhoto
-
-        # Get the position name of the candidate
-        coc_dict["PositionName"] = coc.SelectedPositionName
-
-        # Get the partylist name of the candidate
-        partylist = db.query(PartyList).filter(PartyList.PartyListId == coc.PartyListId).first()
-        
-        if partylist:
-            coc_dict["PartyListName"] = partylist.PartyListName
-        else:
-            coc_dict["PartyListName"] = "Independent"
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
 
-        # Get candidate course, year and section
-        course = ""
-        year = ""
-        section = ""
+def stream_ballots_parquet(election_id: int):
+    sink = ParquetChunkSink()
+    writer = pq.ParquetWriter(sink, BALLOT_EXPORT_SCHEMA)
 
-        get_student_metadata = get_Student_Metadata_by_studnumber(coc.StudentNumber)
-        get_student_section = get_Student_Section_by_studnumber(coc.StudentNumber)
+    try:
+        # One row group per batch
+        for batch in iterate_ballot_batches(election_id):
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, BALLOT_EXPORT_SCHEMA)],
+                                                    schema=BALLOT_EXPORT_SCHEMA))
+
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
 
-        if "CourseCode" in get_student_metadata:
-            course = get_student_metadata["CourseCode"]
-            year = get_student_metadata["Year"]
+    # The footer is written on close
+    yield sink.drain()
 
-        if get_student_section:
-            section = get_student_section
+@router.get("/votings/election/{id}/export.csv", tags=["Votings"])
+def export_Ballots_CSV_By_Election_Id(id: int, db: Session = Depends(get_db)):
+    election = db.query(Election).filter(Election.ElectionId == id).first()
 
-        coc_dict["CourseYearSection"] = f"{course} {year}-{section}"
+    if not election:
+        return JSONResponse(status_code=404, content={"error": "Election not found"})
 
-        # Get the motto 
-        coc_dict["Motto"] = coc.Motto
+    return StreamingResponse(stream_ballots_csv(id), media_type="text/csv",
+                             headers={"Content-Disposition": content_disposition(f"election_{id}_ballots.csv")})
 
-        # Get candidate platform
-        coc_dict["Platform"] = coc.Platform
+@router.get("/votings/election/{id}/export.parquet", tags=["Votings"])
+def export_Ballots_Parquet_By_Election_Id(id: int, db: Session = Depends(get_db)):
+    election = db.query(Election).filter(Election.ElectionId == id).first()
 
-        # Get candidate votes 
-        candidate = db.query(Candidates).filter(Candidates.ElectionId == id, Candidates.StudentNumber == coc.StudentNumber).first()
-        coc_dict["Votes"] = candidate.Votes
+    if not election:
+        return JSONResponse(status_code=404, content={"error": "Election not found"})
 
-        # Get candidate abstains
-        coc_dict["Abstains"] = candidate.TimesAbstained
+    return StreamingResponse(stream_ballots_parquet(id), media_type="application/vnd.apache.parquet",
+                             headers={"Content-Disposition": content_disposition(f"election_{id}_ballots.parquet")})
 
-        # Get votes per course (Can be specified by VotingTrackers table but course is not included in the table Student and structure will change so keep this for now)
-        candidate_id = candidate.CandidateId
+""" Method """
+def increment_candidate_course_tally(db: Session, election_id: int, candidate_id: int, course_id: int):
+    # Upsert so the first vote of a course and concurrent votes never race on the insert
+    values = {"ElectionId": election_id, "CandidateId": candidate_id, "CourseId": course_id, "Votes": 1}
+    insert = sqlite_insert if db.bind.dialect.name == "sqlite" else postgresql_insert
+
+    statement = insert(CandidateCourseTally).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CandidateCourseTally.ElectionId, CandidateCourseTally.CandidateId, CandidateCourseTally.CourseId],
+        set_={"Votes": CandidateCourseTally.Votes + 1}
+    )
+    db.execute(statement)
 
-        # loop in votingstracker to get the votes per course with corresponing election id and votedcandidate id unique by student number
-        votes_per_course = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == id, VotingsTracker.VotedCandidateId == candidate_id).distinct(VotingsTracker.VoterStudentNumber).all()
-        
-        # Make a dict and insert all coursecode in course table as key and initialize the value to 0
-        course_dict = {}
-        courses = db.query(Course).all()
-        for course in courses:
-            course_dict[course.CourseCode] = 0
-
-        # Loop in votes_per_course and increment the value of coursecode key in course_dict
-        for vote in votes_per_course:
-            # Get the courscode via courseid
-            course = db.query(Course).filter(Course.CourseId == vote.CourseId).first()
-            course_code = course.CourseCode
-
-            course_dict[course_code] += 1
-
-        coc_dict["VotesPerCourse"] = course_dict
-
-        # Get candidate ratings
-        coc_dict["OneStar"] = candidate.OneStar
-        coc_dict["TwoStar"] = candidate.TwoStar
-        coc_dict["ThreeStar"] = candidate.ThreeStar
-        coc_dict["FourStar"] = candidate.FourStar
-        coc_dict["FiveStar"] = candidate.FiveStar
-
-        cocs_all_data.append(coc_dict)
-
-    # Next page
-    elements.append(PageBreak())
-
-    # Add labels for the candidates data
-    candidates_data_label = Paragraph("<b>Candidates Data</b>", styles["TitleStyle3Center"])
-    elements.append(candidates_data_label)
-    elements.append(Spacer(1, 12))
-
-    # Make a table
-    candidates_data_table_data = [
-        [
-            Paragraph("<b>Student Number</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>Candidate Name</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>Course Yr-Sec</b>", styles["HeadingCenter"]),
-            Paragraph("<b>Partylist</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>Position</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>Votes</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>Abstains</b>", styles["HeadingCenter"]),
-        ]
-    ]
+def rebuild_candidate_course_tally(db: Session, election_id: int):
+    # Regenerate the tally of an election from VotingsTracker, one vote per row like increment_candidate_course_tally
+    db.query(CandidateCourseTally).filter(CandidateCourseTally.ElectionId == election_id).delete(synchronize_session=False)
 
-    for coc in cocs_all_data:
-        candidates_data_table_data.append([
-            coc["StudentNumber"],
-            coc["FullName"],
-            coc["CourseYearSection"],
-            coc["PartyListName"],
-            coc["PositionName"],
-            coc["Votes"],
-            coc["Abstains"],
-        ])
-
-    colWidths = [150, 150, 100, 150, 100, 100, 100]  # Adjust the column widths as needed
-
-    candidates_data_table = Table(candidates_data_table_data, colWidths=colWidths)
-    candidates_data_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    ]))
-
-    elements.append(candidates_data_table)
-    elements.append(Spacer(1, 16))
-
-    # Next page
-    elements.append(PageBreak())
-
-    # Add labels for the course distribution
-    course_distribution_label = Paragraph("<b>Voter Course Distribution</b>", styles["TitleStyle3Center"])
-    elements.append(course_distribution_label)
-    elements.append(Spacer(1, 12))
-
-    # Add the course distribution columns are (FullName, courses_dict, Votes)
-    course_distribution_table_data = [
-        [
-            Paragraph("<b>Candidate Name</b>", styles["HeadingCenter"]), 
-            *[Paragraph(f"<b>{course_code}</b>", styles["HeadingCenter"]) for course_code in course_distribution.keys()],
-        ] 
-    ]
+    tally = db.query(VotingsTracker.ElectionId, VotingsTracker.VotedCandidateId, VotingsTracker.CourseId, func.count()).\
+        filter(VotingsTracker.ElectionId == election_id, VotingsTracker.CourseId != None).\
+        group_by(VotingsTracker.ElectionId, VotingsTracker.VotedCandidateId, VotingsTracker.CourseId)
 
-    for coc in cocs_all_data:
-        course_distribution_table_data.append([
-            coc["FullName"],
-            *[Paragraph(str(coc["VotesPerCourse"][course_code]), styles["HeadingCenter"]) for course_code in course_distribution.keys()],
-        ])
-
-    course_distribution_table = Table(course_distribution_table_data, colWidths=[150, 80])
-    course_distribution_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    ]))
-
-    elements.append(course_distribution_table)
-    elements.append(Spacer(1, 16))
-
-    # Next page
-    elements.append(PageBreak())
-
-    # Add labels for the ratings data
-    ratings_data_label = Paragraph("<b>Ratings Data (Each star)</b>", styles["TitleStyle3Center"])
-    elements.append(ratings_data_label)
-    elements.append(Spacer(1, 12))
-
-    # Make a table
-    ratings_data_table_data = [
-        [
-            Paragraph("<b>Student Number</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>Candidate Name</b>", styles["HeadingCenter"]), 
-            Paragraph("<b>One</b>", styles["HeadingCenter"]),
-            Paragraph("<b>Two</b>", styles["HeadingCenter"]),
-            Paragraph("<b>Three</b>", styles["HeadingCenter"]),
-            Paragraph("<b>Four</b>", styles["HeadingCenter"]),
-            Paragraph("<b>Five</b>", styles["HeadingCenter"]),
-        ]
-    ]
+    db.execute(CandidateCourseTally.__table__.insert().from_select(["ElectionId", "CandidateId", "CourseId", "Votes"], tally.statement))
+    db.commit()
 
-    for coc in cocs_all_data:
-        ratings_data_table_data.append([
-            coc["StudentNumber"],
-            coc["FullName"],
-            coc["OneStar"],
-            coc["TwoStar"],
-            coc["ThreeStar"],
-            coc["FourStar"],
-            coc["FiveStar"],
-        ])
+def backfill_candidate_course_tallies():
+    # Elections with votes cast before the tally existed have no tally rows at all
+    db = SessionLocal()
 
-    colWidths = [150, 150, 60]  # Adjust the column widths as needed
+    try:
+        has_tally = db.query(CandidateCourseTally.ElectionId).filter(CandidateCourseTally.ElectionId == VotingsTracker.ElectionId)
+        election_ids = [election_id for election_id, in db.query(VotingsTracker.ElectionId).filter(~has_tally.exists()).distinct().all()]
 
-    ratings_data_table = Table(ratings_data_table_data, colWidths=colWidths)
-    ratings_data_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    ]))
+        for election_id in election_ids:
+            rebuild_candidate_course_tally(db, election_id)
+            print(f"Backfilled the course tally of election {election_id}")
+    finally:
+        db.close()
 
-    elements.append(ratings_data_table)
-    elements.append(Spacer(1, 16))
+@router.post("/votings/election/{id}/tally/rebuild", tags=["Votings"])
+def rebuild_Candidate_Course_Tally_By_Election_Id(id: int, db: Session = Depends(get_db)):
+    election = db.query(Election).filter(Election.ElectionId == id).first()
 
-    # Add the PDF to the elements
-    doc.build(elements)
+    if not election:
+        return JSONResponse(status_code=404, content={"error": "Election not found"})
 
-    # Schedule the file to be deleted after the response is sent
-    background_tasks.add_task(remove_file, pdf_name)
+    rebuild_candidate_course_tally(db, id)
 
-    return FileResponse(pdf_name, filename=pdf_name, media_type='application/pdf')    
+    return {"response": "success"}
 
 """ ** POST Methods: All about VotingsTracker Table APIs ** """
 
@@ -4009,8 +4487,8 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
     # Check if voting period has not yet ended
     election = db.query(Election).filter(Election.ElectionId == votes_list.election_id).first()
 
-    # check for ended voting period only 
-    if manila_now() > election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
+    # check for ended voting period only, the same moment gather_winners_by_election_id runs
+    if has_passed(election.VotingEnd):
         return JSONResponse(status_code=400, content={"error": "Voting period for this election has ended."})
 
     # Check if the student has already voted this election
@@ -4019,6 +4497,17 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
     if existing_vote:
         return JSONResponse(status_code=400, content={"error": "You have already voted for this election."})
     
+    # The voter's course from the SPS tables, resolved before anything is written so a missing course cannot leave half a ballot.
+    # Only votes for candidates are tallied by course, an all-abstain ballot does not need one.
+    get_course_id = None
+
+    if any(vote.candidate_student_number != 'abstain' for vote in votes_list.votes):
+        voter_course = get_Student_Course_by_studnumber(votes_list.voter_student_number, db, live=True)
+        get_course_id = db.query(Course).filter(Course.CourseCode == voter_course).first() if isinstance(voter_course, str) else None
+
+        if not get_course_id:
+            return JSONResponse(status_code=400, content={"error": "Your course could not be found, please contact the administrator."})
+
     election_analytics = db.query(ElectionAnalytics).filter(ElectionAnalytics.ElectionId == votes_list.election_id).first()
 
     for abstain in votes_list.abstainList:
@@ -4051,10 +4540,6 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
 
     for vote in votes_list.votes:
         if vote.candidate_student_number != 'abstain':
-            # Get the course id via voter student number then get the course id in the course table via course code
-            get_course_of_voter = get_Student_Course_by_studnumber(votes_list.voter_student_number, db)
-            get_course_id = db.query(Course).filter(Course.CourseCode == get_course_of_voter).first()
-
             candidate = db.query(Candidates).filter(Candidates.StudentNumber == vote.candidate_student_number, Candidates.ElectionId == votes_list.election_id).first()
 
             # Add a new record in the VotingsTracker table per candidate voted
@@ -4066,6 +4551,9 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
                                         updated_at=manila_now())
             
             db.add(new_vote)
+
+            # +1 the candidate's votes from the voter's course, committed together with the vote
+            increment_candidate_course_tally(db, votes_list.election_id, candidate.CandidateId, get_course_id.CourseId)
             
             # +1 the vote count in ElectionAnalytics table
             election_analytics = db.query(ElectionAnalytics).filter(ElectionAnalytics.ElectionId == votes_list.election_id).first()
@@ -4086,59 +4574,7 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
 
     election = db.query(Election).filter(Election.ElectionId == votes_list.election_id).first()
 
-    # Create the PDF
     now = manila_now()
-    pdf_name = f"Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
-    doc = SimpleDocTemplate(pdf_name, pagesize=letter, topMargin=36)
-
-    # Get the default style sheet
-    styles = getSampleStyleSheet()
-
-    # Create a list to hold the PDF elements
-    elements = []
-
-    styles.add(ParagraphStyle(name="TitleStyleCenter", fontName="Times-Roman", fontSize=12, alignment=TA_CENTER, spaceAfter=6, leading=12))
-
-    styles.add(ParagraphStyle(name="TitleStyleLeft", fontName="Times-Roman", fontSize=12, alignment=TA_LEFT, spaceAfter=6, leading=12))
-    styles.add(ParagraphStyle(name="TitleStyleRight", fontName="Times-Roman", fontSize=12, alignment=TA_RIGHT, spaceAfter=6, leading=12))
-    
-    styles.add(ParagraphStyle(name="JustifyContent", fontName="Times-Roman", fontSize=12, alignment=TA_JUSTIFY, spaceAfter=6, leading=12))
-
-    # Add the logo
-    logo = Image("puplogo.png", width=80, height=80)  # Adjust the path and size as needed
-    elements.append(logo)
-    elements.append(Spacer(1, 18))
-
-    # Add the title
-    elements.append(Paragraph("<b>STUDENT ELECTION OFFICIAL RECEIPT</b>", styles['TitleStyleCenter']))
-    elements.append(Spacer(1, 18))
-
-    # Create a list of lists for the table data
-    data = [
-        [Paragraph(f"<b>Student Number:</b> {votes_list.voter_student_number}", styles['TitleStyleLeft']), 
-        Paragraph(f"<b>Date Voted:</b> {now.strftime('%B %d, %Y %I:%M %p')}", styles['TitleStyleRight'])],
-        [Paragraph(f"<b>Election Name:</b> {election.ElectionName}", styles['TitleStyleLeft']), 
-        Paragraph(f"<b>Receipt Id:</b> {new_voting_receipt.VotingReceiptId}", styles['TitleStyleRight'])]
-    ]
-
-    # Create a table with the data
-    t = Table(data)
-
-    # Create a table style
-    table_style = TableStyle([
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),  # Set left padding to 0 for all cells
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),  # Set right padding to 0 for all cells
-    ])
-
-    # Apply the table style to the table
-    t.setStyle(table_style)
-
-    # Add the table to the elements
-    elements.append(t)
-    elements.append(Spacer(1, 18))
-
-    elements.append(Paragraph(f"Note: This receipt serves as confirmation that your vote in the {election.ElectionName} has been successfully cast. Please keep this receipt for your records.", styles['JustifyContent']))
-    elements.append(Spacer(1, 18))
 
     # Group votes by position
     votes_by_position = defaultdict(list)
@@ -4152,13 +4588,6 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
 
             votes_by_position[candidate.SelectedPositionName].append(candidate.StudentNumber + ": " + full_name)
 
-    # Loop through the votes list
-    for position, candidates in votes_by_position.items():
-        elements.append(Paragraph(f"<b>Voted for position {position}:</b>", styles['TitleStyleLeft']))
-        for candidate in candidates:
-            elements.append(Paragraph(f"{candidate}", styles['TitleStyleLeft']))
-            elements.append(Spacer(1, 12))
-
     # Group abstains by position
     abstains_by_position = defaultdict(list)
     for abstain in votes_list.abstainList:
@@ -4169,33 +4598,18 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
             if candidate.SelectedPositionName not in abstains_by_position[candidate.SelectedPositionName]:
                 abstains_by_position[candidate.SelectedPositionName].append(candidate.SelectedPositionName)
 
-    # Check if there are no abstains in abstain_by_position
-    if not abstains_by_position:
-        elements.append(Paragraph(f"<b>Abstained list:</b> None", styles['TitleStyleLeft']))
-    else:
-        # Loop through the abstain list
-        elements.append(Paragraph(f"<b>Abstained list:</b>", styles['TitleStyleLeft']))
-        for position, abstains in abstains_by_position.items():
-            for abstain in abstains:
-                elements.append(Paragraph(f"{abstain}", styles['TitleStyleLeft']))
-
-
-    elements.append(Spacer(1, 16))
-    elements.append(Paragraph(f"Thank you for participating in the democratic process of our institution!", styles['TitleStyleLeft']))
-
-    # Build the PDF
-    doc.build(elements)
+    # Create the PDF in memory
+    pdf_buffer = BytesIO()
+    build_receipt(pdf_buffer, votes_list.voter_student_number, election.ElectionName, new_voting_receipt.VotingReceiptId, now,
+                  votes_by_position, [abstain for abstains in abstains_by_position.values() for abstain in abstains])
 
     # Upload the PDF to cloudinary
-    upload_result = cloudinary.uploader.upload(pdf_name, public_id=f"Votings/voting_{votes_list.voter_student_number}_{now.strftime('%Y%m%d_%H%M%S')}", 
+    upload_result = cloudinary.uploader.upload(pdf_buffer.getvalue(), public_id=f"Votings/voting_{votes_list.voter_student_number}_{now.strftime('%Y%m%d_%H%M%S')}", 
                                             tags=[f'voting_{votes_list.voter_student_number}'])
     
     new_voting_receipt.ReceiptPDF = upload_result['secure_url']
     db.commit()
 
-    # Delete the local file
-    os.remove(pdf_name)
-
     return {"response": "success",
             "upload_result": upload_result['secure_url']}
 
@@ -4206,114 +4620,103 @@ def save_Votes(votes_list: VotesList, db: Session = Depends(get_db)):
 
 def gather_winners_by_election_id(election_id: int):
     db = SessionLocal()  # create a new session
-    election = db.query(Election).filter(Election.ElectionId == election_id).first()
 
-    # Check if winners for this election have already been added
-    existing_winners = db.query(ElectionWinners).filter(ElectionWinners.ElectionId == election_id).first()
-    if existing_winners is not None:
-        print("Winners for this election have already been added.")
-        return
-    
-    # Gather all candidates for a specific election
-    all_candidates_for_election = db.query(Candidates).filter(Candidates.ElectionId == election.ElectionId).all()
-
-    # Sort all candidates by votes in descending order
-    all_candidates_for_election.sort(key=lambda candidate: candidate.Votes, reverse=True)
-
-    # Count the number of candidates for each position
-    num_candidates_per_position = defaultdict(int)
-    for candidate in all_candidates_for_election:
-        num_candidates_per_position[candidate.SelectedPositionName] += 1
-
-    # Get the required number of winners for each position in the current election
-    num_winners_per_position = {position.PositionName: int(position.PositionQuantity) for position in db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == election.ElectionId)}
-
-    # Initialize a dictionary to store the candidates for each position
-    candidates_per_position = defaultdict(list)
-    for candidate in all_candidates_for_election:
-        # Check if we have already selected the required number of candidates for this position
-        if len(candidates_per_position[candidate.SelectedPositionName]) < num_winners_per_position[candidate.SelectedPositionName]:
-            candidates_per_position[candidate.SelectedPositionName].append(candidate)
-        elif len(candidates_per_position[candidate.SelectedPositionName]) == num_winners_per_position[candidate.SelectedPositionName] and candidates_per_position[candidate.SelectedPositionName][-1].Votes == candidate.Votes:
-            # If there's a tie for the last spot, add the candidate to the list
-            candidates_per_position[candidate.SelectedPositionName].append(candidate)
-
-    # Get the organization based on the election id
-    organization = db.query(StudentOrganization).filter_by(StudentOrganizationId=election.StudentOrganizationId).first()
-
-    # Get the number of eligible voters in Eligibles by election id
-    num_eligible_voters = db.query(Eligibles).filter_by(ElectionId=election.ElectionId).count()
-
-    #if manila_now() > election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
-    # Store the winners in the ElectionWinners table
-    print("Adding winners to the ElectionWinners table...")
-
-    for position, candidates in candidates_per_position.items():
-        # If there's exactly one candidate for this position, check if the candidate has achieved the required vote threshold
-
-        print("Im heree")
-        if num_candidates_per_position[position] == 1:
-            # Calculate the vote threshold
-            vote_threshold = (num_eligible_voters // 2) + 1  # 50% students + 1 vote constraint
-
-            if candidates[0].Votes >= vote_threshold:
-                winner = ElectionWinners(ElectionId=election.ElectionId, 
-                                        StudentNumber=candidates[0].StudentNumber, 
-                                        SelectedPositionName=position,
-                                        Votes=candidates[0].Votes,
-                                        IsTied=False,
-                                        created_at=manila_now(),
-                                        updated_at=manila_now())
-                db.add(winner)
-        else:  # There's more than one candidate for this position
-            # The candidates with the highest votes win
-            max_votes = max(candidate.Votes for candidate in candidates)
-
-            if max_votes > 0:
-                winners = [candidate for candidate in candidates if candidate.Votes == max_votes]
-
-                # Check if there's a tie
-                is_tied = len(winners) > num_winners_per_position[position]
-
-                for winner_candidate in winners:
-                    winner = ElectionWinners(ElectionId=election.ElectionId, 
-                                            StudentNumber=winner_candidate.StudentNumber, 
-                                            SelectedPositionName=position,
-                                            Votes=winner_candidate.Votes,
-                                            IsTied=is_tied,
-                                            created_at=manila_now(),
-                                            updated_at=manila_now())
-                    db.add(winner)
+    try:
+        election = db.query(Election).filter(Election.ElectionId == election_id).first()
 
-        db.commit()
+        # Claim the election in the same transaction as the winners and the announcement. A second run waits on
+        # this row lock and then finds it claimed, even when the first run found no winners at all.
+        claimed = db.query(Election).\
+            filter(Election.ElectionId == election_id, Election.WinnersGatheredAt.is_(None)).\
+            update({"WinnersGatheredAt": manila_now()}, synchronize_session=False)
 
-    # Create the new announcement for winners
-    new_announcement = Announcement(
-        AnnouncementType="results",
-        AnnouncementTitle=f"Winners for the {election.ElectionName}",
-        AnnouncementBody = f"We are thrilled to announce that the results of the {election.ElectionName} are now available! We extend our heartfelt gratitude to everyone who participated and made this event a success. For more detailed information about the election, please visit the {election.ElectionName} page.",
-        AttachmentType="Banner",
-        AttachmentImage="", # Initialize the AttachmentImage column with an empty string
-        created_at=manila_now(),
-        updated_at=manila_now()
-    )
-    db.add(new_announcement)
-    db.commit()
+        if not claimed:
+            db.rollback()
+            print("Winners for this election have already been added.")
+            return
+
+        # Gather all candidates for a specific election
+        candidates = pd.DataFrame(db.query(Candidates.SelectedPositionName, Candidates.StudentNumber, Candidates.Votes).filter(Candidates.ElectionId == election.ElectionId).all(),
+                                  columns=["SelectedPositionName", "StudentNumber", "Votes"])
+
+        # Get the required number of winners for each position in the current election
+        num_winners_per_position = {position.PositionName: int(position.PositionQuantity) for position in db.query(CreatedElectionPosition).filter(CreatedElectionPosition.ElectionId == election.ElectionId)}
 
-    folder_name = f"Announcements/announcement_{new_announcement.AnnouncementId}"
+        # Get the number of eligible voters in Eligibles by election id
+        num_eligible_voters = db.query(Eligibles).filter_by(ElectionId=election.ElectionId).count()
+
+        winners = determine_winners(candidates, num_winners_per_position, num_eligible_voters)
+
+        # Store the winners in the ElectionWinners table and the announcement in one transaction
+        print("Adding winners to the ElectionWinners table...")
+
+        now = manila_now()
+        db.bulk_insert_mappings(ElectionWinners, [{
+            "ElectionId": election.ElectionId,
+            "StudentNumber": winner.StudentNumber,
+            "SelectedPositionName": winner.SelectedPositionName,
+            "Votes": int(winner.Votes),
+            "IsTied": bool(winner.IsTied),
+            "created_at": now,
+            "updated_at": now,
+        } for winner in winners.itertuples(index=False)])
+
+        # Create the new announcement for winners
+        new_announcement = Announcement(
+            AnnouncementType="results",
+            AnnouncementTitle=f"Winners for the {election.ElectionName}",
+            AnnouncementBody = f"We are thrilled to announce that the results of the {election.ElectionName} are now available! We extend our heartfelt gratitude to everyone who participated and made this event a success. For more detailed information about the election, please visit the {election.ElectionName} page.",
+            AttachmentType="Banner",
+            AttachmentImage="", # Initialize the AttachmentImage column with an empty string
+            created_at=now,
+            updated_at=now
+        )
+        db.add(new_announcement)
+        db.flush() # Flush the session to get the AnnouncementId
+
+        # Store the tag in the AttachmentImage column
+        announcement_id = new_announcement.AnnouncementId
+        new_announcement.AttachmentImage = "announcement_" + str(announcement_id)
+
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another run already stored the winners, its announcement is kept and this one is dropped
+            db.rollback()
+            print("Winners for this election have already been added.")
+            return
+    finally:
+        db.close()
 
     # Upload the image to cloudinary
-    response = cloudinary.uploader.upload("winner-image.jpg", public_id=f"{folder_name}/winner-image.jpg", tags=[f'announcement_{new_announcement.AnnouncementId}'])
+    folder_name = f"Announcements/announcement_{announcement_id}"
+    upload_with_retry("winner-image.jpg", public_id=f"{folder_name}/winner-image.jpg", tags=[f'announcement_{announcement_id}'])
 
-    # Store the URL in the AttachmentImage column
-    new_announcement.AttachmentImage = "announcement_" + str(new_announcement.AnnouncementId)
+def schedule_upcoming_winner_gathering():
+    db = SessionLocal()
 
-    db.commit()
+    try:
+        now = manila_wall_clock()
+        elections = db.query(Election.ElectionId, Election.VotingEnd).filter(Election.VotingEnd > now).all()
+    finally:
+        db.close()
+
+    for election_id, voting_end in elections:
+        # Same id as save_election so every worker replaces the same job instead of adding its own
+        trigger = DateTrigger(run_date=voting_end, timezone=timezone('Asia/Manila'))
+        scheduler.add_job(gather_winners_by_election_id, trigger=trigger, id=f'gather_winners_{election_id}', args=[election_id], replace_existing=True)
 
-    # Remove students in eligibles table with election id since voting period has ended
-    #db.query(Eligibles).filter(Eligibles.ElectionId == election.ElectionId).delete()
-    #db.commit()
+def schedule_upcoming_phase_transitions():
+    db = SessionLocal()
+
+    try:
+        now = manila_wall_clock()
+        elections = db.query(Election).filter(Election.VotingEnd > now).all()
+    finally:
+        db.close()
 
+    for election in elections:
+        schedule_phase_transitions(election)
 
 """ ** GET Methods: ElectionWinners Table APIs ** """
     
@@ -4353,7 +4756,8 @@ def get_Winners_By_Election_Id(election_id: int, db: Session = Depends(get_db)):
         # Get the display photo using secure URL from Cloudinary
         display_photo_url = candidate.DisplayPhoto
 
-        winners_dict[winner.SelectedPositionName]["is_tied"] = winner.IsTied
+        # Only the candidates sharing the last seat are tied, the position is tied if any of its winners is
+        winners_dict[winner.SelectedPositionName]["is_tied"] = winners_dict[winner.SelectedPositionName]["is_tied"] or winner.IsTied
         winners_dict[winner.SelectedPositionName]["no_winner"] = False
 
         candidate_dict = {
@@ -4425,18 +4829,24 @@ class ElectionAppealsData(BaseModel):
 
 """ ** GET Methods: ElectionAppeals Table APIs ** """
 @router.get("/election-appeals/all", tags=["ElectionAppeals"])
-def get_All_Election_Appeals(db: Session = Depends(get_db)):
-    appeals = db.query(ElectionAppeals).order_by(ElectionAppeals.ElectionAppealsId).all()
+def get_All_Election_Appeals(after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), fields: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        selected = parse_fields(fields, [column.key for column in ElectionAppeals.__table__.columns] + ["Student"])
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    appeals = paginate(db.query(ElectionAppeals).options(selectinload(ElectionAppeals.student)), ElectionAppeals.ElectionAppealsId, after, limit).all()
 
     appeals_with_student = []
     for i, appeal in enumerate(appeals):
-        student = db.query(Student).filter(Student.StudentNumber == appeal.StudentNumber).first()
+        student = appeal.student
         appeal_dict = appeal.to_dict()
 
         appeal_dict["Student"] = student.to_dict() if student else {}
         appeals_with_student.append(appeal_dict)
 
-    return {"appeals": appeals_with_student}
+    return paginated_response({"appeals": project(appeals_with_student, selected)}, total_count(db, ElectionAppeals.ElectionAppealsId),
+                              appeals[-1].ElectionAppealsId if appeals else None, len(appeals), limit)
 
 @router.get("/election-appeals/{id}", tags=["ElectionAppeals"])
 def get_Election_Appeals_By_Id(id: int, db: Session = Depends(get_db)):
@@ -4522,11 +4932,15 @@ def save_Election_Appeals_Respond(data: ElectionAppealsRespondData, background_t
 
 """ SGEReports Table APIs """
 
-""" ** GET Methods: SGEReports Table APIs ** """
-@router.get("/reports/election/{id}", tags=["Reports"])
-def get_Reports_By_Election_Id(id: int, db: Session = Depends(get_db)):
+""" Method """
+def get_Election_Report_by_election_id(id: int, db: Session):
+    # Shared by the JSON report and the PDF export, a fixed number of queries whatever the turnout
     election = db.query(Election).filter(Election.ElectionId == id).first()
-    election_data = {}  # Changed from [] to {}
+
+    if not election:
+        return None
+
+    election_data = {}
 
     student_organization = db.query(StudentOrganization).filter(StudentOrganization.StudentOrganizationId == election.StudentOrganizationId).first()
     
@@ -4539,82 +4953,107 @@ def get_Reports_By_Election_Id(id: int, db: Session = Depends(get_db)):
     election_data['SchoolYear'] = election.SchoolYear
     election_data['CourseRequirement'] = student_organization.OrganizationMemberRequirements
 
-    now = manila_now()
-    if now < election.CoCFilingStart.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Pre-Election"
-    elif now >= election.CoCFilingStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.CoCFilingEnd.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Filing Period"
-    elif now >= election.CampaignStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.CampaignEnd.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Campaign Period"
-    elif now >= election.VotingStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.VotingEnd.replace(tzinfo=timezone('Asia/Manila')):
-        election_data["ElectionPeriod"] = "Voting Period"
-    #elif now >= election.AppealStart.replace(tzinfo=timezone('Asia/Manila')) and now < election.AppealEnd.replace(tzinfo=timezone('Asia/Manila')):
-    #    election_data["ElectionPeriod"] = "Appeal Period"
-    else:
-        election_data["ElectionPeriod"] = "Post-Election"
-
+    election_data["ElectionPeriod"] = get_election_phase(election)
 
-    # Count all candidates for this election
-    num_candidates = db.query(Candidates).filter(Candidates.ElectionId == id).count()
-    election_data['NumberOfCandidates'] = num_candidates    
+    # Count all candidates and voters population for this election
+    election_data['NumberOfCandidates'] = db.query(func.count(Candidates.CandidateId)).filter(Candidates.ElectionId == id).scalar()
+    num_voters = db.query(func.count(Eligibles.EligibleId)).filter(Eligibles.ElectionId == id).scalar()
+    election_data['NumberOfVoters'] = num_voters
 
-    # Count all partylists for this election which is approved
-    num_partylists = db.query(PartyList).filter(PartyList.ElectionId == id, PartyList.Status == 'Approved').count()
-    election_data['NumberOfPartylists'] = num_partylists
+    # Count CoC and partylist per status
+    coc_status_counts = dict(db.query(CoC.Status, func.count(CoC.CoCId)).filter(CoC.ElectionId == id).group_by(CoC.Status).all())
+    partylist_status_counts = dict(db.query(PartyList.Status, func.count(PartyList.PartyListId)).filter(PartyList.ElectionId == id).group_by(PartyList.Status).all())
 
-    # Count all voters population for this election
-    num_voters = db.query(Eligibles).filter(Eligibles.ElectionId == id).count()
-    election_data['NumberOfVoters'] = num_voters
+    election_data['NumberOfPartylists'] = partylist_status_counts.get('Approved', 0)
+    election_data['NumberOfApprovedCoC'] = coc_status_counts.get('Approved', 0)
+    election_data['NumberOfRejectedCoC'] = coc_status_counts.get('Rejected', 0)
+    election_data['NumberOfApprovedPartylist'] = partylist_status_counts.get('Approved', 0)
+    election_data['NumberOfRejectedPartylist'] = partylist_status_counts.get('Rejected', 0)
 
     # Count all voters who voted for this election unique by student number
-    active_voters = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == id).distinct(VotingsTracker.VoterStudentNumber).count()
+    active_voters = db.query(func.count(func.distinct(VotingsTracker.VoterStudentNumber))).filter(VotingsTracker.ElectionId == id).scalar()
     election_data['NumberOfActiveVoters'] = active_voters
-    
-    # Count all voters who did not vote for this election
-    inactive_voters = num_voters - active_voters
-    election_data['NumberOfInactiveVoters'] = inactive_voters
+    election_data['NumberOfInactiveVoters'] = num_voters - active_voters
 
-    # Count each voters course distribution for this election
-    # Insert all coursecode in course table as key
-    course_distribution = {}
-    courses = db.query(Course).all()
-    for course in courses:
-        course_distribution[course.CourseCode] = 0
+    # Every course code starts at 0 so the tables have the same columns
+    course_codes = dict(db.query(Course.CourseId, Course.CourseCode).all())
 
-    # Count all in votingstracker table with election id and determine the coursecode via course id unique by student number
-    votes_per_course = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == id).distinct(VotingsTracker.VoterStudentNumber).all()
-    for vote in votes_per_course:
-        # Increment coursecode count via course id
-        course = db.query(Course).filter(Course.CourseId == vote.CourseId).first()
-        course_distribution[course.CourseCode] += 1
+    # Voter course distribution unique by student number
+    voters_per_course = db.query(VotingsTracker.CourseId, func.count(func.distinct(VotingsTracker.VoterStudentNumber))).\
+        filter(VotingsTracker.ElectionId == id).\
+        group_by(VotingsTracker.CourseId).all()
+
+    course_distribution = {course_code: 0 for course_code in course_codes.values()}
+    for course_id, count in voters_per_course:
+        if course_id in course_codes:
+            course_distribution[course_codes[course_id]] += count
 
     election_data['CourseDistribution'] = course_distribution
 
-    # Count approved and rejected coc
-    approved_coc = db.query(CoC).filter(CoC.ElectionId == id, CoC.Status == 'Approved').count()
-    election_data['NumberOfApprovedCoC'] = approved_coc
+    # Votes of every candidate per course unique by student number
+    votes_per_candidate_course = db.query(VotingsTracker.VotedCandidateId, VotingsTracker.CourseId, func.count(func.distinct(VotingsTracker.VoterStudentNumber))).\
+        filter(VotingsTracker.ElectionId == id).\
+        group_by(VotingsTracker.VotedCandidateId, VotingsTracker.CourseId).all()
 
-    rejected_coc = db.query(CoC).filter(CoC.ElectionId == id, CoC.Status == 'Rejected').count()
-    election_data['NumberOfRejectedCoC'] = rejected_coc
+    votes_per_course_by_candidate = defaultdict(lambda: {course_code: 0 for course_code in course_codes.values()})
+    for candidate_id, course_id, count in votes_per_candidate_course:
+        if course_id in course_codes:
+            votes_per_course_by_candidate[candidate_id][course_codes[course_id]] += count
 
-    # Count approved and rejected partylist
-    approved_partylist = db.query(PartyList).filter(PartyList.ElectionId == id, PartyList.Status == 'Approved').count()
-    election_data['NumberOfApprovedPartylist'] = approved_partylist
+    # Return all candidates, fullname, student number
+    candidates = db.query(Student.StudentNumber, Student.FirstName, Student.MiddleName, Student.LastName).\
+        join(Candidates, Candidates.StudentNumber == Student.StudentNumber).\
+        filter(Candidates.ElectionId == id).\
+        order_by(Candidates.CandidateId).all()
+
+    election_data['Candidates'] = [{
+        "FullName": first_name + " " + middle_name + " " + last_name if middle_name else first_name + " " + last_name,
+        "StudentNumber": student_number,
+    } for student_number, first_name, middle_name, last_name in candidates]
+
+    # Candidates data of the approved CoCs
+    cocs = db.query(CoC, Student, PartyList.PartyListName, Candidates).\
+        join(Student, Student.StudentNumber == CoC.StudentNumber).\
+        outerjoin(PartyList, PartyList.PartyListId == CoC.PartyListId).\
+        outerjoin(Candidates, and_(Candidates.ElectionId == id, Candidates.StudentNumber == CoC.StudentNumber)).\
+        filter(CoC.ElectionId == id, CoC.Status == 'Approved').all()
+
+    profiles = get_Student_Profiles_by_studnumbers([coc.StudentNumber for coc, _, _, _ in cocs], db)
+    cocs_all_data = []
 
-    rejected_partylist = db.query(PartyList).filter(PartyList.ElectionId == id, PartyList.Status == 'Rejected').count()
-    election_data['NumberOfRejectedPartylist'] = rejected_partylist
+    for coc, student, partylist_name, candidate in cocs:
+        profile = profiles.get(coc.StudentNumber, {})
 
-    # Return all candidates, fullname, student number
-    candidates = db.query(Candidates).filter(Candidates.ElectionId == id).order_by(Candidates.CandidateId).all()
-    candidates_dict = []
-    for candidate in candidates:
-        student = db.query(Student).filter(Student.StudentNumber == candidate.StudentNumber).first()
-        candidates_dict.append({
+        cocs_all_data.append({
+            "StudentNumber": coc.StudentNumber,
             "FullName": student.FirstName + " " + student.MiddleName + " " + student.LastName if student.MiddleName else student.FirstName + " " + student.LastName,
-            "StudentNumber": student.StudentNumber,
+            "DisplayPhoto": coc.DisplayPhoto,
+            "PositionName": coc.SelectedPositionName,
+            "PartyListName": partylist_name if partylist_name else "Independent",
+            "CourseYearSection": f"{profile.get('CourseCode', '')} {profile.get('Year', '')}-{profile.get('Section', '')}",
+            "Motto": coc.Motto,
+            "Platform": coc.Platform,
+            "Votes": candidate.Votes if candidate else 0,
+            "Abstains": candidate.TimesAbstained if candidate else 0,
+            "VotesPerCourse": dict(votes_per_course_by_candidate[candidate.CandidateId]) if candidate else {course_code: 0 for course_code in course_codes.values()},
+            "OneStar": candidate.OneStar if candidate else 0,
+            "TwoStar": candidate.TwoStar if candidate else 0,
+            "ThreeStar": candidate.ThreeStar if candidate else 0,
+            "FourStar": candidate.FourStar if candidate else 0,
+            "FiveStar": candidate.FiveStar if candidate else 0,
         })
 
-    election_data['Candidates'] = candidates_dict
+    election_data['CandidatesData'] = cocs_all_data
+
+    return election_data
+
+""" ** GET Methods: SGEReports Table APIs ** """
+@router.get("/reports/election/{id}", tags=["Reports"])
+def get_Reports_By_Election_Id(id: int, db: Session = Depends(get_db)):
+    election_data = get_Election_Report_by_election_id(id, db)
+
+    if election_data is None:
+        return JSONResponse(status_code=404, content={"error": "Election not found"})
 
     return {"election": election_data}
 
@@ -4672,25 +5111,15 @@ def get_Reports_By_Election_Id_And_Candidate_StudentNumber(election_id: int, stu
     # Get candidate abstains
     coc_dict["Abstains"] = candidate.TimesAbstained
 
-    # Get votes per course (Can be specified by VotingTrackers table but course is not included in the table Student and structure will change so keep this for now)
-    candidate_id = candidate.CandidateId
-
-    # loop in votingstracker to get the votes per course with corresponing election id and votedcandidate id unique by student number
-    votes_per_course = db.query(VotingsTracker).filter(VotingsTracker.ElectionId == election_id, VotingsTracker.VotedCandidateId == candidate_id).distinct(VotingsTracker.VoterStudentNumber).all()
-    
-    # Make a dict and insert all coursecode in course table as key and initialize the value to 0
-    course_dict = {}
-    courses = db.query(Course).all()
-    for course in courses:
-        course_dict[course.CourseCode] = 0
+    # Get votes per course from the candidate course tally, every course code starts at 0
+    course_dict = {course_code: 0 for course_code, in db.query(Course.CourseCode).all()}
 
-    # Loop in votes_per_course and increment the value of coursecode key in course_dict
-    for vote in votes_per_course:
-        # Get the courscode via courseid
-        course = db.query(Course).filter(Course.CourseId == vote.CourseId).first()
-        course_code = course.CourseCode
+    votes_per_course = db.query(Course.CourseCode, CandidateCourseTally.Votes).\
+        join(Course, Course.CourseId == CandidateCourseTally.CourseId).\
+        filter(CandidateCourseTally.ElectionId == election_id, CandidateCourseTally.CandidateId == candidate.CandidateId).all()
 
-        course_dict[course_code] += 1
+    for course_code, votes in votes_per_course:
+        course_dict[course_code] = votes
 
     coc_dict["VotesPerCourse"] = course_dict
 
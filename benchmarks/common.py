@@ -0,0 +1,50 @@
+"""
+Shared setup of the benchmark scripts.
+
+The benchmarks insert and delete synthetic rows, so they run against a throwaway SQLite database
+unless --database-url points them at a scratch database.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The same database setup and app import as the tests
+from tests.sandbox import prepare_database, import_api
+
+def argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--database-url", help="scratch database to run against, a temporary SQLite file by default")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    return parser
+
+def load_api(database_url=None):
+    # The caches api creates on import go to a temporary directory
+    directory = tempfile.mkdtemp(prefix="sge-benchmark-")
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(directory, 'sge.db')}"
+    os.chdir(directory)
+
+    prepare_database()
+    return import_api()
+
+def measure(function, repeat, setup=None):
+    # Best and median of the runs, in milliseconds. setup is not timed, its result is passed to function.
+    timings = []
+
+    for _ in range(repeat):
+        arguments = (setup(),) if setup else ()
+
+        start = time.perf_counter()
+        function(*arguments)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return min(timings), statistics.median(timings)
+
+def report(title, before, after):
+    print(f"{title:<24} before {before[0]:9.1f} ms (median {before[1]:9.1f})   "
+          f"after {after[0]:9.1f} ms (median {after[1]:9.1f})   {before[0] / after[0]:5.1f}x")
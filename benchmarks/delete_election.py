@@ -0,0 +1,148 @@
+"""
+Deleting a large synthetic election through /election/delete.
+
+Before: the old delete_rows, every row of every child table loaded into the session and deleted one by one,
+with a commit per table. The tables are taken in the current foreign key order so PostgreSQL accepts it too.
+After: delete_Election as it is now, one DELETE per table in a single transaction.
+
+    python benchmarks/delete_election.py --eligibles 15000 --votes 100000
+"""
+from datetime import datetime, timedelta
+import uuid
+
+from common import argument_parser, load_api, measure, report
+
+POSITIONS = ["President", "Vice President", "Secretary", "Treasurer", "Auditor"]
+CANDIDATES_PER_POSITION = 3
+
+def seed_voters(db, count, prefix):
+    from sqlalchemy import insert
+    from models import Student
+
+    db.execute(insert(Student), [{"StudentNumber": f"{prefix}-{index:06d}", "FirstName": f"Juan {index}", "LastName": "Dela Cruz",
+                                  "Email": f"{prefix}-{index}@example.com", "Password": "", "IsOfficer": False}
+                                 for index in range(count)])
+    db.commit()
+
+    return [f"{prefix}-{index:06d}" for index in range(count)]
+
+def seed_election(db, voters, votes):
+    from sqlalchemy import insert
+    from models import Election, CreatedElectionPosition, PartyList, CoC, Candidates, ElectionAnalytics, Eligibles, VotingsTracker, \
+        CandidateCourseTally, RatingsTracker, ElectionWinners, VotingReceipt, Certifications, CreatedAdminSignatory, CertificationJobs
+
+    now = datetime.now()
+    election = Election(ElectionName=f"Benchmark {uuid.uuid4().hex[:6]}", VotingStart=now - timedelta(days=2), VotingEnd=now - timedelta(days=1))
+    db.add(election)
+    db.flush()
+    election_id = election.ElectionId
+
+    partylist = PartyList(ElectionId=election_id, PartyListName="Benchmark", Status="Approved")
+    db.add(partylist)
+    db.add(ElectionAnalytics(ElectionId=election_id, AbstainCount=0, VotesCount=votes))
+    db.add(CertificationJobs(ElectionId=election_id, Total=len(POSITIONS), Completed=len(POSITIONS), Failed=0, Status="Completed"))
+    db.flush()
+
+    candidate_numbers = voters[:len(POSITIONS) * CANDIDATES_PER_POSITION]
+    candidate_positions = [POSITIONS[index // CANDIDATES_PER_POSITION] for index in range(len(candidate_numbers))]
+
+    db.execute(insert(CreatedElectionPosition), [{"ElectionId": election_id, "PositionName": position, "PositionQuantity": "1"} for position in POSITIONS])
+    db.execute(insert(CoC), [{"ElectionId": election_id, "StudentNumber": student_number, "PartyListId": partylist.PartyListId,
+                              "SelectedPositionName": position, "Status": "Approved"}
+                             for student_number, position in zip(candidate_numbers, candidate_positions)])
+    db.execute(insert(Candidates), [{"ElectionId": election_id, "StudentNumber": student_number, "PartyListId": partylist.PartyListId,
+                                     "SelectedPositionName": position, "Votes": 0, "TimesAbstained": 0}
+                                    for student_number, position in zip(candidate_numbers, candidate_positions)])
+    candidate_ids = [candidate_id for candidate_id, in db.query(Candidates.CandidateId).filter(Candidates.ElectionId == election_id).order_by(Candidates.CandidateId)]
+
+    db.execute(insert(Eligibles), [{"ElectionId": election_id, "StudentNumber": voter, "HasVotedOrAbstained": True} for voter in voters])
+    db.execute(insert(VotingReceipt), [{"ElectionId": election_id, "StudentNumber": voter, "ReceiptPDF": ""} for voter in voters])
+    db.execute(insert(RatingsTracker), [{"ElectionId": election_id, "StudentNumber": voter} for voter in voters])
+    db.execute(insert(VotingsTracker), [{"ElectionId": election_id, "VoterStudentNumber": voters[index % len(voters)],
+                                         "VotedCandidateId": candidate_ids[index % len(candidate_ids)], "CourseId": index % 10}
+                                        for index in range(votes)])
+    db.execute(insert(CandidateCourseTally), [{"ElectionId": election_id, "CandidateId": candidate_id, "CourseId": course_id, "Votes": 1}
+                                              for candidate_id in candidate_ids for course_id in range(10)])
+
+    for student_number, position in list(zip(candidate_numbers, candidate_positions))[::CANDIDATES_PER_POSITION]:
+        db.add(ElectionWinners(ElectionId=election_id, StudentNumber=student_number, SelectedPositionName=position, Votes=1, IsTied=False))
+
+        certification = Certifications(Title="Oath of office", ElectionId=election_id, StudentNumber=student_number, AssetId="")
+        db.add(certification)
+        db.flush()
+        db.add(CreatedAdminSignatory(CertificationId=certification.CertificationId, SignatoryName="Adviser", SignatoryPosition="Adviser"))
+
+    db.commit()
+    return election_id
+
+def delete_election_per_row(api, db, election_id):
+    # The old delete_rows loop
+    from models import Election, Certifications, CreatedAdminSignatory
+
+    certification_ids = [certification_id for certification_id, in db.query(Certifications.CertificationId).filter(Certifications.ElectionId == election_id)]
+    for row in db.query(CreatedAdminSignatory).filter(CreatedAdminSignatory.CertificationId.in_(certification_ids)).all():
+        db.delete(row)
+    db.commit()
+
+    for table in api.ELECTION_CHILD_TABLES:
+        rows = db.query(table).filter(table.ElectionId == election_id).all()
+        for row in rows:
+            db.delete(row)
+        db.commit()
+
+    db.delete(db.query(Election).filter(Election.ElectionId == election_id).first())
+    db.commit()
+
+def remaining_rows(api, db, election_id):
+    return sum(db.query(table).filter(table.ElectionId == election_id).count() for table in api.ELECTION_CHILD_TABLES)
+
+def main():
+    parser = argument_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--eligibles", type=int, default=15000)
+    parser.add_argument("--votes", type=int, default=100000)
+    parser.set_defaults(repeat=3)
+    args = parser.parse_args()
+
+    api = load_api(args.database_url)
+
+    from models import Student
+
+    db = api.SessionLocal()
+    prefix = uuid.uuid4().hex[:8]
+    election_ids = []
+
+    try:
+        voters = seed_voters(db, args.eligibles, prefix)
+
+        def setup():
+            election_id = seed_election(db, voters, args.votes)
+            election_ids.append(election_id)
+            db.expunge_all()
+            return election_id
+
+        def before(election_id):
+            delete_election_per_row(api, db, election_id)
+
+        def after(election_id):
+            response = api.delete_Election(api.ElectionDelete(id=election_id), db=db)
+            assert "error" not in response, response
+
+        before_timings = measure(before, args.repeat, setup)
+        after_timings = measure(after, args.repeat, setup)
+
+        # Both left nothing of any election behind
+        assert all(remaining_rows(api, db, election_id) == 0 for election_id in election_ids)
+
+        print(f"{args.eligibles} eligibles, {args.votes} votes")
+        report("delete election", before_timings, after_timings)
+    finally:
+        db.rollback()
+        for election_id in election_ids:
+            if remaining_rows(api, db, election_id):
+                api.delete_Election(api.ElectionDelete(id=election_id), db=db)
+        db.query(Student).filter(Student.StudentNumber.like(f"{prefix}-%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main()
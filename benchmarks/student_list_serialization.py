@@ -0,0 +1,86 @@
+"""
+Serialization cost of /student/all for a 5k-student list.
+
+Before: every Student is loaded as an ORM object, turned into a dict with to_dict, walked by jsonable_encoder
+and dumped with json, which is what returning the dict from the route used to do.
+After: the route as it is now, projected columns as plain rows rendered by orjson.
+
+    python benchmarks/student_list_serialization.py --students 5000
+"""
+from datetime import date, datetime, timedelta
+import json
+import uuid
+
+from common import argument_parser, load_api, measure, report
+
+def seed_students(api, db, count, prefix):
+    from sqlalchemy import insert
+    from models import Student
+
+    now = datetime(2024, 1, 17, 23, 53, 29, 417000)
+
+    db.execute(insert(Student), [{
+        "StudentNumber": f"{prefix}-{index:05d}",
+        "FirstName": f"Juan {index}",
+        "MiddleName": "Santos" if index % 2 else None,
+        "LastName": "Dela Cruz",
+        "Email": f"{prefix}-{index}@example.com",
+        "Password": "",
+        "Gender": index % 2,
+        "DateOfBirth": date(2003, 1, 1) + timedelta(days=index % 365),
+        "PlaceOfBirth": "Quezon City",
+        "ResidentialAddress": "Quezon City",
+        "MobileNumber": "09123457125",
+        "IsOfficer": False,
+        "created_at": now,
+        "updated_at": now + timedelta(seconds=index),
+    } for index in range(count)])
+    db.commit()
+
+def main():
+    parser = argument_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    args = parser.parse_args()
+
+    api = load_api(args.database_url)
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from models import Student
+
+    db = api.SessionLocal()
+    prefix = uuid.uuid4().hex[:8]
+
+    try:
+        seed_students(api, db, args.students, prefix)
+        listed = db.query(Student).count()
+
+        def before():
+            db.expunge_all()
+            students = db.query(Student).order_by(Student.StudentId).all()
+            return JSONResponse(jsonable_encoder({"students": [student.to_dict() for student in students]})).body
+
+        def after():
+            api.total_count_cache.clear()
+            return api.get_All_Students(after=None, limit=None, fields=None, db=db).body
+
+        # Both bodies must hold the same students
+        assert json.loads(before())["students"] == json.loads(after())["students"]
+
+        # Serialization alone, from already loaded rows
+        students = db.query(Student).order_by(Student.StudentId).all()
+        rows = api.query_as_dicts(db.query(*api.STUDENT_LIST_COLUMNS).order_by(Student.StudentId))
+
+        print(f"{listed} students")
+        report("query + serialize", measure(before, args.repeat), measure(after, args.repeat))
+        report("serialize only",
+               measure(lambda: JSONResponse(jsonable_encoder({"students": [student.to_dict() for student in students]})).body, args.repeat),
+               measure(lambda: ORJSONResponse({"students": rows}).body, args.repeat))
+    finally:
+        db.rollback()
+        db.query(Student).filter(Student.StudentNumber.like(f"{prefix}-%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+from datetime import datetime
+from pytz import timezone
+
+MANILA = timezone('Asia/Manila')
+
+#########################################################
+""" Current time in Manila, the one clock of the API """
+
+def manila_now():
+    # Aware, for timestamps and comparisons against localized dates
+    return datetime.now(MANILA)
+
+def manila_wall_clock():
+    # Naive Manila time, for the columns stored without a timezone (election dates, code expirations)
+    return manila_now().replace(tzinfo=None)
@@ -0,0 +1,270 @@
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import SessionLocal
+from models import Code
+
+from clock import manila_wall_clock
+
+from datetime import timedelta
+
+import threading
+import time
+import os
+
+CODE_TTL_SECONDS = int(os.getenv("CODE_TTL_SECONDS", 30 * 60))
+
+# How often the memory store drops expired codes on its own
+MEMORY_CODE_PURGE_SECONDS = 60
+
+#########################################################
+""" Verification codes keyed by (student number, code type) """
+
+class DatabaseCodeStore:
+    # The SGECode table, one row per student and type thanks to uq_code_student_type
+
+    def issue(self, student_number, code_type, code_value, ttl=CODE_TTL_SECONDS):
+        db = SessionLocal()
+
+        try:
+            now = manila_wall_clock()
+            values = {"StudentNumber": student_number, "CodeType": code_type, "CodeValue": code_value,
+                      "CodeExpirationDate": now + timedelta(seconds=ttl), "created_at": now, "updated_at": now}
+            insert = sqlite_insert if db.bind.dialect.name == "sqlite" else postgresql_insert
+
+            statement = insert(Code).values(**values)
+            statement = statement.on_conflict_do_update(
+                index_elements=[Code.StudentNumber, Code.CodeType],
+                set_={"CodeValue": code_value, "CodeExpirationDate": values["CodeExpirationDate"], "FailedAttempts": 0, "updated_at": now}
+            )
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+
+    def get(self, student_number, code_type):
+        db = SessionLocal()
+
+        try:
+            code = db.query(Code.CodeValue).\
+                filter(Code.StudentNumber == student_number, Code.CodeType == code_type, Code.CodeExpirationDate > manila_wall_clock()).first()
+            return code.CodeValue if code else None
+        finally:
+            db.close()
+
+    def expires_in(self, student_number, code_type):
+        # Seconds until the live code expires, None when there is none
+        db = SessionLocal()
+
+        try:
+            code = db.query(Code.CodeExpirationDate).\
+                filter(Code.StudentNumber == student_number, Code.CodeType == code_type, Code.CodeExpirationDate > manila_wall_clock()).first()
+            return (code.CodeExpirationDate - manila_wall_clock()).total_seconds() if code else None
+        finally:
+            db.close()
+
+    def consume(self, student_number, code_type, code_value):
+        # The DELETE itself checks the code so two requests cannot both use it
+        db = SessionLocal()
+
+        try:
+            deleted = db.query(Code).\
+                filter(Code.StudentNumber == student_number, Code.CodeType == code_type, Code.CodeValue == code_value,
+                       Code.CodeExpirationDate > manila_wall_clock()).\
+                delete(synchronize_session=False)
+            db.commit()
+            return deleted > 0
+        finally:
+            db.close()
+
+    def record_failed_attempt(self, student_number, code_type, max_attempts):
+        # Counted in SQL so parallel guesses all count, the code is revoked once they reach max_attempts
+        db = SessionLocal()
+
+        try:
+            live = [Code.StudentNumber == student_number, Code.CodeType == code_type, Code.CodeExpirationDate > manila_wall_clock()]
+
+            db.query(Code).filter(*live).update({"FailedAttempts": Code.FailedAttempts + 1}, synchronize_session=False)
+            revoked = db.query(Code).filter(*live, Code.FailedAttempts >= max_attempts).delete(synchronize_session=False)
+            db.commit()
+            return revoked > 0
+        finally:
+            db.close()
+
+    def purge(self):
+        db = SessionLocal()
+
+        try:
+            deleted = db.query(Code).filter(Code.CodeExpirationDate <= manila_wall_clock()).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+class RedisCodeStore:
+    # One key per student and type that expires on its own
+
+    # Delete the key only when the stored code still matches
+    CONSUME_SCRIPT = '''
+        if redis.call("GET", KEYS[1]) == ARGV[1] then
+            return redis.call("DEL", KEYS[1])
+        end
+        return 0
+    '''
+
+    def __init__(self, client):
+        self.client = client
+        self.consume_script = client.register_script(self.CONSUME_SCRIPT)
+
+    def key(self, student_number, code_type):
+        return f"code:{code_type}:student:{student_number}"
+
+    def attempts_key(self, student_number, code_type):
+        return f"{self.key(student_number, code_type)}:failed"
+
+    def issue(self, student_number, code_type, code_value, ttl=CODE_TTL_SECONDS):
+        # SET replaces the previous code atomically, and its failed attempts go with it
+        pipeline = self.client.pipeline()
+        pipeline.set(self.key(student_number, code_type), code_value, ex=ttl)
+        pipeline.delete(self.attempts_key(student_number, code_type))
+        pipeline.execute()
+
+    def get(self, student_number, code_type):
+        return self.client.get(self.key(student_number, code_type))
+
+    def expires_in(self, student_number, code_type):
+        seconds = self.client.ttl(self.key(student_number, code_type))
+        return seconds if seconds >= 0 else None
+
+    def consume(self, student_number, code_type, code_value):
+        return self.consume_script(keys=[self.key(student_number, code_type)], args=[code_value]) > 0
+
+    def record_failed_attempt(self, student_number, code_type, max_attempts):
+        key = self.key(student_number, code_type)
+        attempts_key = self.attempts_key(student_number, code_type)
+
+        attempts = self.client.incr(attempts_key)
+        self.client.expire(attempts_key, CODE_TTL_SECONDS)
+
+        if attempts < max_attempts:
+            return False
+
+        self.client.delete(key, attempts_key)
+        return True
+
+    def purge(self):
+        # Redis expires the keys itself
+        return 0
+
+class MemoryCodeStore:
+    # For tests and single worker development only, every worker would have its own codes.
+    # It purges itself while issuing since purge_expired_codes only runs in the scheduler leader's process.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.codes = {} # (student number, code type) -> (code value, expires at)
+        self.failed_attempts = {} # (student number, code type) -> wrong guesses at the live code
+        self.next_purge = time.monotonic() + MEMORY_CODE_PURGE_SECONDS
+
+    def live(self, key):
+        entry = self.codes.get(key)
+
+        if entry and entry[1] <= time.monotonic():
+            del self.codes[key]
+            return None
+
+        return entry
+
+    def issue(self, student_number, code_type, code_value, ttl=CODE_TTL_SECONDS):
+        key = (student_number, code_type)
+
+        with self.lock:
+            now = time.monotonic()
+            self.codes[key] = (code_value, now + ttl)
+            self.failed_attempts.pop(key, None)
+
+            if now >= self.next_purge:
+                self.remove_expired(now)
+
+    def get(self, student_number, code_type):
+        with self.lock:
+            entry = self.live((student_number, code_type))
+            return entry[0] if entry else None
+
+    def expires_in(self, student_number, code_type):
+        with self.lock:
+            entry = self.live((student_number, code_type))
+            return entry[1] - time.monotonic() if entry else None
+
+    def consume(self, student_number, code_type, code_value):
+        key = (student_number, code_type)
+
+        with self.lock:
+            entry = self.live(key)
+
+            if not entry or entry[0] != code_value:
+                return False
+
+            del self.codes[key]
+            self.failed_attempts.pop(key, None)
+            return True
+
+    def record_failed_attempt(self, student_number, code_type, max_attempts):
+        key = (student_number, code_type)
+
+        with self.lock:
+            if not self.live(key):
+                return False
+
+            self.failed_attempts[key] = self.failed_attempts.get(key, 0) + 1
+
+            if self.failed_attempts[key] < max_attempts:
+                return False
+
+            del self.codes[key]
+            del self.failed_attempts[key]
+            return True
+
+    def remove_expired(self, now):
+        # Called with the lock held
+        expired = [key for key, (_, expires_at) in self.codes.items() if expires_at <= now]
+
+        for key in expired:
+            del self.codes[key]
+            self.failed_attempts.pop(key, None)
+
+        self.next_purge = now + MEMORY_CODE_PURGE_SECONDS
+        return len(expired)
+
+    def purge(self):
+        with self.lock:
+            return self.remove_expired(time.monotonic())
+
+def create_code_store():
+    # CODE_STORE picks the backend, by default Redis when REDIS_URL is set and the database otherwise.
+    # "memory" is never picked by default, it does not work across workers.
+    backend = os.getenv("CODE_STORE", "redis" if os.getenv("REDIS_URL") else "database")
+
+    if backend == "memory":
+        return MemoryCodeStore()
+
+    if backend == "redis":
+        try:
+            import redis
+
+            client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+            client.ping()
+            return RedisCodeStore(client)
+        except Exception as e:
+            print(f"Redis is not available for the code store, using the database: {e}")
+
+    return DatabaseCodeStore()
+
+code_store = create_code_store()
+
+def purge_expired_codes():
+    # Run by the scheduler leader so the SGECode table only holds live codes
+    purged = code_store.purge()
+
+    if purged:
+        print(f"Purged {purged} expired verification codes")
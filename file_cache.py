@@ -0,0 +1,137 @@
+from collections import OrderedDict
+
+import threading
+import tempfile
+import hashlib
+import time
+import os
+
+# Every worker shares the directory. A .part file younger than this may be another worker's download in progress.
+STALE_PART_SECONDS = 60 * 60
+
+# The index is kept up to date on every commit, the directory is only rescanned this often for the files of the other workers
+INDEX_RESCAN_SECONDS = 60
+
+#########################################################
+""" Size bounded LRU cache of files on local disk """
+
+class DiskLRUCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # filename -> size, least recently used first
+        self.total_bytes = 0
+        self.loaded_at = 0
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        self.remove_stale_parts()
+
+        with self.lock:
+            self.load()
+            self.evict()
+
+    def remove_stale_parts(self):
+        # Left over by a worker that died during a download
+        for name in os.listdir(self.directory):
+            if not name.endswith(".part"):
+                continue
+
+            path = os.path.join(self.directory, name)
+            try:
+                if time.time() - os.stat(path).st_mtime > STALE_PART_SECONDS:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def load(self):
+        # Caller must hold the lock. Rebuild the index from what is on disk now, oldest first,
+        # so the byte cap counts the files of every worker and not only ours
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".part"):
+                continue
+
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+
+        self.loaded_at = time.monotonic()
+
+    def key(self, source):
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def get(self, source):
+        # Returns the path of the cached file or None, and marks it as recently used
+        name = self.key(source)
+        path = os.path.join(self.directory, name)
+
+        with self.lock:
+            if not os.path.exists(path):
+                if name in self.entries:
+                    self.total_bytes -= self.entries.pop(name)
+                return None
+
+            # Also files downloaded by another worker
+            if name not in self.entries:
+                self.entries[name] = os.path.getsize(path)
+                self.total_bytes += self.entries[name]
+
+            self.entries.move_to_end(name)
+
+        os.utime(path, None)
+        return path
+
+    def open_temp(self):
+        # Temp files live in the cache directory so the final rename is atomic
+        fd, temp_path = tempfile.mkstemp(suffix=".part", dir=self.directory)
+        return os.fdopen(fd, "wb"), temp_path
+
+    def commit(self, source, temp_path):
+        name = self.key(source)
+        path = os.path.join(self.directory, name)
+        size = os.path.getsize(temp_path)
+
+        if size > self.max_bytes:
+            self.discard(temp_path)
+            return
+
+        with self.lock:
+            os.replace(temp_path, path)
+
+            # Now and then rescan so the eviction also sees what the other workers added
+            if time.monotonic() - self.loaded_at > INDEX_RESCAN_SECONDS:
+                self.load()
+
+            # Another worker may have evicted it already, or it replaced an older copy
+            self.total_bytes -= self.entries.pop(name, 0)
+            self.entries[name] = size
+            self.total_bytes += size
+
+            self.evict()
+
+    def discard(self, temp_path):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def evict(self):
+        # Caller must hold the lock
+        while self.total_bytes > self.max_bytes and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import threading
+import tempfile
+import hashlib
+import asyncio
+import aiohttp
+import time
+import json
+import os
+import re
+
+INDEX_FILE = "index.json"
+PREFETCH_CONCURRENCY = 8
+
+# Every worker shares the directory. A .part file younger than this may be another worker's write in progress.
+STALE_PART_SECONDS = 60 * 60
+
+# Only the scheduler leader prefetches, the other workers pick up its index.json this often at most
+INDEX_CHECK_SECONDS = 1
+
+# Cached files are named by the sha256 of their content plus the original extension
+CACHED_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]{1,5})?$")
+
+#########################################################
+""" Content addressed image cache with a size cap and LRU eviction """
+
+class ImageCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.urls = {} # url -> cached file name
+        self.files = OrderedDict() # cached file name -> size, least recently used first
+        self.total_bytes = 0
+
+        self.index_mtime = None # mtime of the index.json the state was read from
+        self.index_checked = 0
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        self.remove_stale_parts()
+
+        with self.lock:
+            self.reload()
+            self.evict()
+
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def remove_stale_parts(self):
+        # Left over by a worker that died while writing
+        for name in os.listdir(self.directory):
+            if not name.endswith(".part"):
+                continue
+
+            path = os.path.join(self.directory, name)
+            try:
+                if time.time() - os.stat(path).st_mtime > STALE_PART_SECONDS:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def reload(self):
+        # Caller must hold the lock. Reads the shared index and the files as they are on disk now.
+        try:
+            index_mtime = os.stat(self.index_path()).st_mtime_ns
+            with open(self.index_path()) as f:
+                urls = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index_mtime = None
+            urls = {}
+
+        # Order the files by last use so the LRU order survives restarts
+        files = []
+        for name in os.listdir(self.directory):
+            if CACHED_NAME_PATTERN.match(name):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+
+                files.append((stat.st_mtime, name, stat.st_size))
+
+        self.files = OrderedDict()
+        self.total_bytes = 0
+        for _, name, size in sorted(files):
+            self.files[name] = size
+            self.total_bytes += size
+
+        # Drop index entries whose file is gone
+        self.urls = {url: name for url, name in urls.items() if name in self.files}
+        self.index_mtime = index_mtime
+
+    def refresh(self):
+        # Caller must hold the lock. Reloads when another worker rewrote the index.
+        now = time.monotonic()
+        if now - self.index_checked < INDEX_CHECK_SECONDS:
+            return
+
+        self.index_checked = now
+
+        try:
+            index_mtime = os.stat(self.index_path()).st_mtime_ns
+        except FileNotFoundError:
+            index_mtime = None
+
+        if index_mtime != self.index_mtime:
+            self.reload()
+
+    def save_index(self):
+        # Caller must hold the lock
+        fd, temp_path = tempfile.mkstemp(suffix=".part", dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.urls, f)
+
+        os.replace(temp_path, self.index_path())
+        self.index_mtime = os.stat(self.index_path()).st_mtime_ns
+
+    def lookup(self, url):
+        # Returns the cached file name for the url or None, and marks it as recently used
+        with self.lock:
+            self.refresh()
+            name = self.urls.get(url)
+
+            if name is None or name not in self.files:
+                return None
+
+            self.files.move_to_end(name)
+            return name
+
+    def path_for(self, name):
+        # Only names produced by the cache are served, anything else could escape the directory
+        if not CACHED_NAME_PATTERN.match(name):
+            return None
+
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            return None
+
+        os.utime(path, None)
+        return path
+
+    def store(self, url, content):
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        if not re.match(r"^\.[a-z0-9]{1,5}$", extension):
+            extension = ""
+
+        name = hashlib.sha256(content).hexdigest() + extension
+        path = os.path.join(self.directory, name)
+
+        if len(content) > self.max_bytes:
+            return None
+
+        with self.lock:
+            # Start from the latest shared index so the entries of the other workers are kept
+            self.index_checked = 0
+            self.refresh()
+
+            if name not in self.files:
+                fd, temp_path = tempfile.mkstemp(suffix=".part", dir=self.directory)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+
+                os.replace(temp_path, path)
+                self.files[name] = len(content)
+                self.total_bytes += len(content)
+            else:
+                # Same content under another url, reuse the stored file
+                self.files.move_to_end(name)
+
+            self.urls[url] = name
+            self.evict()
+            self.save_index()
+
+        return name
+
+    def evict(self):
+        # Caller must hold the lock
+        evicted = set()
+        while self.total_bytes > self.max_bytes and self.files:
+            name, size = self.files.popitem(last=False)
+            self.total_bytes -= size
+            evicted.add(name)
+
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+        if evicted:
+            self.urls = {url: name for url, name in self.urls.items() if name not in evicted}
+
+    async def prefetch(self, urls):
+        # Download every url that is not cached yet, a few at a time
+        missing = [url for url in set(urls) if url and self.lookup(url) is None]
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+        async def fetch(session, url):
+            async with semaphore:
+                try:
+                    async with session.get(url) as resp:
+                        if resp.status != 200:
+                            print(f"Could not prefetch {url}: status {resp.status}")
+                            return
+
+                        content = await resp.read()
+                except Exception as e:
+                    print(f"Could not prefetch {url}: {e}")
+                    return
+
+            await asyncio.get_running_loop().run_in_executor(None, self.store, url, content)
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(fetch(session, url) for url in missing))
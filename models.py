@@ -1,8 +1,9 @@
 from database import engine, Base, SessionLocal
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.declarative import declarative_base
 
-from sqlalchemy import Column, Integer, Float, String, Date, DateTime, Boolean, Text, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, Boolean, Text, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.sql import func, false
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -224,6 +225,48 @@ class ViolationForm(Base):
             'IsAccessible': self.IsAccessible
         }
 
+##############################################################################
+## Read models ##
+
+# Not part of Base so create_all never makes a table where PostgreSQL has the materialized view
+ReadModelBase = declarative_base()
+
+class StudentProfile(ReadModelBase):
+    __tablename__ = "SGEStudentProfile"
+
+    # One row per student with the SPS joins already done, refreshed by student_profiles.refresh_student_profiles
+    StudentId = Column(Integer, primary_key=True)
+    StudentNumber = Column(String(30), unique=True)
+    FirstName = Column(String(50))
+    MiddleName = Column(String(50))
+    LastName = Column(String(50))
+    EnrolledCourseId = Column(Integer)
+    EnrolledCourseCode = Column(String)
+    Status = Column(Integer)
+    ClassId = Column(Integer)
+    Grade = Column(Float)
+    Section = Column(Integer)
+    MetadataId = Column(Integer)
+    CourseId = Column(Integer)
+    CourseCode = Column(String)
+    Year = Column(Integer)
+    Semester = Column(Integer)
+    Batch = Column(Integer)
+    MetadataCreatedAt = Column(DateTime(timezone=True))
+    MetadataUpdatedAt = Column(DateTime(timezone=True))
+
+    def to_dict(self):
+        return {
+            "StudentId": self.StudentId,
+            "StudentNumber": self.StudentNumber,
+            "CourseCode": self.CourseCode,
+            "Year": self.Year,
+            "Semester": self.Semester,
+            "Section": self.Section,
+            "Status": self.Status,
+            "Grade": self.Grade,
+        }
+
 ##############################################################################
 ## SGE tables ## 
 
@@ -283,9 +326,19 @@ class Election(Base):
     AppealStart = Column(DateTime)
     AppealEnd = Column(DateTime)
 
+    # Eligibles request their voting password instead of all getting one at creation
+    JustInTimeCredentials = Column(Boolean, default=False, server_default=false(), nullable=False)
+
+    # Set by the one gather_winners run that stored the winners and the results announcement
+    WinnersGatheredAt = Column(DateTime(timezone=True))
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    creator = relationship("Student", foreign_keys=[CreatedBy])
+    organization = relationship("StudentOrganization")
+    positions = relationship("CreatedElectionPosition", back_populates="election", order_by="CreatedElectionPosition.CreatedElectionPositionId")
+
     def to_dict(self, row=None):
         return {
             "ElectionId": self.ElectionId,
@@ -307,6 +360,7 @@ class Election(Base):
             "VotingEnd": self.VotingEnd.isoformat() if self.VotingEnd else None,
             "AppealStart": self.AppealStart.isoformat() if self.AppealStart else None,
             "AppealEnd": self.AppealEnd.isoformat() if self.AppealEnd else None,
+            "JustInTimeCredentials": self.JustInTimeCredentials,
             
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
@@ -322,6 +376,8 @@ class CreatedElectionPosition(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election", back_populates="positions")
+
     def to_dict(self, row=None):
         return {
             "CreatedElectionPositionId": self.CreatedElectionPositionId,
@@ -438,6 +494,10 @@ class Certifications(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+    student = relationship("Student")
+    signatories = relationship("CreatedAdminSignatory", back_populates="certification", order_by="CreatedAdminSignatory.CreatedAdminSignatoryId")
+
     def to_dict(self):
         return {
             "CertificationId": self.CertificationId,
@@ -461,6 +521,8 @@ class CreatedAdminSignatory(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    certification = relationship("Certifications", back_populates="signatories")
+
     def to_dict(self):
         return {
             "CreatedAdminSignatory": self.CreatedAdminSignatoryId,
@@ -471,14 +533,47 @@ class CreatedAdminSignatory(Base):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
+class CertificationJobs(Base):
+    __tablename__ = "SGECertificationJobs"
+
+    CertificationJobId = Column(Integer, primary_key=True)
+    ElectionId = Column(Integer, ForeignKey('SGEElection.ElectionId'))
+    Total = Column(Integer)
+    Completed = Column(Integer)
+    Failed = Column(Integer)
+    Status = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "CertificationJobId": self.CertificationJobId,
+            "ElectionId": self.ElectionId,
+            "Total": self.Total,
+            "Completed": self.Completed,
+            "Failed": self.Failed,
+            "Status": self.Status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Code(Base):
     __tablename__ = "SGECode"
+    __table_args__ = (
+        # One live code per student and type, issuing a new one replaces it
+        UniqueConstraint('StudentNumber', 'CodeType', name='uq_code_student_type'),
+        Index('ix_code_expiration_date', 'CodeExpirationDate'),
+    )
 
     CodeId = Column(Integer, primary_key=True)
     StudentNumber = Column(String(15), ForeignKey('SPSStudent.StudentNumber'))
     CodeValue = Column(Text)
     CodeType = Column(String)
     CodeExpirationDate = Column(DateTime)
+
+    # Wrong guesses at this code, it is revoked once they reach the limit of its flow
+    FailedAttempts = Column(Integer, default=0, server_default="0", nullable=False)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -557,6 +652,9 @@ class OrganizationOfficer(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    organization = relationship("StudentOrganization")
+    student = relationship("Student")
+
     def to_dict(self):
         return {
             "OrganizationOfficerId": self.OrganizationOfficerId,
@@ -577,6 +675,9 @@ class OrganizationMember(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    organization = relationship("StudentOrganization")
+    student = relationship("Student")
+
     def to_dict(self):
         return {
             "OrganizationMemberId": self.OrganizationMemberId,
@@ -599,6 +700,8 @@ class ElectionAppeals(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    student = relationship("Student")
+
     def to_dict(self):
         return {
             "ElectionAppealsId": self.ElectionAppealsId,
@@ -642,6 +745,10 @@ class CoC(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+    student = relationship("Student")
+    partylist = relationship("PartyList")
+
     def to_dict(self, row=None):
         return {
             "CoCId": self.CoCId,
@@ -679,6 +786,8 @@ class PartyList(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+
     def to_dict(self, row=None):
         return {
             "PartyListId": self.PartyListId,
@@ -719,6 +828,10 @@ class Candidates(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+    student = relationship("Student")
+    partylist = relationship("PartyList")
+
     def to_dict(self, row=None):
         return {
             "CandidateId": self.CandidateId,
@@ -780,6 +893,41 @@ class VotingsTracker(Base):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
     
+class CandidateCourseTally(Base):
+    __tablename__ = "SGECandidateCourseTally"
+
+    # Votes of a candidate per voter course, kept up to date by save_Votes
+    ElectionId = Column(Integer, ForeignKey('SGEElection.ElectionId'), primary_key=True)
+    CandidateId = Column(Integer, ForeignKey('SGECandidates.CandidateId'), primary_key=True)
+    CourseId = Column(Integer, primary_key=True)
+    Votes = Column(Integer, default=0)
+
+    def to_dict(self):
+        return {
+            "ElectionId": self.ElectionId,
+            "CandidateId": self.CandidateId,
+            "CourseId": self.CourseId,
+            "Votes": self.Votes,
+        }
+
+class BallotSnapshot(Base):
+    __tablename__ = "SGEBallotSnapshot"
+
+    # Serialized ballot of an election, built once the campaign period starts
+    ElectionId = Column(Integer, ForeignKey('SGEElection.ElectionId'), primary_key=True)
+    Payload = Column(Text)
+    ETag = Column(String(64))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "ElectionId": self.ElectionId,
+            "ETag": self.ETag,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class ElectionAnalytics(Base):
     __tablename__ = "SGEElectionAnalytics"
 
@@ -802,6 +950,10 @@ class ElectionAnalytics(Base):
     
 class ElectionWinners(Base):
     __tablename__ = "SGEElectionWinners"
+    __table_args__ = (
+        # A candidate can only win a position once, so gathering winners twice fails instead of duplicating
+        UniqueConstraint('ElectionId', 'StudentNumber', 'SelectedPositionName', name='uq_election_winners_election_student_position'),
+    )
 
     ElectionWinnersId = Column(Integer, primary_key=True)
     ElectionId = Column(Integer, ForeignKey('SGEElection.ElectionId'))
@@ -812,6 +964,9 @@ class ElectionWinners(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+    student = relationship("Student")
+
     def to_dict(self):
         return {
             "ElectionWinnersId": self.ElectionWinnersId,
@@ -824,6 +979,21 @@ class ElectionWinners(Base):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
     
+class SchedulerLease(Base):
+    __tablename__ = "SGESchedulerLease"
+
+    # One row per lease, the worker holding it until ExpiresAt is the only one running scheduled jobs
+    LeaseName = Column(String, primary_key=True)
+    Holder = Column(String)
+    ExpiresAt = Column(DateTime(timezone=True))
+
+    def to_dict(self):
+        return {
+            "LeaseName": self.LeaseName,
+            "Holder": self.Holder,
+            "ExpiresAt": self.ExpiresAt.isoformat() if self.ExpiresAt else None,
+        }
+
 class Eligibles(Base):
     __tablename__ = "SGEEligibles"
 
@@ -832,9 +1002,13 @@ class Eligibles(Base):
     ElectionId = Column(Integer, ForeignKey('SGEElection.ElectionId'))
     HasVotedOrAbstained = Column(Boolean, default=False)
     VotingPassword = Column(Text)
+    PasswordSentAt = Column(DateTime(timezone=True)) # Set once the email with VotingPassword went out
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+    student = relationship("Student")
+
     def to_dict(self):
         return {
             "EligibleId": self.EligibleId,
@@ -855,6 +1029,9 @@ class VotingReceipt(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    election = relationship("Election")
+    student = relationship("Student")
+
     def to_dict(self):
         return {
             "VotingReceiptId": self.VotingReceiptId,
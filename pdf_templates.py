@@ -0,0 +1,459 @@
+from reportlab.lib.pagesizes import letter, landscape, legal
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER, TA_RIGHT
+from reportlab.lib.utils import ImageReader
+
+from PIL import Image as PILImage
+from io import BytesIO
+
+import os
+import threading
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puplogo.png")
+
+#################################################################
+""" Style registry """
+
+# Built once per process and shared by every document, styles are never mutated after import
+styles = getSampleStyleSheet()
+
+# Oath of office
+styles.add(ParagraphStyle(name="SchoolStyle", fontName="Times-Roman", fontSize=18, alignment=TA_CENTER, spaceAfter=10))
+styles.add(ParagraphStyle(name="BranchStyle", fontSize=16, alignment=TA_CENTER, spaceAfter=18))
+styles.add(ParagraphStyle(name="TitleStyle", fontName="Times-Roman", bold=True, fontSize=24, alignment=TA_CENTER, spaceAfter=26))
+styles.add(ParagraphStyle(name="ParagraphStyle", fontName="Times-Roman", fontSize=12, alignment=TA_JUSTIFY, spaceAfter=6, leading=12, firstLineIndent=36))
+styles.add(ParagraphStyle(name="ParagraphStyle2", fontName="Times-Roman", fontSize=12, alignment=TA_LEFT, spaceAfter=6, leading=12))
+
+# Election report and voting receipt
+styles.add(ParagraphStyle(name="TitleStyleCenter", fontName="Times-Roman", fontSize=20, alignment=TA_CENTER, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="TitleStyle2Center", fontName="Times-Roman", fontSize=16, alignment=TA_CENTER, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="TitleStyle3Center", fontName="Times-Roman", fontSize=14, alignment=TA_CENTER, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="ReceiptTitleStyleCenter", fontName="Times-Roman", fontSize=12, alignment=TA_CENTER, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="TitleStyleLeft", fontName="Times-Roman", fontSize=12, alignment=TA_LEFT, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="TitleStyleRight", fontName="Times-Roman", fontSize=12, alignment=TA_RIGHT, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="JustifyContent", fontName="Times-Roman", fontSize=12, alignment=TA_JUSTIFY, spaceAfter=6, leading=12))
+styles.add(ParagraphStyle(name="HeadingCenter", alignment=TA_CENTER))
+
+#################################################################
+""" Table styles """
+
+GRID_HEADER_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+])
+
+GRID_TABLE_STYLE = TableStyle([
+    ('GRID', (0,0), (-1,-1), 1, colors.black),
+    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+    ('FONTSIZE', (0,0), (-1,-1), 10),
+])
+
+NO_PADDING_TABLE_STYLE = TableStyle([
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),  # Set left padding to 0 for all cells
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),  # Set right padding to 0 for all cells
+])
+
+#################################################################
+""" Flowables """
+
+# The logo is drawn at 80pt, three pixels per point keeps it sharp in print without compressing the full 768px source into every document
+LOGO_PIXELS = 240
+
+logo_lock = threading.Lock()
+logo_reader = None
+
+def get_logo_reader():
+    # ImageReader decodes lazily and is only unsafe to share while it fills its caches, so that happens once under the lock
+    global logo_reader
+
+    if logo_reader is None:
+        with logo_lock:
+            if logo_reader is None:
+                with PILImage.open(LOGO_PATH) as image:
+                    resized = image.resize((LOGO_PIXELS, LOGO_PIXELS), PILImage.LANCZOS)
+
+                reader = ImageReader(resized)
+                reader.getRGBData()
+                if reader._dataA is not None:
+                    reader._dataA.getRGBData()
+
+                logo_reader = reader
+
+    return logo_reader
+
+class Logo(Flowable):
+    def __init__(self, width=80, height=80):
+        Flowable.__init__(self)
+        self.width = width
+        self.height = height
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(get_logo_reader(), 0, 0, self.width, self.height, mask='auto')
+
+class SignatureLine(Flowable):
+    def __init__(self, width):
+        Flowable.__init__(self)
+        self.width = width
+
+    def draw(self):
+        self.canv.line(self.width, 0, 0, 0)  # Start from the right and extend to the left
+
+def signature_block(name, position):
+    signature_line = SignatureLine(130)  # Adjust the width as needed
+    signature_name = Paragraph('<para align="center">' + name + '<br/>' + position + '</para>', styles["Normal"])
+    return Table([[signature_line], [signature_name]], colWidths=[140], hAlign='RIGHT')  # Adjust the column width as needed
+
+#################################################################
+""" Documents """
+
+# target is either a file name or a writable file-like object
+
+def build_receipt(target, voter_student_number, election_name, receipt_id, voted_at, votes_by_position, abstained_positions):
+    doc = SimpleDocTemplate(target, pagesize=letter, topMargin=36)
+    elements = []
+
+    # Add the logo
+    elements.append(Logo())
+    elements.append(Spacer(1, 18))
+
+    # Add the title
+    elements.append(Paragraph("<b>STUDENT ELECTION OFFICIAL RECEIPT</b>", styles['ReceiptTitleStyleCenter']))
+    elements.append(Spacer(1, 18))
+
+    # Create a list of lists for the table data
+    data = [
+        [Paragraph(f"<b>Student Number:</b> {voter_student_number}", styles['TitleStyleLeft']),
+        Paragraph(f"<b>Date Voted:</b> {voted_at.strftime('%B %d, %Y %I:%M %p')}", styles['TitleStyleRight'])],
+        [Paragraph(f"<b>Election Name:</b> {election_name}", styles['TitleStyleLeft']),
+        Paragraph(f"<b>Receipt Id:</b> {receipt_id}", styles['TitleStyleRight'])]
+    ]
+
+    t = Table(data)
+    t.setStyle(NO_PADDING_TABLE_STYLE)
+
+    elements.append(t)
+    elements.append(Spacer(1, 18))
+
+    elements.append(Paragraph(f"Note: This receipt serves as confirmation that your vote in the {election_name} has been successfully cast. Please keep this receipt for your records.", styles['JustifyContent']))
+    elements.append(Spacer(1, 18))
+
+    # Loop through the votes grouped by position
+    for position, candidates in votes_by_position.items():
+        elements.append(Paragraph(f"<b>Voted for position {position}:</b>", styles['TitleStyleLeft']))
+        for candidate in candidates:
+            elements.append(Paragraph(f"{candidate}", styles['TitleStyleLeft']))
+            elements.append(Spacer(1, 12))
+
+    if not abstained_positions:
+        elements.append(Paragraph(f"<b>Abstained list:</b> None", styles['TitleStyleLeft']))
+    else:
+        elements.append(Paragraph(f"<b>Abstained list:</b>", styles['TitleStyleLeft']))
+        for position in abstained_positions:
+            elements.append(Paragraph(f"{position}", styles['TitleStyleLeft']))
+
+    elements.append(Spacer(1, 16))
+    elements.append(Paragraph(f"Thank you for participating in the democratic process of our institution!", styles['TitleStyleLeft']))
+
+    doc.build(elements)
+
+def build_oath_of_office(target, date, full_name, position, signatories):
+    # signatories is a list of (name, position) pairs
+    doc = SimpleDocTemplate(target, pagesize=letter, topMargin=36)
+    elements = []
+
+    # Add the logo
+    elements.append(Logo())
+    elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph("Polytechnic University of the Philippines", styles["SchoolStyle"]))
+    elements.append(Spacer(1, 2))
+
+    elements.append(Paragraph("QUEZON CITY CAMPUS", styles["BranchStyle"]))
+    elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph('<para align="right">' + date.strftime("%B %d, %Y") + '</para>', styles["Normal"]))
+    elements.append(Spacer(1, 24))
+
+    elements.append(Paragraph("<b>OATH OF OFFICE</b>", styles["TitleStyle"]))
+    elements.append(Spacer(1, 12))
+
+    # Add the first part of the content (justified)
+    text = f'''
+    \tI, <b>{full_name}</b>, having been elected as <b>{position}</b> of
+    the Supreme Student Council of the Polytechnic University of
+    the Philippines, Quezon City do solemnly swear that:
+    '''
+    elements.append(Paragraph(text, styles["ParagraphStyle"]))
+    elements.append(Spacer(1, 12))
+
+    # Add the second part of the content
+    text = f'''
+        I will maintain allegiance to the Republic of the Philippines<br/>
+        I will abide by laws of the Supreme Student Council and the<br/>
+        &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;Polytechnic University Of The Philippines;<br/>
+        I will perform my duties and responsibilities as <b>{position}</b>,<br/>
+        &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;and conduct myself as a true professional according to<br/>
+        &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;best of my duty knowledge and discretion.<br/>
+
+        So help me God.
+        '''
+    paragraph = Paragraph(text, styles["ParagraphStyle2"])
+    elements.append(Table([[paragraph]], colWidths=[300], hAlign='CENTER'))  # Adjust the column width as needed
+    elements.append(Spacer(1, 28))
+
+    # Add signature of the winner, then the admin signatories
+    elements.append(signature_block(full_name, position))
+    elements.append(Spacer(1, 28))
+
+    for signatory_name, signatory_position in signatories:
+        elements.append(signature_block(signatory_name, signatory_position))
+        elements.append(Spacer(1, 28))
+
+    doc.build(elements)
+
+def render_oath_of_office(date, full_name, position, signatories):
+    # Top level and returning bytes so it can run in a process pool
+    pdf_buffer = BytesIO()
+    build_oath_of_office(pdf_buffer, date, full_name, position, signatories)
+    return pdf_buffer.getvalue()
+
+def build_election_report(target, election_data, candidates_data):
+    doc = SimpleDocTemplate(target, pagesize=landscape(legal), topMargin=36)
+    elements = []
+
+    # Add the logo
+    elements.append(Logo())
+    elements.append(Spacer(1, 8))
+
+    # Add the title and election name
+    elements.append(Paragraph("<b>Polytechnic University of the Philippines</b>", styles["TitleStyleCenter"]))
+    elements.append(Spacer(1, 8))
+    elements.append(Paragraph(election_data['ElectionName'], styles["TitleStyle2Center"]))
+    elements.append(Spacer(1, 32))
+
+    elements.append(Paragraph(f"<b>Semester</b>: {election_data['Semester']}", styles["TitleStyleLeft"]))
+    elements.append(Paragraph(f"<b>School Year</b>: {election_data['SchoolYear']}", styles["TitleStyleLeft"]))
+    elements.append(Paragraph(f"<b>Student Organization</b>: {election_data['StudentOrganizationName']}", styles["TitleStyleLeft"]))
+    elements.append(Paragraph(f"<b>Course</b>: {election_data['CourseRequirement']}", styles["TitleStyleLeft"]))
+    elements.append(Spacer(1, 12))
+
+    # Election metadata
+    elements.append(Paragraph("<b>Election Metadata</b>", styles["TitleStyle3Center"]))
+    elements.append(Spacer(1, 8))
+
+    table_data = [
+        [Paragraph("<b>Metadata</b>", styles["HeadingCenter"]), Paragraph("<b>Count</b>", styles["HeadingCenter"])],
+        ["Voters", election_data['NumberOfVoters']],
+        ["Active Voters", election_data['NumberOfActiveVoters']],
+        ["Inactive Voters", election_data['NumberOfInactiveVoters']],
+        ["Candidates", election_data['NumberOfCandidates']],
+        ["Partylists", election_data['NumberOfPartylists']],
+        ["Approved CoC", election_data['NumberOfApprovedCoC']],
+        ["Rejected CoC", election_data['NumberOfRejectedCoC']],
+        ["Approved Partylist", election_data['NumberOfApprovedPartylist']],
+        ["Rejected Partylist", election_data['NumberOfRejectedPartylist']],
+    ]
+
+    table = Table(table_data, colWidths=[doc.width/2.5, doc.width/2.5])
+    table.setStyle(GRID_HEADER_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 12))
+    elements.append(PageBreak())
+
+    # Voter course distribution
+    elements.append(Paragraph("<b>Voter Course Distribution</b>", styles["TitleStyle3Center"]))
+    elements.append(Spacer(1, 12))
+
+    course_distribution = election_data['CourseDistribution']
+    course_distribution_table_data = [
+        [Paragraph("<b>Course</b>", styles["HeadingCenter"]), Paragraph("<b>Total</b>", styles["HeadingCenter"])],
+    ]
+    for course_code, count in course_distribution.items():
+        course_distribution_table_data.append([course_code, count])
+
+    table = Table(course_distribution_table_data, colWidths=[doc.width/2.5, doc.width/2.5])
+    table.setStyle(GRID_HEADER_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 16))
+    elements.append(PageBreak())
+
+    # Candidates data
+    elements.append(Paragraph("<b>Candidates Data</b>", styles["TitleStyle3Center"]))
+    elements.append(Spacer(1, 12))
+
+    candidates_data_table_data = [
+        [
+            Paragraph("<b>Student Number</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Candidate Name</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Course Yr-Sec</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Partylist</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Position</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Votes</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Abstains</b>", styles["HeadingCenter"]),
+        ]
+    ]
+    for candidate in candidates_data:
+        candidates_data_table_data.append([
+            candidate["StudentNumber"],
+            candidate["FullName"],
+            candidate["CourseYearSection"],
+            candidate["PartyListName"],
+            candidate["PositionName"],
+            candidate["Votes"],
+            candidate["Abstains"],
+        ])
+
+    table = Table(candidates_data_table_data, colWidths=[150, 150, 100, 150, 100, 100, 100])  # Adjust the column widths as needed
+    table.setStyle(GRID_HEADER_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 16))
+    elements.append(PageBreak())
+
+    # Votes per course of each candidate
+    elements.append(Paragraph("<b>Voter Course Distribution</b>", styles["TitleStyle3Center"]))
+    elements.append(Spacer(1, 12))
+
+    course_distribution_table_data = [
+        [
+            Paragraph("<b>Candidate Name</b>", styles["HeadingCenter"]),
+            *[Paragraph(f"<b>{course_code}</b>", styles["HeadingCenter"]) for course_code in course_distribution.keys()],
+        ]
+    ]
+    for candidate in candidates_data:
+        course_distribution_table_data.append([
+            candidate["FullName"],
+            *[Paragraph(str(candidate["VotesPerCourse"][course_code]), styles["HeadingCenter"]) for course_code in course_distribution.keys()],
+        ])
+
+    table = Table(course_distribution_table_data, colWidths=[150, 80])
+    table.setStyle(GRID_HEADER_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 16))
+    elements.append(PageBreak())
+
+    # Ratings data
+    elements.append(Paragraph("<b>Ratings Data (Each star)</b>", styles["TitleStyle3Center"]))
+    elements.append(Spacer(1, 12))
+
+    ratings_data_table_data = [
+        [
+            Paragraph("<b>Student Number</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Candidate Name</b>", styles["HeadingCenter"]),
+            Paragraph("<b>One</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Two</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Three</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Four</b>", styles["HeadingCenter"]),
+            Paragraph("<b>Five</b>", styles["HeadingCenter"]),
+        ]
+    ]
+    for candidate in candidates_data:
+        ratings_data_table_data.append([
+            candidate["StudentNumber"],
+            candidate["FullName"],
+            candidate["OneStar"],
+            candidate["TwoStar"],
+            candidate["ThreeStar"],
+            candidate["FourStar"],
+            candidate["FiveStar"],
+        ])
+
+    table = Table(ratings_data_table_data, colWidths=[150, 150, 60])  # Adjust the column widths as needed
+    table.setStyle(GRID_HEADER_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 16))
+
+    doc.build(elements)
+
+def build_insert_data_report(target, file_reports):
+    # file_reports holds one dict per uploaded file with the rows of each outcome
+    doc = SimpleDocTemplate(target, pagesize=letter)
+    elements = []
+    header = ["Student Number", "First Name", "Middle Name", "Last Name", "Email"]
+
+    for report in file_reports:
+        elements.append(Paragraph(f"<para align=center><b>{report['filename']}</b></para>", styles["BodyText"]))
+        elements.append(Spacer(1, 12))
+
+        if report["inserted"]:
+            elements.append(Paragraph(f"Number of inserted students: {len(report['inserted'])}"))
+            elements.append(Spacer(1, 12))
+            table = Table([header] + report["inserted"])
+            table.setStyle(GRID_TABLE_STYLE)
+            elements.append(table)
+
+        if report["not_inserted"]:
+            elements.append(Spacer(1, 12))
+            elements.append(Paragraph(f"Number of not inserted students due to student number or email exists already: {len(report['not_inserted'])}"))
+            elements.append(Spacer(1, 12))
+            table = Table([header] + report["not_inserted"])
+            table.setStyle(GRID_TABLE_STYLE)
+            elements.append(table)
+
+        if report["incomplete"]:
+            elements.append(Spacer(1, 12))
+            elements.append(Paragraph(f"Number of not inserted students due to incomplete column value(s): {len(report['incomplete'])}"))
+            elements.append(Spacer(1, 12))
+            table = Table([header] + report["incomplete"])
+            table.setStyle(GRID_TABLE_STYLE)
+            elements.append(table)
+
+        elements.append(Spacer(1, 12))
+
+        if report["removed_duplicates"]:
+            elements.append(Paragraph(f"Number of removed duplicates: {len(report['removed_duplicates'])}"))
+            elements.append(Spacer(1, 12))
+            table = Table([header] + report["removed_duplicates"])
+            table.setStyle(GRID_TABLE_STYLE)
+            elements.append(table)
+
+    doc.build(elements)
+
+#################################################################
+""" Micro-benchmark: python pdf_templates.py [documents] """
+
+if __name__ == "__main__":
+    from datetime import datetime
+
+    import sys
+    import timeit
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    votes_by_position = {"President": ["2020-00001-CM-0: Juan Dela Cruz"], "Vice President": ["2020-00002-CM-0: Maria Clara"]}
+    abstained_positions = ["Secretary", "Treasurer"]
+    voted_at = datetime(2024, 3, 1, 9, 30)
+
+    class FullSizeLogo(Logo):
+        def draw(self):
+            self.canv.drawImage(ImageReader(LOGO_PATH), 0, 0, self.width, self.height, mask='auto')
+
+    def render_receipt():
+        build_receipt(BytesIO(), "2020-00003-CM-0", "Benchmark Election", 1, voted_at, votes_by_position, abstained_positions)
+
+    def render_receipt_before():
+        # The same document with what every request used to pay: a fresh stylesheet and a full-size logo decode
+        global styles, Logo
+        shared_styles, shared_logo = styles, Logo
+
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name="ReceiptTitleStyleCenter", fontName="Times-Roman", fontSize=12, alignment=TA_CENTER, spaceAfter=6, leading=12))
+        styles.add(ParagraphStyle(name="TitleStyleLeft", fontName="Times-Roman", fontSize=12, alignment=TA_LEFT, spaceAfter=6, leading=12))
+        styles.add(ParagraphStyle(name="TitleStyleRight", fontName="Times-Roman", fontSize=12, alignment=TA_RIGHT, spaceAfter=6, leading=12))
+        styles.add(ParagraphStyle(name="JustifyContent", fontName="Times-Roman", fontSize=12, alignment=TA_JUSTIFY, spaceAfter=6, leading=12))
+        Logo = FullSizeLogo
+
+        try:
+            render_receipt()
+        finally:
+            styles, Logo = shared_styles, shared_logo
+
+    for name, render in (("before", render_receipt_before), ("after", render_receipt)):
+        render() # warm up imports and font caches
+        seconds = timeit.timeit(render, number=count)
+        print(f"{name}: {seconds / count * 1000:.2f} ms per receipt ({count} documents)")
@@ -0,0 +1,123 @@
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import or_
+
+from database import engine, SessionLocal
+from models import SchedulerLease
+
+from datetime import datetime, timedelta
+from pytz import timezone
+
+import threading
+import socket
+import uuid
+import os
+
+LEASE_NAME = "scheduler"
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", 30))
+
+# Renew well before the lease runs out so a healthy leader never loses it
+LEASE_RENEW_SECONDS = LEASE_SECONDS / 3
+
+# Unique per process so two workers on the same host never share a lease
+worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Every worker shares the jobs in the main database. All of them can add jobs, only the leader runs them.
+scheduler = BackgroundScheduler(
+    jobstores={'default': SQLAlchemyJobStore(engine=engine)},
+    job_defaults={
+        'coalesce': True,             # Run a missed job once, not once per missed run
+        'misfire_grace_time': None,   # Always run jobs that were due while no leader was up
+    },
+    timezone=timezone('Asia/Manila'),
+)
+
+lease_stop = threading.Event()
+is_leader = False
+
+#########################################################
+""" Leader election through a lease row """
+
+def utc_now():
+    return datetime.now(timezone('UTC'))
+
+def try_acquire_lease():
+    # Take or renew the lease in one atomic UPDATE, only when it is ours or has expired
+    db = SessionLocal()
+
+    try:
+        now = utc_now()
+        renewed = db.query(SchedulerLease).\
+            filter(SchedulerLease.LeaseName == LEASE_NAME,
+                   or_(SchedulerLease.Holder == worker_id, SchedulerLease.ExpiresAt < now)).\
+            update({"Holder": worker_id, "ExpiresAt": now + timedelta(seconds=LEASE_SECONDS)}, synchronize_session=False)
+        db.commit()
+
+        if renewed:
+            return True
+
+        # First start ever, the lease row does not exist yet
+        if not db.query(SchedulerLease).filter(SchedulerLease.LeaseName == LEASE_NAME).first():
+            try:
+                db.add(SchedulerLease(LeaseName=LEASE_NAME, Holder=worker_id, ExpiresAt=now + timedelta(seconds=LEASE_SECONDS)))
+                db.commit()
+                return True
+            except IntegrityError:
+                # Another worker created it first
+                db.rollback()
+
+        return False
+    finally:
+        db.close()
+
+def release_lease():
+    db = SessionLocal()
+
+    try:
+        db.query(SchedulerLease).\
+            filter(SchedulerLease.LeaseName == LEASE_NAME, SchedulerLease.Holder == worker_id).\
+            update({"ExpiresAt": utc_now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def lease_loop():
+    global is_leader
+
+    while not lease_stop.is_set():
+        try:
+            leader = try_acquire_lease()
+        except Exception as e:
+            # Without a database we cannot prove we still hold the lease
+            print(f"Error while renewing the scheduler lease: {e}")
+            leader = False
+
+        if leader and not is_leader:
+            print(f"Worker {worker_id} is now the scheduler leader")
+            scheduler.resume()
+        elif not leader and is_leader:
+            print(f"Worker {worker_id} lost the scheduler lease")
+            scheduler.pause()
+        elif leader:
+            # Pick up jobs added by the other workers since the last renewal
+            scheduler.wakeup()
+
+        is_leader = leader
+        lease_stop.wait(LEASE_RENEW_SECONDS)
+
+#########################################################
+""" Start and stop, called on server startup and shutdown """
+
+def start_scheduler():
+    # Paused until this worker wins the lease
+    scheduler.start(paused=True)
+    threading.Thread(target=lease_loop, name="scheduler-lease", daemon=True).start()
+
+def stop_scheduler():
+    lease_stop.set()
+    scheduler.shutdown(wait=False)
+
+    if is_leader:
+        release_lease()
@@ -8,6 +8,9 @@ load_dotenv()
 from database import SessionLocal
 from models import InsertDataQueues
 
+from collections import deque
+
+import threading
 import os
 
 EMAIL = os.getenv("EMAIL")
@@ -343,4 +346,86 @@ def send_eligible_students_email(student_number, student_email, pass_code):
 
     # Send the email
     server.send_message(msg)
-    server.quit()
\ No newline at end of file
+    server.quit()
+
+#########################################################
+""" Prioritized email delivery """
+
+HIGH_PRIORITY = 0 # Codes and credentials someone is waiting for
+BULK_PRIORITY = 1 # Mass sends like the eligible students passwords
+
+# Workers that take both lanes, high first, plus workers that only ever take the high lane
+# so a code still goes out within seconds while a bulk send is draining
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 3))
+HIGH_PRIORITY_EMAIL_WORKERS = int(os.getenv("HIGH_PRIORITY_EMAIL_WORKERS", 1))
+
+# A failed send is retried after 2, 4, 8... seconds before it is given up
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 4))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 2))
+
+class EmailDispatcher:
+    def __init__(self, workers, high_priority_workers):
+        self.workers = workers
+        self.high_priority_workers = high_priority_workers
+        self.lanes = {HIGH_PRIORITY: deque(), BULK_PRIORITY: deque()}
+        self.condition = threading.Condition()
+        self.started = False
+
+    def start(self):
+        # Started on the first email so the threads belong to the worker process, not the one that imported us
+        for i in range(self.high_priority_workers):
+            threading.Thread(target=self.run, args=([HIGH_PRIORITY],), name=f"email-high-{i}", daemon=True).start()
+
+        for i in range(self.workers):
+            threading.Thread(target=self.run, args=([HIGH_PRIORITY, BULK_PRIORITY],), name=f"email-{i}", daemon=True).start()
+
+        self.started = True
+
+    def submit(self, priority, send, args, on_failure=None, attempt=1):
+        with self.condition:
+            if not self.started:
+                self.start()
+
+            self.lanes[priority].append((priority, send, args, on_failure, attempt))
+            self.condition.notify_all()
+
+    def take(self, priorities):
+        with self.condition:
+            while True:
+                for priority in priorities:
+                    if self.lanes[priority]:
+                        return self.lanes[priority].popleft()
+
+                self.condition.wait()
+
+    def run(self, priorities):
+        while True:
+            priority, send, args, on_failure, attempt = self.take(priorities)
+
+            try:
+                send(*args)
+            except Exception as e:
+                if attempt < EMAIL_MAX_ATTEMPTS:
+                    delay = EMAIL_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                    print(f"Error while sending email with {send.__name__}, retrying in {delay} seconds: {e}")
+
+                    # Waits on a timer instead of a worker so the other emails keep going out
+                    timer = threading.Timer(delay, self.submit, args=(priority, send, args, on_failure, attempt + 1))
+                    timer.daemon = True
+                    timer.start()
+                    continue
+
+                print(f"Giving up sending email with {send.__name__} after {attempt} attempts: {e}")
+
+                if on_failure:
+                    try:
+                        on_failure()
+                    except Exception as e:
+                        print(f"Error in the failure handler of {send.__name__}: {e}")
+
+email_dispatcher = EmailDispatcher(EMAIL_WORKERS, HIGH_PRIORITY_EMAIL_WORKERS)
+
+def queue_email(send, *args, priority=BULK_PRIORITY, on_failure=None):
+    # Returns right away, send(*args) runs on one of the email workers.
+    # on_failure() is called once every retry failed, to undo what assumed the email would arrive.
+    email_dispatcher.submit(priority, send, args, on_failure)
\ No newline at end of file
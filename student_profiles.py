@@ -0,0 +1,62 @@
+from sqlalchemy import text
+
+from database import engine
+from models import ReadModelBase, StudentProfile
+
+# First enrollment and first class of every student, both picked by the lowest id like get_Student_Enrollment.
+# On PostgreSQL the view is created by alembic, a change here needs a new revision that recreates it.
+PROFILE_SELECT = '''
+    SELECT s."StudentId", s."StudentNumber", s."FirstName", s."MiddleName", s."LastName",
+           ce."CourseId" AS "EnrolledCourseId", ce."CourseCode" AS "EnrolledCourseCode", ce."Status",
+           g."ClassId", g."Grade", cl."Section",
+           m."MetadataId", m."CourseId", c."CourseCode", m."Year", m."Semester", m."Batch",
+           m."created_at" AS "MetadataCreatedAt", m."updated_at" AS "MetadataUpdatedAt"
+    FROM "SPSStudent" s
+    LEFT JOIN (
+        SELECT scg."StudentId", scg."ClassId", scg."Grade",
+               ROW_NUMBER() OVER (PARTITION BY scg."StudentId" ORDER BY scg."ClassId") AS rn
+        FROM "SPSStudentClassGrade" scg
+    ) g ON g."StudentId" = s."StudentId" AND g.rn = 1
+    LEFT JOIN "SPSClass" cl ON cl."ClassId" = g."ClassId"
+    LEFT JOIN "SPSMetadata" m ON m."MetadataId" = cl."MetadataId"
+    LEFT JOIN "SPSCourse" c ON c."CourseId" = m."CourseId"
+    LEFT JOIN (
+        SELECT e."StudentId", e."CourseId", co."CourseCode", e."Status",
+               ROW_NUMBER() OVER (PARTITION BY e."StudentId" ORDER BY e."CourseId") AS rn
+        FROM "SPSCourseEnrolled" e
+        JOIN "SPSCourse" co ON co."CourseId" = e."CourseId"
+    ) ce ON ce."StudentId" = s."StudentId" AND ce.rn = 1
+'''
+
+PROFILE_COLUMNS = ", ".join(f'"{column.name}"' for column in StudentProfile.__table__.columns)
+
+def is_postgresql():
+    return engine.dialect.name == "postgresql"
+
+#########################################################
+""" Create and refresh the student profile read model """
+
+def ensure_student_profiles():
+    # The materialized view on PostgreSQL comes from the alembic migrations,
+    # other databases only used in development get a plain table filled the same way
+    if is_postgresql():
+        return
+
+    ReadModelBase.metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        empty = connection.execute(text('SELECT COUNT(*) FROM "SGEStudentProfile"')).scalar() == 0
+
+    if empty:
+        refresh_student_profiles()
+
+def refresh_student_profiles():
+    if is_postgresql():
+        # CONCURRENTLY keeps the view readable while it refreshes, it cannot run inside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text('REFRESH MATERIALIZED VIEW CONCURRENTLY "SGEStudentProfile"'))
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text('DELETE FROM "SGEStudentProfile"'))
+        connection.execute(text(f'INSERT INTO "SGEStudentProfile" ({PROFILE_COLUMNS}) SELECT {PROFILE_COLUMNS} FROM ({PROFILE_SELECT}) p'))
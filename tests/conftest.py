@@ -0,0 +1,77 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.sandbox import prepare_database, import_api
+
+# A throwaway SQLite database, set before any test module imports database.py
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="sge-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIRECTORY, 'sge.db')}"
+os.environ["CODE_STORE"] = "memory"
+
+@pytest.fixture(scope="session")
+def api():
+    # The caches api creates on import go to the test directory too
+    working_directory = os.getcwd()
+    os.chdir(TEST_DIRECTORY)
+
+    prepare_database()
+    api = import_api()
+
+    # The student profile read model is otherwise made by the startup event
+    api.ensure_student_profiles()
+
+    yield api
+
+    os.chdir(working_directory)
+    shutil.rmtree(TEST_DIRECTORY, ignore_errors=True)
+
+@pytest.fixture
+def db(api):
+    db = api.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def client(api):
+    from fastapi.testclient import TestClient
+
+    # No context manager, so the startup event never starts the scheduler
+    return TestClient(api.app)
+
+@pytest.fixture
+def uploads(monkeypatch):
+    # Records every cloudinary upload instead of sending it
+    import threading
+    import cloudinary.uploader
+
+    uploaded = []
+    lock = threading.Lock()
+
+    def upload(file, **options):
+        with lock:
+            uploaded.append((file, options))
+
+        return {"secure_url": f"https://res.cloudinary.com/test/{options.get('public_id')}"}
+
+    monkeypatch.setattr(cloudinary.uploader, "upload", upload)
+    return uploaded
+
+@pytest.fixture
+def emails(api, monkeypatch):
+    # Records every queued email instead of sending it
+    queued = []
+
+    def queue_email(send, *args, priority=None, on_failure=None):
+        queued.append((send.__name__, args, on_failure))
+
+    monkeypatch.setattr(api, "queue_email", queue_email)
+    return queued
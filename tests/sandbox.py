@@ -0,0 +1,46 @@
+"""
+Throwaway database and app import shared by the tests and the benchmarks.
+
+DATABASE_URL must be set before anything here runs, database.py reads it on import.
+"""
+import asyncio
+
+# Tables of the other systems sharing the database, the SGE models only reference them
+EXTERNAL_TABLES = [("FISFaculty", "FacultyId"), ("SCDSLocation", "LocationId"), ("SCDSIncidentType", "IncidentTypeId")]
+
+COMELEC_STUDENT_NUMBER = "2024-0001-COM-0"
+
+def prepare_database():
+    from sqlalchemy import Table, Column, Integer, event
+    from database import Base, engine, SessionLocal
+    from models import Student
+
+    # PostgreSQL's concat, which skips NULLs, for the queries that order candidates by full name
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def register_concat(connection, record):
+            connection.create_function("concat", -1, lambda *values: "".join(str(value) for value in values if value is not None))
+
+    for name, key in EXTERNAL_TABLES:
+        if name not in Base.metadata.tables:
+            Table(name, Base.metadata, Column(key, Integer, primary_key=True))
+
+    Base.metadata.create_all(bind=engine)
+
+    # create_student_set_as_comelec runs on import with string timestamps, which SQLite does not accept
+    db = SessionLocal()
+    try:
+        if not db.query(Student).filter(Student.StudentNumber == COMELEC_STUDENT_NUMBER).first():
+            db.add(Student(StudentNumber=COMELEC_STUDENT_NUMBER, FirstName="John", LastName="Doe", MiddleName="",
+                           Email="student1.sge@gmail.com", Password="", IsOfficer=False))
+            db.commit()
+    finally:
+        db.close()
+
+def import_api():
+    # uvicorn imports the app inside its event loop, api starts the insert data email worker on import
+    async def import_in_loop():
+        import api
+        return api
+
+    return asyncio.run(import_in_loop())
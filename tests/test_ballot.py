@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+import uuid
+
+from pytz import timezone
+
+from models import Student, Election, CreatedElectionPosition, Candidates, CoC, BallotSnapshot
+
+def seed_campaign_election(db):
+    # Election dates are stored as naive Manila time
+    prefix = uuid.uuid4().hex[:6]
+    now = datetime.now(timezone('Asia/Manila')).replace(tzinfo=None)
+
+    election = Election(ElectionName=f"Election {prefix}", CoCFilingStart=now - timedelta(days=3), CoCFilingEnd=now - timedelta(days=2),
+                        CampaignStart=now - timedelta(days=1), CampaignEnd=now + timedelta(days=1),
+                        VotingStart=now + timedelta(days=2), VotingEnd=now + timedelta(days=3))
+    student = Student(StudentNumber=f"{prefix}-C", FirstName="Candidate", LastName="Dela Cruz", Email=f"{prefix}@example.com", Password="")
+    db.add_all([election, student])
+    db.flush()
+
+    coc = CoC(ElectionId=election.ElectionId, StudentNumber=student.StudentNumber, SelectedPositionName="President", Status="Approved")
+    db.add_all([coc,
+                CreatedElectionPosition(ElectionId=election.ElectionId, PositionName="President", PositionQuantity="1"),
+                Candidates(StudentNumber=student.StudentNumber, ElectionId=election.ElectionId, SelectedPositionName="President", Votes=0, TimesAbstained=0)])
+    db.commit()
+
+    return election.ElectionId, coc.CoCId
+
+#########################################################
+""" Stored ballots """
+
+def test_ballot_is_serialized_once_per_snapshot(api, client, db, monkeypatch):
+    election_id, _ = seed_campaign_election(db)
+
+    serialized = []
+    serve_ballot_payload = api.serve_Ballot_Payload
+    monkeypatch.setattr(api, "serve_Ballot_Payload", lambda payload: serialized.append(payload) or serve_ballot_payload(payload))
+
+    first = client.get(f"/api/v1/ballot/election/{election_id}")
+    second = client.get(f"/api/v1/ballot/election/{election_id}")
+    not_modified = client.get(f"/api/v1/ballot/election/{election_id}", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content and first.headers["ETag"] == second.headers["ETag"]
+    assert not_modified.status_code == 304
+    assert len(serialized) == 1
+
+def test_rejecting_a_coc_rebuilds_the_ballot(api, client, db):
+    election_id, coc_id = seed_campaign_election(db)
+
+    client.get(f"/api/v1/ballot/election/{election_id}")
+    api.candidate_list_cache[(election_id, "stale")] = {}
+
+    response = client.put(f"/api/v1/coc/{coc_id}/reject", data={"reject_reason": "Incomplete requirements"})
+
+    assert response.status_code == 200
+    assert db.query(BallotSnapshot).filter(BallotSnapshot.ElectionId == election_id).count() == 0
+    assert (election_id, "stale") not in api.candidate_list_cache
+
+#########################################################
+""" Cached candidate lists """
+
+def test_candidate_list_counters_are_never_cached(api, client, db):
+    election_id, _ = seed_campaign_election(db)
+    url = f"/api/v1/candidates/election/per-position/{election_id}/all"
+
+    (candidate,) = client.get(url).json()["candidates"]["President"]
+    assert candidate["Votes"] == 0
+
+    # A vote counted by another worker, which cannot clear this worker's cache
+    db.query(Candidates).filter(Candidates.CandidateId == candidate["CandidateId"]).update({"Votes": 3})
+    db.commit()
+
+    (candidate,) = client.get(url).json()["candidates"]["President"]
+    assert candidate["Votes"] == 3
+
+    cached = [value for key, value in api.candidate_list_cache.items() if key[0] == election_id]
+    assert "Votes" not in cached[0]["President"][0]
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+import code_store as code_store_module
+from code_store import DatabaseCodeStore, MemoryCodeStore
+from models import Code
+
+#########################################################
+""" Codes expire after their ttl """
+
+@pytest.mark.parametrize("store_class", [DatabaseCodeStore, MemoryCodeStore])
+def test_expired_code_cannot_be_used(api, store_class):
+    code_store = store_class()
+
+    code_store.issue("expiry-student", "Test", "ABC123", ttl=-1)
+
+    assert code_store.get("expiry-student", "Test") is None
+    assert code_store.expires_in("expiry-student", "Test") is None
+    assert not code_store.consume("expiry-student", "Test", "ABC123")
+
+@pytest.mark.parametrize("store_class", [DatabaseCodeStore, MemoryCodeStore])
+def test_code_is_consumed_once(api, store_class):
+    code_store = store_class()
+
+    code_store.issue("consume-student", "Test", "ABC123")
+
+    assert 0 < code_store.expires_in("consume-student", "Test") <= code_store_module.CODE_TTL_SECONDS
+    assert not code_store.consume("consume-student", "Test", "WRONG1")
+    assert code_store.consume("consume-student", "Test", "ABC123")
+    assert not code_store.consume("consume-student", "Test", "ABC123")
+
+def test_database_purge_removes_expired_rows(api, db):
+    code_store = DatabaseCodeStore()
+
+    code_store.issue("purge-student", "Expired", "ABC123", ttl=-1)
+    code_store.issue("purge-student", "Live", "ABC123")
+
+    assert code_store.purge() >= 1
+    assert [code_type for code_type, in db.query(Code.CodeType).filter(Code.StudentNumber == "purge-student").all()] == ["Live"]
+
+def test_memory_store_purges_itself_without_the_scheduler(api, monkeypatch):
+    code_store = MemoryCodeStore()
+
+    code_store.issue("memory-student", "Expired", "ABC123", ttl=-1)
+    monkeypatch.setattr(time, "monotonic", lambda now=time.monotonic(): now + code_store_module.MEMORY_CODE_PURGE_SECONDS)
+    code_store.issue("memory-student", "Live", "ABC123")
+
+    assert list(code_store.codes) == [("memory-student", "Live")]
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+import uuid
+
+from pytz import timezone
+
+from models import Student, Course, CourseEnrolled, Election, CreatedElectionPosition, Candidates, ElectionAnalytics, VotingsTracker
+from timeline import has_passed
+
+MANILA = timezone('Asia/Manila')
+
+def manila_wall_clock():
+    # Election dates are stored as naive Manila time
+    return datetime.now(MANILA).replace(tzinfo=None)
+
+def seed_election(db, voting_end):
+    prefix = uuid.uuid4().hex[:6]
+
+    course = Course(CourseCode=f"D{prefix}", Name="Computer Science")
+    election = Election(ElectionName=f"Election {prefix}", VotingStart=voting_end - timedelta(days=1), VotingEnd=voting_end)
+    db.add_all([course, election])
+    db.flush()
+
+    candidate = Student(StudentNumber=f"{prefix}-C", FirstName="Candidate", LastName="Dela Cruz", Email=f"{prefix}-c@example.com", Password="")
+    voter = Student(StudentNumber=f"{prefix}-V", FirstName="Voter", LastName="Dela Cruz", Email=f"{prefix}-v@example.com", Password="")
+    db.add_all([candidate, voter])
+    db.flush()
+
+    db.add_all([ElectionAnalytics(ElectionId=election.ElectionId, AbstainCount=0, VotesCount=0),
+                CreatedElectionPosition(ElectionId=election.ElectionId, PositionName="President", PositionQuantity="1"),
+                Candidates(StudentNumber=candidate.StudentNumber, ElectionId=election.ElectionId, SelectedPositionName="President", Votes=0, TimesAbstained=0),
+                CourseEnrolled(CourseId=course.CourseId, StudentId=voter.StudentId, Status=1, CurriculumYear=2024)])
+    db.commit()
+
+    return election.ElectionId, candidate.StudentNumber, voter.StudentNumber
+
+def submit_vote(client, election_id, candidate, voter):
+    return client.post("/api/v1/votings/submit", json={
+        "election_id": election_id,
+        "voter_student_number": voter,
+        "votes": [{"candidate_student_number": candidate}],
+        "abstainList": [],
+    })
+
+#########################################################
+""" Votes are only accepted until VotingEnd, Manila time """
+
+def test_vote_a_minute_after_voting_end_is_rejected(client, db, uploads):
+    election_id, candidate, voter = seed_election(db, manila_wall_clock() - timedelta(minutes=1))
+
+    response = submit_vote(client, election_id, candidate, voter)
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Voting period for this election has ended."}
+    assert db.query(VotingsTracker).filter(VotingsTracker.ElectionId == election_id).count() == 0
+    assert uploads == []
+
+def test_vote_a_minute_before_voting_end_is_accepted(client, db, uploads):
+    election_id, candidate, voter = seed_election(db, manila_wall_clock() + timedelta(minutes=1))
+
+    response = submit_vote(client, election_id, candidate, voter)
+
+    assert response.status_code == 200
+    assert db.query(VotingsTracker).filter(VotingsTracker.ElectionId == election_id).count() == 1
+
+def test_has_passed_reads_dates_as_manila_time():
+    deadline = datetime(2024, 3, 1, 17, 0)
+
+    assert not has_passed(deadline, MANILA.localize(datetime(2024, 3, 1, 16, 59)))
+    assert has_passed(deadline, MANILA.localize(datetime(2024, 3, 1, 17, 1)))
+    assert not has_passed(None)
+
+#########################################################
+""" Only votes for candidates need the voter's course """
+
+def test_all_abstain_ballot_from_a_voter_without_a_course_is_accepted(client, db, uploads):
+    election_id, candidate, voter = seed_election(db, manila_wall_clock() + timedelta(minutes=1))
+
+    voter_without_course = Student(StudentNumber=f"{voter}-N", FirstName="Voter", LastName="Santos", Email=f"{voter}-n@example.com", Password="")
+    db.add(voter_without_course)
+    db.commit()
+
+    response = submit_vote(client, election_id, "abstain", voter_without_course.StudentNumber)
+
+    assert response.status_code == 200
+    assert db.query(ElectionAnalytics).filter(ElectionAnalytics.ElectionId == election_id).one().AbstainCount == 1
+
+    # A vote for a candidate still needs it
+    response = submit_vote(client, election_id, candidate, voter_without_course.StudentNumber)
+    assert response.status_code == 400
+    assert response.json() == {"error": "Your course could not be found, please contact the administrator."}
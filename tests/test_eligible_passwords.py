@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+
+from models import Student, Election, Eligibles
+
+def seed_eligibles(db, count=2, **eligible):
+    prefix = uuid.uuid4().hex[:6]
+    now = datetime.now()
+
+    election = Election(ElectionName=f"Election {prefix}", JustInTimeCredentials=False, VotingStart=now - timedelta(days=1), VotingEnd=now + timedelta(days=1))
+    students = [Student(StudentNumber=f"{prefix}-{index}", FirstName="Juan", LastName="Dela Cruz", Email=f"{prefix}-{index}@example.com", Password="")
+                for index in range(count)]
+    db.add_all([election] + students)
+    db.flush()
+
+    db.add_all([Eligibles(ElectionId=election.ElectionId, StudentNumber=student.StudentNumber, HasVotedOrAbstained=False, **eligible)
+                for student in students])
+    db.commit()
+
+    return election.ElectionId
+
+def eligibles_of(db, election_id):
+    db.expire_all()
+    return db.query(Eligibles).filter(Eligibles.ElectionId == election_id).order_by(Eligibles.EligibleId).all()
+
+@pytest.fixture
+def fill(api):
+    # Runs the fill and drops the follow-up it schedules, the scheduler is not started in the tests
+    def fill(election_id):
+        try:
+            api.fill_eligible_passwords(election_id)
+        finally:
+            if api.scheduler.get_job(f'fill_passwords_{election_id}'):
+                api.scheduler.remove_job(f'fill_passwords_{election_id}')
+
+    return fill
+
+#########################################################
+""" Every eligible ends up with a password that was emailed """
+
+def test_failed_password_email_is_filled_and_sent_again(db, emails, fill):
+    election_id = seed_eligibles(db)
+
+    fill(election_id)
+
+    assert [send for send, _, _ in emails] == ["send_eligible_password_email"] * 2
+
+    # Every retry failed for the first email
+    _, _, on_failure = emails[0]
+    on_failure()
+
+    first, second = eligibles_of(db, election_id)
+    assert first.VotingPassword is None and second.VotingPassword is not None
+
+    fill(election_id)
+
+    assert len(emails) == 3
+    _, (eligible_id, hashed_password, *_), _ = emails[2]
+    assert (eligible_id, hashed_password) == (first.EligibleId, eligibles_of(db, election_id)[0].VotingPassword)
+
+def test_password_email_lost_with_its_worker_is_filled_again(api, db, emails, fill):
+    lost_at = datetime.now() - timedelta(minutes=api.ELIGIBLE_PASSWORD_DELIVERY_TIMEOUT_MINUTES + 1)
+    election_id = seed_eligibles(db, count=1, VotingPassword="lost-hash", updated_at=lost_at)
+
+    fill(election_id)
+
+    eligible, = eligibles_of(db, election_id)
+    assert eligible.VotingPassword not in (None, "lost-hash")
+    assert [args[:2] for _, args, _ in emails] == [(eligible.EligibleId, eligible.VotingPassword)]
+
+def test_password_set_during_the_fill_is_not_overwritten(api, db, emails, fill, monkeypatch):
+    election_id = seed_eligibles(db)
+    first, _ = eligibles_of(db, election_id)
+
+    class Executor:
+        # A student gets a password while the batch is being hashed
+        def map(self, hash_password, pass_values):
+            db.query(Eligibles).filter(Eligibles.EligibleId == first.EligibleId).update({"VotingPassword": "requested-hash"})
+            db.commit()
+            return [hash_password(pass_value) for pass_value in pass_values]
+
+    monkeypatch.setattr(api, "password_hash_executor", Executor())
+
+    fill(election_id)
+
+    first, second = eligibles_of(db, election_id)
+    assert first.VotingPassword == "requested-hash"
+    assert [args[0] for _, args, _ in emails] == [second.EligibleId]
+
+def test_password_email_is_recorded_and_never_sends_a_replaced_password(api, db, monkeypatch):
+    election_id = seed_eligibles(db, count=1, VotingPassword="current-hash")
+    eligible, = eligibles_of(db, election_id)
+
+    sent = []
+    monkeypatch.setattr(api, "send_eligible_students_email", lambda *email: sent.append(email))
+
+    api.send_eligible_password_email(eligible.EligibleId, "replaced-hash", eligible.StudentNumber, "juan@example.com", "OLD1234")
+    assert sent == [] and eligibles_of(db, election_id)[0].PasswordSentAt is None
+
+    api.send_eligible_password_email(eligible.EligibleId, "current-hash", eligible.StudentNumber, "juan@example.com", "NEW1234")
+    assert sent == [(eligible.StudentNumber, "juan@example.com", "NEW1234")]
+    assert eligibles_of(db, election_id)[0].PasswordSentAt is not None
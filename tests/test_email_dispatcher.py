@@ -0,0 +1,53 @@
+import threading
+
+import services
+from services import EmailDispatcher, HIGH_PRIORITY, BULK_PRIORITY
+
+def flaky_send(failures, sent):
+    # Fails the first failures calls, then records the email
+    calls = []
+
+    def send(address):
+        calls.append(address)
+
+        if len(calls) <= failures:
+            raise ConnectionError("SMTP unavailable")
+
+        sent.set()
+
+    return send, calls
+
+#########################################################
+""" Email dispatch off the request thread """
+
+def test_failed_send_is_retried_until_it_goes_out(monkeypatch):
+    monkeypatch.setattr(services, "EMAIL_RETRY_BASE_SECONDS", 0.01)
+    sent, failed = threading.Event(), threading.Event()
+    send, calls = flaky_send(services.EMAIL_MAX_ATTEMPTS - 1, sent)
+
+    EmailDispatcher(1, 0).submit(BULK_PRIORITY, send, ("juan@example.com",), on_failure=failed.set)
+
+    assert sent.wait(5)
+    assert len(calls) == services.EMAIL_MAX_ATTEMPTS
+    assert not failed.is_set()
+
+def test_on_failure_runs_once_every_attempt_failed(monkeypatch):
+    monkeypatch.setattr(services, "EMAIL_RETRY_BASE_SECONDS", 0.01)
+    sent, failed = threading.Event(), threading.Event()
+    send, calls = flaky_send(services.EMAIL_MAX_ATTEMPTS, sent)
+
+    EmailDispatcher(1, 0).submit(HIGH_PRIORITY, send, ("juan@example.com",), on_failure=failed.set)
+
+    assert failed.wait(5)
+    assert len(calls) == services.EMAIL_MAX_ATTEMPTS
+    assert not sent.is_set()
+
+def test_high_priority_emails_are_taken_before_bulk_ones():
+    # Not started, the lanes are filled and taken by hand
+    dispatcher = EmailDispatcher(1, 0)
+    dispatcher.lanes[BULK_PRIORITY].extend([(BULK_PRIORITY, print, ("bulk 1",), None, 1), (BULK_PRIORITY, print, ("bulk 2",), None, 1)])
+    dispatcher.lanes[HIGH_PRIORITY].append((HIGH_PRIORITY, print, ("code",), None, 1))
+
+    taken = [dispatcher.take([HIGH_PRIORITY, BULK_PRIORITY])[2] for _ in range(3)]
+
+    assert taken == [("code",), ("bulk 1",), ("bulk 2",)]
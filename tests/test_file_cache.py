@@ -0,0 +1,55 @@
+import os
+
+import file_cache
+from file_cache import DiskLRUCache
+
+def write(cache, source, size):
+    temp_file, temp_path = cache.open_temp()
+    with temp_file:
+        temp_file.write(b"x" * size)
+
+    cache.commit(source, temp_path)
+    return os.path.join(cache.directory, cache.key(source))
+
+#########################################################
+""" Disk cache shared by every worker """
+
+def test_commit_keeps_the_byte_cap_without_rescanning(tmp_path, monkeypatch):
+    cache = DiskLRUCache(str(tmp_path), 250)
+
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(file_cache.os, "listdir", lambda directory: scans.append(directory) or listdir(directory))
+
+    oldest = write(cache, "https://example.com/1.pdf", 100)
+    write(cache, "https://example.com/2.pdf", 100)
+    write(cache, "https://example.com/3.pdf", 100)
+
+    assert scans == []
+    assert not os.path.exists(oldest)
+    assert cache.total_bytes == 200 and sum(os.path.getsize(tmp_path / name) for name in cache.entries) == 200
+
+def test_commit_of_a_file_another_worker_evicted(tmp_path, monkeypatch):
+    cache = DiskLRUCache(str(tmp_path), 1000)
+    replace = os.replace
+
+    def replace_then_evict(source, destination):
+        # The other worker's eviction lands right after our rename
+        replace(source, destination)
+        os.remove(destination)
+
+    monkeypatch.setattr(file_cache.os, "replace", replace_then_evict)
+    monkeypatch.setattr(file_cache, "INDEX_RESCAN_SECONDS", -1)
+
+    write(cache, "https://example.com/evicted.pdf", 100)
+
+    assert cache.get("https://example.com/evicted.pdf") is None
+    assert cache.total_bytes == 0
+
+def test_recommitting_a_source_replaces_its_size(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), 1000)
+
+    write(cache, "https://example.com/receipt.pdf", 100)
+    write(cache, "https://example.com/receipt.pdf", 300)
+
+    assert cache.total_bytes == 300
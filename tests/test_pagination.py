@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+
+from models import Student
+from student_profiles import refresh_student_profiles
+
+def seed_students(db, count):
+    prefix = uuid.uuid4().hex[:6]
+    students = [Student(StudentNumber=f"{prefix}-{index}", FirstName="Juan", LastName=f"Page {index}", Email=f"{prefix}-{index}@example.com", Password="")
+                for index in range(count)]
+    db.add_all(students)
+    db.commit()
+    refresh_student_profiles()
+
+    return [student.StudentNumber for student in students]
+
+def walk_pages(client, url, limit, key):
+    # Follows X-Next-Cursor until the last page, returns every row in order
+    rows, pages, after = [], 0, None
+
+    while True:
+        response = client.get(url, params={"limit": limit, **({"after": after} if after is not None else {})})
+        assert response.status_code == 200, response.text
+
+        rows.extend(response.json()[key])
+        pages += 1
+        after = response.headers.get("X-Next-Cursor")
+
+        if after is None:
+            return rows, pages
+
+#########################################################
+""" Cursor pages """
+
+@pytest.mark.parametrize("limit", [0, -1, 1001])
+def test_limit_out_of_range_is_rejected(api, client, limit):
+    assert api.MAX_PAGE_LIMIT == 1000
+
+    for url in ["/api/v1/student/all", "/api/v1/student/all/arranged", "/api/v1/coc/all"]:
+        assert client.get(url, params={"limit": limit}).status_code == 422
+
+def test_student_pages_follow_the_cursor(client, db):
+    student_numbers = seed_students(db, 5)
+
+    everyone = client.get("/api/v1/student/all").json()["students"]
+    rows, pages = walk_pages(client, "/api/v1/student/all", 2, "students")
+
+    assert rows == everyone
+    assert pages == len(everyone) // 2 + 1
+    assert [row["StudentNumber"] for row in rows if row["StudentNumber"] in student_numbers] == student_numbers
+
+def test_arranged_student_pages_follow_the_cursor(client, db):
+    seed_students(db, 5)
+
+    everyone = client.get("/api/v1/student/all/arranged").json()["students"]
+    rows, _ = walk_pages(client, "/api/v1/student/all/arranged", 3, "students")
+
+    assert rows == everyone
+
+def test_fields_selects_student_columns(client, db):
+    seed_students(db, 2)
+
+    response = client.get("/api/v1/student/all", params={"fields": "StudentNumber,LastName", "limit": 2})
+
+    assert response.status_code == 200
+    assert [set(row) for row in response.json()["students"]] == [{"StudentNumber", "LastName"}] * 2
+    assert response.headers["X-Total-Count"].isdigit()
+
+    response = client.get("/api/v1/student/all", params={"fields": "StudentNumber,Password"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown fields: Password"}
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import glob
+import uuid
+
+from models import Student, Course, CourseEnrolled, Election, CreatedElectionPosition, Candidates, ElectionAnalytics, \
+    ElectionWinners, VotingReceipt, Certifications, CertificationJobs
+
+VOTERS = 12
+CERTIFICATION_REQUESTS = 4
+
+#########################################################
+""" Seed data """
+
+def add_student(db, student_number, first_name):
+    student = Student(StudentNumber=student_number, FirstName=first_name, LastName="Dela Cruz", MiddleName=None,
+                      Email=f"{student_number}@example.com", Password="", IsOfficer=False)
+    db.add(student)
+    db.flush()
+    return student
+
+def seed_election(db):
+    prefix = uuid.uuid4().hex[:6]
+
+    course = Course(CourseCode=f"C{prefix}", Name="Computer Science")
+    db.add(course)
+    db.flush()
+
+    election = Election(ElectionName=f"Election {prefix}", ElectionStatus="Active",
+                        VotingStart=datetime.now() - timedelta(days=1), VotingEnd=datetime.now() + timedelta(days=1))
+    db.add(election)
+    db.flush()
+
+    db.add(ElectionAnalytics(ElectionId=election.ElectionId, AbstainCount=0, VotesCount=0))
+    db.add(CreatedElectionPosition(ElectionId=election.ElectionId, PositionName="President", PositionQuantity="1"))
+
+    candidates = []
+    for index in range(2):
+        candidate = add_student(db, f"{prefix}-C{index}", f"Candidate {index}")
+        db.add(Candidates(StudentNumber=candidate.StudentNumber, ElectionId=election.ElectionId, SelectedPositionName="President",
+                          Votes=0, TimesAbstained=0))
+        db.add(ElectionWinners(ElectionId=election.ElectionId, StudentNumber=candidate.StudentNumber,
+                               SelectedPositionName="President", Votes=0, IsTied=False))
+        candidates.append(candidate.StudentNumber)
+
+    voters = []
+    for index in range(VOTERS):
+        voter = add_student(db, f"{prefix}-V{index}", f"Voter {index}")
+        db.add(CourseEnrolled(CourseId=course.CourseId, StudentId=voter.StudentId, Status=1, CurriculumYear=2024))
+        voters.append(voter.StudentNumber)
+
+    db.commit()
+    return election.ElectionId, candidates, voters
+
+#########################################################
+""" Receipts and certifications rendered at the same time never collide """
+
+def test_parallel_votes_and_certifications_do_not_collide(client, db, uploads):
+    election_id, candidates, voters = seed_election(db)
+
+    def submit_votes(index):
+        return client.post("/api/v1/votings/submit", json={
+            "election_id": election_id,
+            "voter_student_number": voters[index],
+            "votes": [{"candidate_student_number": candidates[index % 2]}],
+            "abstainList": [],
+        })
+
+    def create_certifications(index):
+        return client.post("/api/v1/certification/create", json={
+            "title": f"Oath of office {index}",
+            "election_id": election_id,
+            "date": date.today().isoformat(),
+            "quantity": "1",
+            "signatories": [{"name": "Adviser", "position": "Adviser"}],
+        })
+
+    with ThreadPoolExecutor(max_workers=VOTERS + CERTIFICATION_REQUESTS) as executor:
+        vote_responses = [executor.submit(submit_votes, index) for index in range(VOTERS)]
+        certification_responses = [executor.submit(create_certifications, index) for index in range(CERTIFICATION_REQUESTS)]
+
+        vote_responses = [response.result() for response in vote_responses]
+        certification_responses = [response.result() for response in certification_responses]
+
+    assert [response.status_code for response in vote_responses] == [200] * VOTERS
+    assert [response.status_code for response in certification_responses] == [200] * CERTIFICATION_REQUESTS
+
+    # Every PDF went to its own public id, and none of them was written to the working directory
+    public_ids = [options["public_id"] for _, options in uploads]
+    assert len(public_ids) == VOTERS + CERTIFICATION_REQUESTS * len(candidates)
+    assert len(set(public_ids)) == len(public_ids)
+    assert all(isinstance(file, bytes) and file.startswith(b"%PDF") for file, _ in uploads)
+    assert glob.glob("*.pdf") == []
+
+    # Each voter has their own receipt with its own PDF
+    receipts = db.query(VotingReceipt).filter(VotingReceipt.ElectionId == election_id).all()
+    assert sorted(receipt.StudentNumber for receipt in receipts) == sorted(voters)
+    assert len({receipt.ReceiptPDF for receipt in receipts}) == VOTERS
+
+    # Every certification of every job got its own PDF
+    certification_jobs = db.query(CertificationJobs).filter(CertificationJobs.ElectionId == election_id).all()
+    assert [(job.Status, job.Completed, job.Failed) for job in certification_jobs] == [("Completed", len(candidates), 0)] * CERTIFICATION_REQUESTS
+
+    certifications = db.query(Certifications).filter(Certifications.ElectionId == election_id).all()
+    assert len({certification.AssetId for certification in certifications}) == CERTIFICATION_REQUESTS * len(candidates)
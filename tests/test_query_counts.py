@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+import itertools
+import uuid
+
+from sqlalchemy import event
+import pytest
+
+from models import Student, StudentOrganization, Election, CreatedElectionPosition, PartyList, Candidates, CoC, \
+    OrganizationOfficer, OrganizationMember, ElectionAppeals, Eligibles, VotingsTracker, Certifications
+from student_profiles import refresh_student_profiles
+
+sequence = itertools.count()
+
+#########################################################
+""" Seed data, every call to grow adds rows to every list below """
+
+def add_student(db, student_number):
+    student = Student(StudentNumber=student_number, FirstName="Juan", LastName="Dela Cruz", MiddleName="Santos",
+                      Email=f"{student_number}@example.com", Password="", IsOfficer=False)
+    db.add(student)
+    db.flush()
+    return student
+
+def seed(db):
+    prefix = uuid.uuid4().hex[:6]
+
+    organization = StudentOrganization(OrganizationName=f"Organization {prefix}", OrganizationMemberRequirements="BSCS")
+    db.add(organization)
+    db.flush()
+
+    voter = add_student(db, f"{prefix}-voter")
+
+    election = Election(ElectionName=f"Election {prefix}", StudentOrganizationId=organization.StudentOrganizationId,
+                        CreatedBy=voter.StudentNumber, VotingStart=datetime.now() - timedelta(days=1), VotingEnd=datetime.now() + timedelta(days=1))
+    db.add(election)
+    db.flush()
+
+    # Every candidate added by grow runs under it
+    partylist = PartyList(ElectionId=election.ElectionId, PartyListName=f"Partylist {prefix}", Status="Approved")
+    db.add_all([partylist, CreatedElectionPosition(ElectionId=election.ElectionId, PositionName="President", PositionQuantity="1")])
+    db.commit()
+
+    return {"prefix": prefix, "organization_id": organization.StudentOrganizationId, "election_id": election.ElectionId,
+            "voter": voter.StudentNumber, "partylist_id": partylist.PartyListId}
+
+def grow(db, context, count):
+    for _ in range(count):
+        student = add_student(db, f"{context['prefix']}-{next(sequence)}")
+
+        # Another election of the organization, the voter is eligible and voted in it
+        election = Election(ElectionName=f"Election {student.StudentNumber}", StudentOrganizationId=context["organization_id"],
+                            CreatedBy=student.StudentNumber, VotingStart=datetime.now() - timedelta(days=1), VotingEnd=datetime.now() + timedelta(days=1))
+        db.add(election)
+        db.flush()
+
+        db.add(CreatedElectionPosition(ElectionId=election.ElectionId, PositionName="President", PositionQuantity="1"))
+        db.add(Eligibles(StudentNumber=context["voter"], ElectionId=election.ElectionId, HasVotedOrAbstained=True))
+        db.add(VotingsTracker(VoterStudentNumber=context["voter"], ElectionId=election.ElectionId))
+
+        # Another partylist of the seeded election
+        db.add(PartyList(ElectionId=context["election_id"], PartyListName=f"Partylist {student.StudentNumber}", Status="Approved"))
+
+        # A candidate of the seeded election, with the seeded partylist and an approved CoC
+        db.add(Candidates(StudentNumber=student.StudentNumber, ElectionId=context["election_id"], PartyListId=context["partylist_id"],
+                          SelectedPositionName="President", DisplayPhoto=f"https://res.cloudinary.com/test/{student.StudentNumber}.jpg",
+                          Votes=0, TimesAbstained=0))
+        db.add(CoC(ElectionId=context["election_id"], StudentNumber=student.StudentNumber, PartyListId=context["partylist_id"],
+                   SelectedPositionName="President", Motto="Serve", Status="Approved"))
+        db.add(Certifications(Title=f"Certification {student.StudentNumber}", ElectionId=election.ElectionId, StudentNumber=student.StudentNumber))
+
+        db.add(OrganizationOfficer(StudentOrganizationId=context["organization_id"], StudentNumber=student.StudentNumber, Position="Officer"))
+        db.add(OrganizationMember(StudentOrganizationId=context["organization_id"], StudentNumber=student.StudentNumber))
+        db.add(ElectionAppeals(StudentNumber=student.StudentNumber, AppealDetails="Please recount"))
+
+    db.commit()
+
+    # The arranged student list reads the profiles
+    refresh_student_profiles()
+
+#########################################################
+""" Query counting """
+
+def count_queries(api, client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Totals are cached between requests, clear them so every request does the same work
+    api.total_count_cache.clear()
+
+    event.listen(api.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(api.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+LIST_ENDPOINTS = {
+    "elections": lambda context: "/api/v1/election/all",
+    "organization elections": lambda context: f"/api/v1/election/all/organization/{context['organization_id']}",
+    "is student voted": lambda context: f"/api/v1/election/all/is-student-voted?student_number={context['voter']}",
+    "approved cocs": lambda context: f"/api/v1/election/{context['election_id']}/approved/coc/all",
+    "candidates": lambda context: "/api/v1/candidates/all",
+    "election candidates": lambda context: f"/api/v1/candidates/election/{context['election_id']}/all",
+    "position results": lambda context: f"/api/v1/votings/election/{context['election_id']}/President/results",
+    "appeals": lambda context: "/api/v1/election-appeals/all",
+    "organization officers and members": lambda context: f"/api/v1/student/organization/{context['organization_id']}",
+    "cocs": lambda context: "/api/v1/coc/all",
+    "certifications": lambda context: "/api/v1/certification/all",
+    "students": lambda context: "/api/v1/student/all",
+    "arranged students": lambda context: "/api/v1/student/all/arranged",
+    "partylists": lambda context: "/api/v1/partylist/all",
+    "election partylists": lambda context: f"/api/v1/partylist/election/{context['election_id']}",
+    "partylist candidates": lambda context: f"/api/v1/partylist/{context['partylist_id']}/candidates/all",
+}
+
+@pytest.mark.parametrize("endpoint", LIST_ENDPOINTS)
+def test_list_endpoint_queries_do_not_grow_with_rows(api, client, db, endpoint):
+    context = seed(db)
+    url = LIST_ENDPOINTS[endpoint](context)
+
+    grow(db, context, 2)
+    few_rows = count_queries(api, client, url)
+
+    grow(db, context, 8)
+    many_rows = count_queries(api, client, url)
+
+    assert many_rows == few_rows
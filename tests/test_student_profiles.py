@@ -0,0 +1,47 @@
+import uuid
+
+from models import Student, Course, StudentClassGrade, Class, Metadata
+
+def seed_classed_student(db):
+    # Added straight to the SPS tables, so the student profiles do not have it until the next refresh
+    prefix = uuid.uuid4().hex[:6]
+
+    course = Course(CourseCode=f"P{prefix}", Name="Computer Science")
+    student = Student(StudentNumber=f"{prefix}-S", FirstName="New", LastName="Student", Email=f"{prefix}@example.com", Password="")
+    db.add_all([course, student])
+    db.flush()
+
+    metadata = Metadata(CourseId=course.CourseId, Year=3, Semester=1, Batch=2024)
+    db.add(metadata)
+    db.flush()
+
+    student_class = Class(MetadataId=metadata.MetadataId, Section=2)
+    db.add(student_class)
+    db.flush()
+
+    db.add(StudentClassGrade(StudentId=student.StudentId, ClassId=student_class.ClassId, Grade=1.25))
+    db.commit()
+
+    return student.StudentNumber, course.CourseCode
+
+#########################################################
+""" Students missing from the profiles are looked up live """
+
+def test_section_metadata_and_grade_of_a_student_missing_from_the_profiles(client, db):
+    student_number, course_code = seed_classed_student(db)
+
+    assert client.get(f"/api/v1/student/get/section/{student_number}").json() == {"section": 2}
+    assert client.get(f"/api/v1/student/get/grade/{student_number}").json() == {"grade": 1.25}
+
+    metadata = client.get(f"/api/v1/student/get/metadata/{student_number}").json()["metadata"]
+    assert (metadata["CourseCode"], metadata["Year"], metadata["Semester"], metadata["Batch"]) == (course_code, 3, 1, 2024)
+
+def test_profile_refreshes_after_inserts_are_debounced(api):
+    try:
+        api.schedule_student_profile_refresh()
+        api.schedule_student_profile_refresh()
+
+        jobs = [job for job in api.scheduler.get_jobs() if job.id == 'refresh_student_profiles_soon']
+        assert len(jobs) == 1
+    finally:
+        api.scheduler.remove_job('refresh_student_profiles_soon')
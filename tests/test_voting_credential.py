@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+
+from code_store import DatabaseCodeStore, MemoryCodeStore
+from models import Student, Election, Eligibles
+
+def seed_eligible(db, voting_password="issued-hash"):
+    prefix = uuid.uuid4().hex[:6]
+    now = datetime.now()
+
+    election = Election(ElectionName=f"Election {prefix}", JustInTimeCredentials=True, CoCFilingStart=now - timedelta(days=3),
+                        CampaignStart=now - timedelta(days=2), VotingStart=now - timedelta(days=1), VotingEnd=now + timedelta(days=1))
+    student = Student(StudentNumber=f"{prefix}-S", FirstName="Juan", LastName="Dela Cruz", Email=f"{prefix}@example.com", Password="")
+    db.add_all([election, student])
+    db.flush()
+
+    db.add(Eligibles(ElectionId=election.ElectionId, StudentNumber=student.StudentNumber, HasVotedOrAbstained=False, VotingPassword=voting_password))
+    db.commit()
+
+    return election.ElectionId, student.StudentNumber
+
+def voting_password(db, election_id, student_number):
+    db.expire_all()
+    return db.query(Eligibles.VotingPassword).filter(Eligibles.ElectionId == election_id, Eligibles.StudentNumber == student_number).scalar()
+
+def request_credential(client, election_id, student_number, verification_code=None):
+    return client.post(f"/api/v1/election/{election_id}/voting-credential",
+                       json={"StudentNumber": student_number, "VerificationCode": verification_code})
+
+#########################################################
+""" The code endpoints cannot be used to rotate someone's voting password """
+
+def test_generated_codes_cannot_rotate_a_voting_password(client, db, emails):
+    election_id, student_number = seed_eligible(db)
+
+    response = client.post("/api/v1/code/coc/verification/generate",
+                           json={"election_id": election_id, "student_number": student_number, "code_type": f"VotingCredential:{election_id}"})
+
+    assert response.status_code == 200
+    assert "code_value" not in response.json()
+
+    # Even with the emailed code in hand, it is not a voting credential code
+    (_, (_, _, code_value), _), = emails
+    assert request_credential(client, election_id, student_number, code_value).status_code == 400
+    assert voting_password(db, election_id, student_number) == "issued-hash"
+
+def test_credential_code_is_revoked_after_too_many_wrong_guesses(api, client, db, emails):
+    election_id, student_number = seed_eligible(db)
+
+    assert request_credential(client, election_id, student_number).json()["verification_required"]
+    (_, (_, _, code_value), _), = emails
+
+    for _ in range(api.VOTING_CREDENTIAL_MAX_ATTEMPTS - 1):
+        assert request_credential(client, election_id, student_number, "WRONG1").json() == {"error": "Verification code is invalid."}
+
+    response = request_credential(client, election_id, student_number, "WRONG1")
+    assert response.json() == {"error": "Too many invalid verification codes, please request a new one."}
+
+    # The right code no longer works either
+    assert request_credential(client, election_id, student_number, code_value).status_code == 400
+    assert voting_password(db, election_id, student_number) == "issued-hash"
+
+def test_emailed_credential_code_rotates_the_password(client, db, emails):
+    election_id, student_number = seed_eligible(db)
+
+    request_credential(client, election_id, student_number)
+    (_, (_, _, code_value), _), = emails
+
+    response = request_credential(client, election_id, student_number, code_value)
+
+    assert response.status_code == 200
+    assert voting_password(db, election_id, student_number) != "issued-hash"
+    assert [send for send, _, _ in emails] == ["send_verification_code_email", "send_eligible_password_email"]
+
+@pytest.mark.parametrize("store_class", [DatabaseCodeStore, MemoryCodeStore])
+def test_code_store_counts_failed_attempts_per_code(api, store_class):
+    code_store = store_class()
+
+    code_store.issue("attempts-student", "Test", "ABC123")
+
+    assert not code_store.record_failed_attempt("attempts-student", "Test", 2)
+    assert code_store.record_failed_attempt("attempts-student", "Test", 2)
+    assert code_store.get("attempts-student", "Test") is None
+
+    # A new code starts from zero
+    code_store.issue("attempts-student", "Test", "ABC123")
+    assert not code_store.record_failed_attempt("attempts-student", "Test", 2)
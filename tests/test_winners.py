@@ -0,0 +1,198 @@
+from collections import defaultdict, namedtuple
+
+from hypothesis import given, strategies as st
+import pandas as pd
+
+from winners import determine_winners, LEGACY_RULES, SEAT_RULES
+
+Candidate = namedtuple("Candidate", ["SelectedPositionName", "StudentNumber", "Votes"])
+
+#########################################################
+""" The gather_winners_by_election_id loop from before determine_winners """
+
+def legacy_gather_winners(candidates, num_winners_per_position, num_eligible_voters):
+    all_candidates_for_election = sorted(candidates, key=lambda candidate: candidate.Votes, reverse=True)
+
+    num_candidates_per_position = defaultdict(int)
+    for candidate in all_candidates_for_election:
+        num_candidates_per_position[candidate.SelectedPositionName] += 1
+
+    candidates_per_position = defaultdict(list)
+    for candidate in all_candidates_for_election:
+        if len(candidates_per_position[candidate.SelectedPositionName]) < num_winners_per_position[candidate.SelectedPositionName]:
+            candidates_per_position[candidate.SelectedPositionName].append(candidate)
+        elif len(candidates_per_position[candidate.SelectedPositionName]) == num_winners_per_position[candidate.SelectedPositionName] and candidates_per_position[candidate.SelectedPositionName][-1].Votes == candidate.Votes:
+            candidates_per_position[candidate.SelectedPositionName].append(candidate)
+
+    winners = set()
+    for position, candidates in candidates_per_position.items():
+        if num_candidates_per_position[position] == 1:
+            vote_threshold = (num_eligible_voters // 2) + 1
+
+            if candidates[0].Votes >= vote_threshold:
+                winners.add((position, candidates[0].StudentNumber, candidates[0].Votes, False))
+        else:
+            max_votes = max(candidate.Votes for candidate in candidates)
+
+            if max_votes > 0:
+                top = [candidate for candidate in candidates if candidate.Votes == max_votes]
+                is_tied = len(top) > num_winners_per_position[position]
+
+                for candidate in top:
+                    winners.add((position, candidate.StudentNumber, candidate.Votes, is_tied))
+
+    return winners
+
+#########################################################
+""" Strategies and helpers """
+
+POSITIONS = ["President", "Vice President", "Senator", "Representative"]
+
+@st.composite
+def elections(draw):
+    positions = draw(st.lists(st.sampled_from(POSITIONS), min_size=1, max_size=len(POSITIONS), unique=True))
+    seats = {position: draw(st.integers(min_value=1, max_value=4)) for position in positions}
+
+    candidates = []
+    for position in positions:
+        # Small vote counts so ties are common
+        for votes in draw(st.lists(st.integers(min_value=0, max_value=6), min_size=0, max_size=7)):
+            candidates.append(Candidate(position, f"2020-{len(candidates):05d}-MN-0", votes))
+
+    num_eligible_voters = draw(st.integers(min_value=0, max_value=20))
+    return candidates, seats, num_eligible_voters
+
+def frame(candidates):
+    return pd.DataFrame(candidates, columns=["SelectedPositionName", "StudentNumber", "Votes"])
+
+def as_set(winners):
+    return {(row.SelectedPositionName, row.StudentNumber, int(row.Votes), bool(row.IsTied)) for row in winners.itertuples(index=False)}
+
+def old_loop_keeps_every_tie(position_candidates, seats):
+    # The old loop appends at most one candidate tied with the last seat, which one depends on the row order
+    if len(position_candidates) <= seats:
+        return True
+
+    cutoff_votes = sorted((candidate.Votes for candidate in position_candidates), reverse=True)[seats - 1]
+    return sum(candidate.Votes >= cutoff_votes for candidate in position_candidates) <= seats + 1
+
+def by_position(rows):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[0]].append(row)
+    return grouped
+
+#########################################################
+""" Legacy rules match the old loop """
+
+@given(elections())
+def test_legacy_rules_match_old_algorithm(election):
+    candidates, seats, num_eligible_voters = election
+
+    new = by_position(as_set(determine_winners(frame(candidates), seats, num_eligible_voters, rules=LEGACY_RULES)))
+    old = by_position(legacy_gather_winners(candidates, seats, num_eligible_voters))
+
+    for position, position_candidates in by_position(candidates).items():
+        if old_loop_keeps_every_tie(position_candidates, seats[position]):
+            assert sorted(new[position]) == sorted(old[position])
+        else:
+            # Every candidate the old loop picked is still there, plus the rest of the tie it dropped
+            assert set(old[position]) <= set(new[position])
+
+#########################################################
+""" Seat rules match the old loop wherever the semantics are meant to be the same """
+
+@given(elections())
+def test_seat_rules_match_old_algorithm_where_semantics_agree(election):
+    candidates, seats, num_eligible_voters = election
+
+    new = by_position(as_set(determine_winners(frame(candidates), seats, num_eligible_voters, rules=SEAT_RULES)))
+    old = by_position(legacy_gather_winners(candidates, seats, num_eligible_voters))
+
+    for position, position_candidates in by_position(candidates).items():
+        top_votes = max(candidate.Votes for candidate in position_candidates)
+        top_count = sum(candidate.Votes == top_votes for candidate in position_candidates)
+
+        if not old_loop_keeps_every_tie(position_candidates, seats[position]):
+            continue
+
+        # Unopposed candidates, single seats and top groups that fill every seat are unchanged
+        if len(position_candidates) == 1 or seats[position] == 1 or top_count >= seats[position]:
+            assert sorted(new[position]) == sorted(old[position])
+
+@given(elections())
+def test_seat_rules_fill_every_seat(election):
+    candidates, seats, num_eligible_voters = election
+
+    winners = by_position(as_set(determine_winners(frame(candidates), seats, num_eligible_voters, rules=SEAT_RULES)))
+
+    for position, position_candidates in by_position(candidates).items():
+        if len(position_candidates) < 2:
+            continue
+
+        position_winners = winners[position]
+        winning_numbers = {winner[1] for winner in position_winners}
+        with_votes = [candidate for candidate in position_candidates if candidate.Votes > 0]
+
+        # Every winner beats every candidate who did not win
+        for candidate in position_candidates:
+            if candidate.StudentNumber not in winning_numbers:
+                assert all(winner[2] > candidate.Votes for winner in position_winners)
+
+        if any(winner[3] for winner in position_winners):
+            # A tie only happens when the last seat is shared by more candidates than seats are left
+            assert len(position_winners) > seats[position]
+        else:
+            assert len(position_winners) == min(seats[position], len(with_votes))
+
+@given(elections())
+def test_seat_rules_flag_only_the_last_seat_as_tied(election):
+    candidates, seats, num_eligible_voters = election
+
+    winners = by_position(as_set(determine_winners(frame(candidates), seats, num_eligible_voters, rules=SEAT_RULES)))
+
+    for position_winners in winners.values():
+        cutoff_votes = min(winner[2] for winner in position_winners)
+
+        for winner in position_winners:
+            if winner[3]:
+                assert winner[2] == cutoff_votes
+
+#########################################################
+""" Pinned outcomes that differ between the rules """
+
+def test_multi_seat_position_fills_the_second_seat():
+    candidates = [Candidate("Senator", "A", 10), Candidate("Senator", "B", 7), Candidate("Senator", "C", 3)]
+
+    seat_winners = as_set(determine_winners(frame(candidates), {"Senator": 2}, 100, rules=SEAT_RULES))
+    legacy_winners = as_set(determine_winners(frame(candidates), {"Senator": 2}, 100, rules=LEGACY_RULES))
+
+    assert seat_winners == {("Senator", "A", 10, False), ("Senator", "B", 7, False)}
+    assert legacy_winners == {("Senator", "A", 10, False)}
+
+def test_clear_winner_above_a_tied_last_seat_is_not_tied():
+    candidates = [Candidate("Senator", "A", 10), Candidate("Senator", "B", 5), Candidate("Senator", "C", 5)]
+
+    winners = as_set(determine_winners(frame(candidates), {"Senator": 2}, 100, rules=SEAT_RULES))
+
+    assert winners == {("Senator", "A", 10, False), ("Senator", "B", 5, True), ("Senator", "C", 5, True)}
+
+def test_unopposed_candidate_needs_half_of_the_eligible_voters():
+    candidates = [Candidate("President", "A", 50)]
+
+    for rules in (LEGACY_RULES, SEAT_RULES):
+        assert as_set(determine_winners(frame(candidates), {"President": 1}, 100, rules=rules)) == set()
+        assert as_set(determine_winners(frame(candidates), {"President": 1}, 99, rules=rules)) == {("President", "A", 50, False)}
+
+def test_whole_tie_for_the_last_seat_is_kept():
+    candidates = [Candidate("President", "A", 4), Candidate("President", "B", 4), Candidate("President", "C", 4)]
+
+    expected = {("President", "A", 4, True), ("President", "B", 4, True), ("President", "C", 4, True)}
+
+    for rules in (LEGACY_RULES, SEAT_RULES):
+        assert as_set(determine_winners(frame(candidates), {"President": 1}, 100, rules=rules)) == expected
+
+def test_legacy_rules_are_the_default():
+    candidates = [Candidate("Senator", "A", 10), Candidate("Senator", "B", 7)]
+
+    assert as_set(determine_winners(frame(candidates), {"Senator": 2}, 100)) == {("Senator", "A", 10, False)}
@@ -0,0 +1,113 @@
+from apscheduler.triggers.date import DateTrigger
+
+from scheduling import scheduler
+from clock import MANILA, manila_now
+
+from bisect import bisect_right
+from itertools import accumulate
+from datetime import datetime
+
+import threading
+
+PRE_ELECTION = "Pre-Election"
+FILING_PERIOD = "Filing Period"
+CAMPAIGN_PERIOD = "Campaign Period"
+VOTING_PERIOD = "Voting Period"
+POST_ELECTION = "Post-Election"
+
+PHASES = [PRE_ELECTION, FILING_PERIOD, CAMPAIGN_PERIOD, VOTING_PERIOD, POST_ELECTION]
+
+# The Election column where each phase after Pre-Election starts, in order
+PHASE_STARTS = ["CoCFilingStart", "CampaignStart", "VotingStart", "VotingEnd"]
+
+# Stands in for a missing date so its phase never starts
+NEVER = MANILA.localize(datetime(9999, 1, 1))
+
+#########################################################
+""" Phase boundaries of an election, localized once """
+
+class ElectionTimeline:
+    def __init__(self, election):
+        self.election_id = election.ElectionId
+        self.source = tuple(getattr(election, column) for column in PHASE_STARTS)
+
+        # Stored dates are naive Manila time
+        boundaries = [MANILA.localize(value) if value else NEVER for value in self.source]
+
+        # Keep the boundaries ordered even when an election was saved with overlapping periods
+        self.boundaries = list(accumulate(boundaries, max))
+
+    def phase_at(self, now):
+        # Only 4 boundaries, so this is a constant number of comparisons
+        return PHASES[bisect_right(self.boundaries, now)]
+
+    def transitions(self):
+        # (when, phase) for every phase after Pre-Election
+        return list(zip(self.boundaries, PHASES[1:]))
+
+timelines = {} # election id -> ElectionTimeline
+timelines_lock = threading.Lock()
+
+def get_timeline(election):
+    # Rebuilt only when the election dates changed since the last call
+    with timelines_lock:
+        timeline = timelines.get(election.ElectionId)
+
+        if timeline is None or timeline.source != tuple(getattr(election, column) for column in PHASE_STARTS):
+            timeline = ElectionTimeline(election)
+            timelines[election.ElectionId] = timeline
+
+        return timeline
+
+def get_election_phase(election, now=None):
+    return get_timeline(election).phase_at(now or manila_now())
+
+def has_passed(value, now=None):
+    # value is a naive Manila time from the Election table. localize gives +08:00, replace(tzinfo=...) would give
+    # the zone's first offset, which is a day off for Manila. A missing date never passes.
+    return value is not None and MANILA.localize(value) < (now or manila_now())
+
+def forget_election(election_id):
+    with timelines_lock:
+        timelines.pop(election_id, None)
+
+    for phase in PHASES[1:]:
+        job_id = transition_job_id(election_id, phase)
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+
+#########################################################
+""" Phase transition events """
+
+phase_listeners = []
+
+def on_phase_transition(listener):
+    # listener(election_id, phase) is called when an election enters a phase.
+    # Events run on the worker holding the scheduler lease, so caches in the other workers
+    # should also key on get_election_phase to drop their entries at the same moment.
+    phase_listeners.append(listener)
+    return listener
+
+def emit_phase_transition(election_id, phase):
+    print(f"Election {election_id} entered the {phase}")
+
+    for listener in phase_listeners:
+        try:
+            listener(election_id, phase)
+        except Exception as e:
+            print(f"Error in phase transition listener {listener.__name__}: {e}")
+
+def transition_job_id(election_id, phase):
+    return f"phase_transition_{election_id}_{phase.lower().replace(' ', '_').replace('-', '_')}"
+
+def schedule_phase_transitions(election, now=None):
+    # Same job ids on every call so saving or rescheduling an election replaces its events
+    timeline = get_timeline(election)
+    now = now or manila_now()
+
+    for when, phase in timeline.transitions():
+        if when <= now or when == NEVER:
+            continue
+
+        scheduler.add_job(emit_phase_transition, trigger=DateTrigger(run_date=when), id=transition_job_id(election.ElectionId, phase),
+                          args=[election.ElectionId, phase], replace_existing=True)
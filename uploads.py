@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import cloudinary
+import cloudinary.uploader
+import cloudinary.exceptions
+import asyncio
+import time
+import os
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 8))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 3))
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", 0.5))
+
+# Shared pool so blocking cloudinary calls never run on the event loop,
+# and the whole process never has more than UPLOAD_WORKERS uploads in flight
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="cloudinary-upload")
+
+#########################################################
+""" Upload a file to cloudinary, retrying transient failures """
+
+def upload_with_retry(file, **options):
+    for attempt in range(UPLOAD_RETRIES):
+        try:
+            return cloudinary.uploader.upload(file, **options)
+        except (cloudinary.exceptions.BadRequest, cloudinary.exceptions.AuthorizationRequired, cloudinary.exceptions.NotAllowed):
+            # The request itself is wrong, retrying will not help
+            raise
+        except Exception as e:
+            if attempt == UPLOAD_RETRIES - 1:
+                raise
+
+            print(f"Upload of {options.get('public_id')} failed ({e}), retrying...")
+            time.sleep(UPLOAD_RETRY_BACKOFF * (2 ** attempt))
+
+#########################################################
+""" Run uploads in the upload pool without blocking the event loop """
+
+async def upload(file, **options):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(upload_executor, partial(upload_with_retry, file, **options))
+
+async def upload_many(uploads):
+    # uploads is a list of (file, options) pairs, results come back in the same order
+    return await asyncio.gather(*(upload(file, **options) for file, options in uploads))
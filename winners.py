@@ -0,0 +1,67 @@
+import pandas as pd
+
+import os
+
+# WINNER_RULES decides multi-seat positions. "legacy" keeps the original rules where only the candidates with
+# the highest votes win, "seats" fills every seat of the position.
+LEGACY_RULES = "legacy"
+SEAT_RULES = "seats"
+WINNER_RULES = os.getenv("WINNER_RULES", LEGACY_RULES)
+
+WINNER_COLUMNS = ["SelectedPositionName", "StudentNumber", "Votes", "IsTied"]
+
+#########################################################
+""" Winner determination """
+
+def determine_winners(candidates: pd.DataFrame, seats: dict, num_eligible_voters: int, rules: str = None) -> pd.DataFrame:
+    """
+    candidates has one row per candidate with SelectedPositionName, StudentNumber and Votes.
+    seats maps each position name to the number of winners it needs.
+
+    With the seat rules the top seats of each position win. When candidates share the votes of the last
+    seat and there are more of them than seats left, that whole group is returned with IsTied set.
+
+    With the legacy rules only the candidates with the highest votes of a position win, and all of them
+    are tied when there are more of them than seats.
+
+    Under both, a candidate running alone wins only with 50% of the eligible voters + 1, and nobody wins
+    with 0 votes.
+    """
+    rules = rules or WINNER_RULES
+
+    if candidates.empty:
+        return pd.DataFrame(columns=WINNER_COLUMNS)
+
+    df = candidates[["SelectedPositionName", "StudentNumber", "Votes"]].copy()
+    df["Votes"] = df["Votes"].fillna(0).astype(int)
+    df["Seats"] = df["SelectedPositionName"].map(seats).fillna(0).astype(int)
+
+    by_position = df.groupby("SelectedPositionName")
+    df["CandidateCount"] = by_position["Votes"].transform("size")
+
+    # Competition ranking, candidates with the same votes share the best rank
+    df["Rank"] = by_position["Votes"].rank(method="min", ascending=False)
+
+    if rules == LEGACY_RULES:
+        # Only the highest votes of the position, tied when they outnumber the seats
+        contested = df[(df["CandidateCount"] > 1) & (df["Votes"] > 0) & (df["Seats"] > 0) & (df["Rank"] == 1)].copy()
+
+        selected_per_position = contested.groupby("SelectedPositionName")["StudentNumber"].transform("size")
+        contested["IsTied"] = selected_per_position > contested["Seats"]
+    else:
+        # Everyone ranked within the seats, which includes everyone tied for the last seat
+        contested = df[(df["CandidateCount"] > 1) & (df["Votes"] > 0) & (df["Rank"] <= df["Seats"])].copy()
+
+        selected_per_position = contested.groupby("SelectedPositionName")["StudentNumber"].transform("size")
+        cutoff_votes = contested.groupby("SelectedPositionName")["Votes"].transform("min")
+        contested["IsTied"] = (selected_per_position > contested["Seats"]) & (contested["Votes"] == cutoff_votes)
+
+    # A single candidate needs 50% students + 1 vote
+    vote_threshold = (num_eligible_voters // 2) + 1
+    unopposed = df[(df["CandidateCount"] == 1) & (df["Seats"] > 0) & (df["Votes"] >= vote_threshold)].copy()
+    unopposed["IsTied"] = False
+
+    winners = pd.concat([contested, unopposed])
+    winners = winners.sort_values(["SelectedPositionName", "Rank", "StudentNumber"])
+
+    return winners[WINNER_COLUMNS].reset_index(drop=True)